@@ -8,8 +8,25 @@
 """Main entrypoint to aw-watcher ask."""
 
 
-from aw_watcher_ask.cli import app
+import sys
+
+from aw_watcher_ask import __version__
+
+
+def main() -> None:
+    """Runs the command-line application.
+
+    Asking only for the version is answered before the application (and its
+    dependencies) are even imported, as this is commonly done by scripts to
+    check the installation.
+    """
+    if sys.argv[1:] == ["--version"]:
+        print(__version__)
+        return
+
+    from aw_watcher_ask.cli import app
+    app(prog_name="aw-watcher-ask")
 
 
 if __name__ == "__main__":
-    app(prog_name="aw-input-watcher")
+    main()
@@ -0,0 +1,350 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Aggregation of the answers gathered in many hosts."""
+
+
+import heapq
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from aw_client import ActivityWatchClient
+from loguru import logger
+
+from aw_watcher_ask.client import get_client
+from aw_watcher_ask.export import HostEvent, filter_events, iter_events
+from aw_watcher_ask.utils import get_current_datetime
+
+
+class Endpoint(NamedTuple):
+    """The address of an ActivityWatch server.
+
+    Attributes:
+        host: The server's host name or address.
+        port: The server's port, or `None` for ActivityWatch's default.
+    """
+
+    host: str
+    port: Optional[int] = None
+
+    @classmethod
+    def parse(cls, address: str) -> "Endpoint":
+        """Reads an endpoint given as `host` or `host:port`."""
+        host, _, port = address.rpartition(":")
+        if not host or not port.isdigit():
+            return cls(address)
+        return cls(host, int(port))
+
+    def __str__(self) -> str:
+        return self.host if self.port is None else f"{self.host}:{self.port}"
+
+
+class Stream(NamedTuple):
+    """A bucket of answers to read from a server.
+
+    Attributes:
+        endpoint: The server.
+        bucket_id: The bucket.
+        hostname: The host where the answers in the bucket were given.
+    """
+
+    endpoint: Endpoint
+    bucket_id: str
+    hostname: str
+
+    @property
+    def key(self) -> str:
+        """The key of the stream in the aggregation state."""
+        return f"{self.endpoint}/{self.bucket_id}"
+
+
+class AggregationState:
+    """The progress of aggregating answers from each server, kept on disk.
+
+    For each bucket read, the state keeps the timestamp of the last answer
+    aggregated, and the ids of the answers at that timestamp (so that they
+    are not aggregated twice). The next aggregation resumes from there.
+
+    Arguments:
+        path: The JSON file where the state is kept. Created if it does not
+            exist.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._streams: Dict[str, Dict[str, Any]] = dict()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as state_file:
+                self._streams = json.load(state_file)
+
+    def resume(self, key: str) -> Tuple[Optional[datetime], Set[Any]]:
+        """Returns where to resume reading a bucket from.
+
+        Returns:
+            The timestamp of the last answer aggregated (if any), and the ids
+            of the answers aggregated at that timestamp.
+        """
+        stream = self._streams.get(key)
+        if stream is None:
+            return None, set()
+        return datetime.fromisoformat(stream["timestamp"]), set(stream["ids"])
+
+    def advance(self, key: str, timestamp: datetime, event_id: Any) -> None:
+        """Records an answer as aggregated."""
+        stream = self._streams.get(key)
+        if stream is None or stream["timestamp"] != timestamp.isoformat():
+            self._streams[key] = {
+                "timestamp": timestamp.isoformat(), "ids": [event_id]
+            }
+        else:
+            stream["ids"].append(event_id)
+
+    def save(self) -> None:
+        """Writes the state to disk, atomically."""
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as state_file:
+            json.dump(self._streams, state_file, indent=2)
+        os.replace(temporary, self.path)
+
+
+def _client(endpoint: Endpoint, testing: bool) -> ActivityWatchClient:
+    """Gets the client shared by everyone reading from a server."""
+    return get_client(
+        "aw-watcher-ask-aggregate", testing, endpoint.host, endpoint.port
+    )
+
+
+def discover(
+    endpoint: Endpoint, testing: bool = False
+) -> List[Stream]:
+    """Lists the buckets of answers in a server.
+
+    Arguments:
+        endpoint: The server.
+        testing: Whether to look for the buckets of watchers in testing mode.
+
+    Returns:
+        A stream for each `aw-watcher-ask` bucket in the server.
+    """
+    prefix = ("test-" if testing else "") + "aw-watcher-ask_"
+    buckets = _client(endpoint, testing).get_buckets()
+    return [
+        Stream(
+            endpoint,
+            bucket_id,
+            bucket.get("hostname") or bucket_id[len(prefix):],
+        )
+        for bucket_id, bucket in sorted(buckets.items())
+        if bucket_id.startswith(prefix)
+    ]
+
+
+# marks the end of the pages of a stream
+_END = None
+
+
+def _put(pages: queue.Queue, page: Any, stop: threading.Event) -> bool:
+    """Waits for room in a queue, unless the aggregation is stopped."""
+    while not stop.is_set():
+        try:
+            pages.put(page, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch(
+    stream: Stream,
+    state: AggregationState,
+    testing: bool,
+    question_ids: Optional[Collection[str]],
+    end: datetime,
+    page_size: int,
+    pages: queue.Queue,
+    slots: threading.Semaphore,
+    stop: threading.Event,
+    failures: List[str],
+) -> None:
+    """Reads the new answers of a stream, and queues them page by page.
+
+    A slot is held while reading each page, but not while waiting for room
+    in the queue, so that streams waiting to be merged never hold back the
+    others.
+    """
+    try:
+        start, seen = state.resume(stream.key)
+        events = filter_events(
+            iter_events(
+                _client(stream.endpoint, testing),
+                stream.bucket_id,
+                start=start,
+                end=end,
+                page_size=page_size,
+            ),
+            question_ids,
+        )
+        # the server also returns events that started before `start` and
+        # last beyond it, which were aggregated already
+        answers = (
+            HostEvent(stream.hostname, event)
+            for event in events
+            if start is None
+            or event.timestamp > start
+            or (event.timestamp == start and event.id not in seen)
+        )
+        while True:
+            with slots:
+                page = list(islice(answers, page_size))
+            if not page or not _put(pages, page, stop):
+                return
+    except Exception as e:
+        logger.warning(
+            "Failed to read answers from {} ({}). Aggregating what was read "
+            "so far, to be resumed on the next run.",
+            stream.key,
+            e,
+        )
+        failures.append(stream.key)
+    finally:
+        _put(pages, _END, stop)
+
+
+def _drain(key: str, pages: queue.Queue) -> Iterator[Tuple[str, HostEvent]]:
+    """Yields the answers of a stream, as its pages arrive."""
+    while True:
+        page = pages.get()
+        if page is _END:
+            return
+        for item in page:
+            yield key, item
+
+
+def _discover(endpoint: Endpoint, testing: bool) -> Optional[List[Stream]]:
+    """Lists the buckets of answers in a server, or `None` if unreachable."""
+    try:
+        return discover(endpoint, testing)
+    except Exception as e:
+        logger.warning("Failed to reach {} ({}).", endpoint, e)
+        return None
+
+
+def aggregate(
+    endpoints: Iterable[Endpoint],
+    state: AggregationState,
+    testing: bool = False,
+    question_ids: Optional[Collection[str]] = None,
+    end: Optional[datetime] = None,
+    page_size: int = 1000,
+    max_workers: int = 32,
+    failures: Optional[List[str]] = None,
+) -> Iterator[HostEvent]:
+    """Reads the answers gathered in many hosts, in chronological order.
+
+    Each server is read from a thread of its own (reusing a connection for
+    all its requests), so that the time taken grows with the slowest server
+    rather than with the number of servers. Answers are read page by page
+    (see [`aw_watcher_ask.export.iter_events()`]
+    [aw_watcher_ask.export.iter_events]), and merged as they arrive, with
+    at most a few pages of each server held in memory.
+
+    The state is advanced as answers are yielded, so that the next
+    aggregation resumes from the last one yielded. Servers that fail are
+    skipped, and resumed from where they failed.
+
+    Arguments:
+        endpoints: The servers to read from.
+        state: The progress of previous aggregations.
+        testing: Whether to read the buckets of watchers in testing mode.
+        question_ids: The questions to aggregate. Defaults to all questions.
+        end: The latest date and time to aggregate. Defaults to now.
+        page_size: The maximum number of answers requested at once.
+        max_workers: The maximum number of buckets read at the same time.
+        failures: A list to add the keys of the buckets that could not be
+            read (entirely) to.
+
+    Yields:
+        The answers of all hosts, tagged with their hosts, from the earliest
+        to the latest.
+    """
+    if end is None:
+        end = get_current_datetime()
+    if failures is None:
+        failures = list()
+    endpoints = list(endpoints)
+    if not endpoints:
+        return
+
+    # servers are reached at once, both to list and to read their buckets
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(endpoints)),
+        thread_name_prefix="aggregate",
+    ) as executor:
+        found = list(executor.map(
+            _discover, endpoints, [testing] * len(endpoints)
+        ))
+    streams: List[Stream] = list()
+    for endpoint, endpoint_streams in zip(endpoints, found):
+        if endpoint_streams is None:
+            failures.append(str(endpoint))
+        else:
+            streams.extend(endpoint_streams)
+    if not streams:
+        return
+
+    # each stream has a thread of its own, waiting for room in its queue,
+    # but only `max_workers` of them read from servers at the same time
+    slots = threading.BoundedSemaphore(max_workers)
+    stop = threading.Event()
+    queues: List[queue.Queue] = [queue.Queue(maxsize=4) for _ in streams]
+    executor = ThreadPoolExecutor(
+        max_workers=len(streams), thread_name_prefix="aggregate"
+    )
+    try:
+        for stream, pages in zip(streams, queues):
+            executor.submit(
+                _fetch,
+                stream,
+                state,
+                testing,
+                question_ids,
+                end,
+                page_size,
+                pages,
+                slots,
+                stop,
+                failures,
+            )
+        merged = heapq.merge(
+            *(
+                _drain(stream.key, pages)
+                for stream, pages in zip(streams, queues)
+            ),
+            key=lambda keyed: keyed[1].event.timestamp,
+        )
+        for key, item in merged:
+            state.advance(key, item.event.timestamp, item.event.id)
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Typed answers to each type of dialog box, and how events store them.
+
+Zenity outputs every answer as text. Answers are parsed once, when given,
+into values of the type suited to the dialog:
+
+- `question`: `True` (yes) or `False` (no).
+- `scale`: an integer.
+- `calendar`: an ISO 8601 date (e.g., `"2022-01-31"`).
+- `color-selection`: a list of red, green and blue levels, from 0 to 255.
+- `entry`, `password` and `text-info`: a string.
+- `list` and `file-selection`: a list of the selected items.
+- `forms`: a dictionary of the fields' labels and values.
+- `info`, `warning`, `error`, `notification` and `progress`: `None`.
+
+Prompts left unanswered have a `None` answer.
+
+Events store the answer under the `value` key of their data, next to the
+`success` of the prompt and its `question_id`. What is needed to interpret
+answers (the dialog's title, type and options) is stored in events of its
+own, which describe a question from their timestamp on: a new one is stored
+whenever the question changes. Earlier versions of aw-watcher-ask stored
+answers under the dialog's title instead, and those are read as well.
+"""
+
+
+import json
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from loguru import logger
+
+from aw_watcher_ask.dialogs import DATE_FORMAT, DialogResult, PreparedDialog
+from aw_watcher_ask.models import DialogType
+
+
+# the key of the content of answers, in events' data
+ANSWER_KEY = "value"
+
+# keys of events' data that do not hold the content of answers
+RESERVED_KEYS = frozenset({"success", "question_id"})
+
+# the key of the description of a question, in events that describe it
+DESCRIPTION_KEY = "description"
+
+_RGB = re.compile(r"rgba?\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)")
+
+
+def _text(content: str, dialog: PreparedDialog) -> str:
+    return content
+
+
+def _scale(content: str, dialog: PreparedDialog) -> int:
+    return int(content)
+
+
+def _calendar(content: str, dialog: PreparedDialog) -> str:
+    date_format = dialog.options.get("date-format", DATE_FORMAT)
+    return datetime.strptime(content, date_format).date().isoformat()
+
+
+def _color(content: str, dialog: PreparedDialog) -> List[int]:
+    match = _RGB.match(content)
+    if match:
+        return [int(level) for level in match.groups()]
+    # older versions of Zenity output `#rrggbb` or `#rrrrggggbbbb`
+    digits = content[1:] if content.startswith("#") else ""
+    width = len(digits) // 3
+    if not width or len(digits) % 3:
+        raise ValueError(f"Not a color: {content!r}")
+    top = 16 ** width - 1
+    return [
+        round(int(digits[ix * width:(ix + 1) * width], 16) * 255 / top)
+        for ix in range(3)
+    ]
+
+
+def _nothing(content: str, dialog: PreparedDialog) -> None:
+    return None
+
+
+_PARSERS: Dict[DialogType, Callable[[str, PreparedDialog], Any]] = {
+    DialogType.calendar: _calendar,
+    DialogType.color_selection: _color,
+    DialogType.entry: _text,
+    DialogType.error: _nothing,
+    DialogType.info: _nothing,
+    DialogType.notification: _nothing,
+    DialogType.password: _text,
+    DialogType.progress: _nothing,
+    DialogType.scale: _scale,
+    DialogType.text_info: _text,
+    DialogType.warning: _nothing,
+}
+
+
+def parse_answer(dialog: PreparedDialog, result: DialogResult) -> Any:
+    """Parses the answer to a dialog box with a single field.
+
+    Arguments:
+        dialog: The dialog box presented to the user.
+        result: The outcome of presenting it.
+
+    Returns:
+        The answer, typed according to the type of dialog box (see
+        [`aw_watcher_ask.answers`][aw_watcher_ask.answers]), or `None` if the
+        prompt was not answered. Answers that can not be parsed are returned
+        as given, not to be lost.
+    """
+    if dialog.question_type == DialogType.question:
+        return {0: True, 1: False}.get(result.returncode)
+    if not result.success:
+        return None
+    parser = _PARSERS.get(dialog.question_type, _text)
+    try:
+        return parser(result.content.strip(), dialog)
+    except ValueError:
+        logger.warning(
+            "Failed to parse answer {!r} to a {} dialog. Storing it as given.",
+            result.content,
+            dialog.question_type.value,
+        )
+        return result.content
+
+
+def is_answered(dialog: PreparedDialog, success: bool, value: Any) -> bool:
+    """Tells whether the user answered a prompt.
+
+    Refusing a `question` dialog (e.g., clicking "No") answers it as much as
+    accepting it does, so those are answered if their answer is not `None`.
+    Other dialogs are answered if they were accepted.
+
+    Arguments:
+        dialog: The dialog box presented to the user.
+        success: Whether the dialog (or its field) was accepted.
+        value: The parsed answer.
+    """
+    if dialog.question_type == DialogType.question:
+        return value is not None
+    return success
+
+
+def parse_fields(
+    dialog: PreparedDialog, success: bool, fields: List[str]
+) -> Any:
+    """Parses the answer to a dialog box with multiple fields.
+
+    Returns:
+        A dictionary of the fields' labels and values for `forms` dialogs,
+        or a list of the selected items for `list` and `file-selection`
+        dialogs. `None` if the prompt was not answered.
+    """
+    if not success:
+        return None
+    if dialog.question_type == DialogType.forms:
+        return dict(zip(dialog.labels, fields))
+    return fields
+
+
+def describe(dialog: PreparedDialog) -> Dict[str, Any]:
+    """Describes a question, as stored in the events that describe it.
+
+    The timeout is left out, as it does not change how answers are read.
+    """
+    options = {
+        option: value
+        for option, value in dialog.options.items()
+        if option != "timeout"
+    }
+    # as read back from the server
+    return json.loads(json.dumps({
+        "title": dialog.title,
+        "type": dialog.question_type.value,
+        "options": options,
+    }))
+
+
+def is_description(data: Mapping[str, Any]) -> bool:
+    """Tells whether an event's data describes a question, not answers it."""
+    return DESCRIPTION_KEY in data and "success" not in data
+
+
+def is_answer(data: Mapping[str, Any]) -> bool:
+    """Tells whether an event's data holds an answer, not an unanswered prompt.
+
+    Prompts are answered if their `success` is set, or if they hold a typed
+    answer (see [`is_answered()`][aw_watcher_ask.answers.is_answered]), so
+    that refusing a `question` dialog counts as answering it.
+    """
+    title, value = split_answer(data)
+    return bool(data.get("success")) or (title is None and value is not None)
+
+
+def split_answer(data: Mapping[str, Any]) -> Tuple[Optional[str], Any]:
+    """Reads the content of an answer from an event's data.
+
+    Works with answers stored under `ANSWER_KEY`, as well as under the
+    dialog's title (as done by earlier versions of aw-watcher-ask).
+
+    Returns:
+        The title the answer is stored under (`None` for answers stored under
+        `ANSWER_KEY`), and the content of the answer. If the data holds many
+        keys other than the reserved ones, their mapping is returned as the
+        content.
+    """
+    if ANSWER_KEY in data:
+        return None, data[ANSWER_KEY]
+    content = {
+        key: value for key, value in data.items() if key not in RESERVED_KEYS
+    }
+    if len(content) == 1:
+        ((title, value),) = content.items()
+        return title, value
+    return None, content or None
@@ -3,72 +3,74 @@
 # SPDX-License-Identifier: MIT
 
 
-"""A command-line interface (CLI) to aw-watcher-ask."""
+"""A command-line interface (CLI) to aw-watcher-ask.
+
+Modules with heavy dependencies (such as the ActivityWatch client) are only
+imported by the commands that need them, so that the application starts fast
+when it is just asked for help or its version.
+"""
 
 
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 import typer
 
 from aw_watcher_ask import __version__
-from aw_watcher_ask.core import main
-from aw_watcher_ask.models import DialogType
+from aw_watcher_ask.models import (
+    DialogBackendType,
+    DialogType,
+    ExportFormat,
+    MissedPolicy,
+    OverlapPolicy,
+    Question,
+)
+from aw_watcher_ask.options import parse_args
 
 
 app = typer.Typer()
 
 
 def _parse_extra_args(
-    extra_args: List[str]
-) -> Dict[str, Union[bool, str, List[str]]]:
-    """Processes any number of unknown CLI arguments and/or options.
+    question_type: DialogType, extra_args: List[str]
+) -> Dict[str, Any]:
+    """Processes any number of unknown CLI options, as dialog options.
 
     Arguments:
+        question_type: The type of dialog box the options are passed to.
         extra_args: A list of unprocessed arguments and/or options forwarded
             by a Click/Typer command-line application.
 
     Returns:
-        A dictionary of option names and values.
+        A dictionary of option names and values (see
+        [`aw_watcher_ask.options.parse_args()`]
+        [aw_watcher_ask.options.parse_args]).
+
+    Raises:
+        typer.BadParameter: If an option is not accepted by the dialog type,
+            or is given an invalid value.
     """
+    try:
+        return parse_args(question_type, extra_args)
+    except ValueError as e:
+        raise typer.BadParameter(str(e)) from None
 
-    options: Dict[str, Union[bool, str, List[str]]] = dict()
-
-    # iterate over unparsed options
-    for ix in range(0, len(extra_args)):
-
-        # check whether the element in this position starts with an option name
-        if extra_args[ix].startswith("-"):
-
-            # if it is, remove it from un parsed args and split the option name
-            # and an optional value (if format `--name=value` was used)
-            option_name, *option_values = extra_args[ix].split("=", 1)
-            option_name = option_name.lstrip("-")
-
-            if not option_values:
-                # no value in `=`-separated value: keep parsing for
-                # (possibly multiple) values, provided in the format
-                # `--name option1 option 2`
-                while True:
-                    if extra_args[ix].startswith("-"):
-                        # found the next option name; stop looking for values
-                        break
-                    else:
-                        # is a value; remove it from unparsed args and store it
-                        option_values.append(extra_args[ix])
-
-            # have any value been found?
-            if len(option_values) == 0:
-                # no: assume option was a flag, and store True
-                options[option_name] = True
-            elif len(option_values) == 1:
-                # yes, one value has been found: unpack it and store it
-                options[option_name] = option_values[0]
-            else:
-                # multiple values have been found: store them as a list
-                options[option_name] = option_values
 
-    return options
+def _echo_table(rows: List[Dict[str, Any]]) -> None:
+    """Prints rows of values as a table with aligned columns."""
+    columns = list(rows[0])
+    widths = {
+        column: max(len(column), *(len(str(row[column])) for row in rows))
+        for column in columns
+    }
+    typer.echo("  ".join(
+        column.ljust(widths[column]) for column in columns
+    ).rstrip())
+    for row in rows:
+        typer.echo("  ".join(
+            str(row[column]).ljust(widths[column]) for column in columns
+        ).rstrip())
 
 
 @app.callback(invoke_without_command=True)
@@ -77,6 +79,30 @@ def callback(
     version: Optional[bool] = typer.Option(
         False, "--version", help="Show program version.", show_default=False
     ),
+    log_level: str = typer.Option("INFO", help=(
+        "The minimum level of the messages to log."
+    )),
+    log_json: bool = typer.Option(False, help=(
+        "If set, logs each record as a JSON object."
+    )),
+    log_async: bool = typer.Option(False, help=(
+        "If set, writes logs from a background thread."
+    )),
+    log_sample: Optional[List[str]] = typer.Option(None, help=(
+        "Logs only one in every N messages of a level, given as LEVEL=N "
+        "(e.g., INFO=10). Might be given many times."
+    )),
+    metrics_port: Optional[int] = typer.Option(None, help=(
+        "If set, serves metrics in the Prometheus text format at "
+        "http://127.0.0.1:PORT/metrics."
+    )),
+    metrics_file: Optional[Path] = typer.Option(None, help=(
+        "If set, periodically writes metrics in the Prometheus text format "
+        "to this file."
+    )),
+    metrics_interval: float = typer.Option(60.0, help=(
+        "The amount of seconds between writes to `--metrics-file`."
+    )),
 ):
     """Gathers user's inputs and send them to ActivityWatch.
 
@@ -88,6 +114,38 @@ def callback(
         typer.echo(__version__)
         typer.Exit()
 
+    sample: Dict[str, int] = dict()
+    for item in log_sample or []:
+        level, _, rate = item.partition("=")
+        if not rate.isdigit() or int(rate) < 1:
+            raise typer.BadParameter(
+                f"Expected LEVEL=N, got `{item}`.", param_hint="--log-sample"
+            )
+        sample[level.upper()] = int(rate)
+
+    # logs are configured with the defaults by the commands themselves, so
+    # that the logging library is only imported if something is logged
+    if log_level.upper() != "INFO" or log_json or log_async or sample:
+        from aw_watcher_ask import logs
+        logs.configure(
+            level=log_level.upper(),
+            serialize=log_json,
+            enqueue=log_async,
+            sample=sample,
+        )
+
+    if metrics_port is not None or metrics_file is not None:
+        from aw_watcher_ask import metrics
+        if metrics_port is not None:
+            server = metrics.MetricsServer(metrics_port).start()
+            ctx.call_on_close(server.stop)
+        if metrics_file is not None:
+            dumper = metrics.MetricsDumper(
+                metrics_file, interval=metrics_interval
+            )
+            dumper.start()
+            ctx.call_on_close(dumper.stop)
+
 
 @app.command(context_settings={
     "allow_extra_args": True,
@@ -103,21 +161,20 @@ def run(
         "A short string to identify your question in ActivityWatch "
         "server records. Should contain only lower-case letters, numbers and "
         "dots. If `--title` is not provided, this will also be the "
-        "key to identify the content of the answer in the ActivityWatch "
-        "bucket's raw data."
+        "title of the dialog box."
     )),
     title: Optional[str] = typer.Option(None, help=(
-        "An optional title for the question. If provided, this will be both "
-        "the title of the dialog box and the key that identifies the content "
-        "of the answer in the ActivityWatch bucket's raw data."
+        "An optional title for the question, shown as the title of the "
+        "dialog box."
     )),
     schedule: str = typer.Option("R * * * *", help=(
         "A cron-tab expression (see https://en.wikipedia.org/wiki/Cron) "
         "that controls the execution intervals at which the user should be "
         "prompted to answer the given question. Accepts 'R' as a keyword at "
-        "second, minute and hour positions, for prompting at random times."
-        "Might be a classic five-element expression, or optionally have a "
-        "sixth element to indicate the seconds."
+        "second, minute and hour positions, for prompting at random times "
+        "(e.g., 'R * * * *' prompts once each hour, at a different random "
+        "minute). Might be a classic five-element expression, or optionally "
+        "have a sixth element to indicate the seconds."
     )),
     until: datetime = typer.Option("2100-12-31", help=(
         "A date and time when to stop gathering input from the user."
@@ -128,8 +185,656 @@ def run(
     testing: bool = typer.Option(
         False, help="If set, starts ActivityWatch Client in testing mode."
     ),
+    missed: MissedPolicy = typer.Option(MissedPolicy.coalesce, help=(
+        "What to do with prompts missed by more than a minute (e.g., because "
+        "the system was suspended): skip them, or fire a single prompt for "
+        "all of them."
+    )),
+    backend: DialogBackendType = typer.Option(
+        DialogBackendType.zenity, help=(
+            "How to present dialog boxes: run a new Zenity process for each "
+            "prompt, or keep a resident helper process between prompts (which "
+            "shows simple dialogs faster, and falls back to Zenity for the "
+            "others)."
+        ),
+    ),
+    overlap: OverlapPolicy = typer.Option(OverlapPolicy.queue, help=(
+        "What to do when the question is prompted again while previous "
+        "prompts are still open: queue the new prompt, drop it, or replace "
+        "the oldest open prompt with it."
+    )),
+    max_concurrent: int = typer.Option(1, min=1, help=(
+        "The maximum number of prompts open at the same time."
+    )),
+    adaptive: bool = typer.Option(False, help=(
+        "If set, postpones prompts while the user is away from the computer "
+        "(according to aw-watcher-afk), until they are back. Prompts of "
+        "periods the user missed are presented when they are back, up to "
+        "a few of them."
+    )),
+    compact_within: Optional[float] = typer.Option(None, help=(
+        "If set, merges consecutive identical answers given at most this "
+        "many seconds apart into a single event, extending its duration."
+    )),
 ):
     params = locals().copy()
     params.pop("ctx", None)
-    params = dict(params, **_parse_extra_args(ctx.args))
-    main(**params)
+    params = dict(params, **_parse_extra_args(question_type, ctx.args))
+
+    from aw_watcher_ask.core import main as watcher_main
+    watcher_main(**params)
+
+
+@app.command()
+def daemon(
+    config: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        help=(
+            "A JSON file with a `questions` list, where each item has the "
+            "same parameters accepted by `aw-watcher-ask run` (with extra "
+            "Zenity options grouped under `options`)."
+        ),
+    ),
+    testing: bool = typer.Option(
+        False, help="If set, starts ActivityWatch Client in testing mode."
+    ),
+    missed: MissedPolicy = typer.Option(MissedPolicy.coalesce, help=(
+        "What to do with prompts missed by more than a minute (e.g., because "
+        "the system was suspended): skip them, or fire a single prompt for "
+        "all of them."
+    )),
+    backend: DialogBackendType = typer.Option(
+        DialogBackendType.zenity, help=(
+            "How to present dialog boxes: run a new Zenity process for each "
+            "prompt, or keep a resident helper process between prompts (which "
+            "shows simple dialogs faster, and falls back to Zenity for the "
+            "others)."
+        ),
+    ),
+    max_workers: int = typer.Option(4, min=1, help=(
+        "The maximum number of prompts open at the same time, across all "
+        "questions. The limit for each question is given by its "
+        "`max_concurrent` parameter, and what to do with prompts beyond it, "
+        "by its `overlap` parameter."
+    )),
+    watch: bool = typer.Option(True, help=(
+        "Whether to apply changes made to the configuration file while "
+        "running, without restarting."
+    )),
+    reload_interval: float = typer.Option(5.0, min=0.1, help=(
+        "The amount of seconds between checks of the configuration file for "
+        "changes."
+    )),
+    coalesce_within: float = typer.Option(0.0, min=0.0, help=(
+        "If positive, questions due within this many seconds of each other "
+        "are presented together, in a single dialog box with a field for "
+        "each (questions of types that can not be presented as fields are "
+        "still prompted on their own)."
+    )),
+):
+    """Poses many questions to the user from a single process."""
+    from aw_watcher_ask import daemon as watcher_daemon
+    try:
+        questions = watcher_daemon.load_questions(config)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="CONFIG") from None
+    watcher_daemon.run(
+        questions,
+        testing=testing,
+        missed=missed,
+        backend=backend,
+        max_workers=max_workers,
+        config=config if watch else None,
+        reload_interval=reload_interval,
+        coalesce_within=coalesce_within,
+    )
+
+
+@app.command()
+def simulate(
+    config: Optional[Path] = typer.Option(None, help=(
+        "A JSON file with the questions to simulate, as accepted by "
+        "`aw-watcher-ask daemon`. Defaults to the registered questions."
+    )),
+    start: Optional[datetime] = typer.Option(None, help=(
+        "The date and time to start the simulation at. Defaults to now."
+    )),
+    days: float = typer.Option(30.0, help=(
+        "The number of days to simulate."
+    )),
+    output: Optional[Path] = typer.Option(None, help=(
+        "A file to write the prompts to, as comma-separated values. "
+        "Defaults to the standard output."
+    )),
+    testing: bool = typer.Option(
+        False, help="If set, simulates the questions registered for testing."
+    ),
+):
+    """Lists when questions would be prompted, in simulated time.
+
+    Schedules are replayed without waiting between prompts, so that months
+    of prompts are listed in seconds (e.g., to check the distribution of
+    random times before gathering data).
+    """
+    import sys
+    from datetime import timedelta
+
+    from aw_watcher_ask import logs
+    from aw_watcher_ask.daemon import fix_question, load_questions
+    from aw_watcher_ask.registry import (
+        QuestionRegistry, default_registry_path
+    )
+    from aw_watcher_ask.simulation import simulate as simulate_questions
+    from aw_watcher_ask.simulation import write_fire_times
+    from aw_watcher_ask.utils import get_current_datetime
+
+    # do not log every simulated prompt, unless asked to
+    logs.ensure_configured(level="WARNING")
+
+    if config is not None:
+        try:
+            questions = [
+                fix_question(question) for question in load_questions(config)
+            ]
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--config") from None
+    else:
+        registry = QuestionRegistry(default_registry_path(testing=testing))
+        try:
+            questions = [entry.question for entry in registry.load()]
+        finally:
+            registry.close()
+    if not questions:
+        typer.echo("No questions to simulate.", err=True)
+        raise typer.Exit(code=1)
+
+    if start is None:
+        start = get_current_datetime()
+    elif not start.tzinfo:
+        start = start.astimezone()
+    fire_times = simulate_questions(
+        questions, start, start + timedelta(days=days)
+    )
+    if output is None:
+        count = write_fire_times(fire_times, sys.stdout)
+    else:
+        with output.open("w", newline="") as file:
+            count = write_fire_times(fire_times, file)
+    typer.echo(f"Simulated {count} prompts.", err=True)
+
+
+@app.command()
+def compact(
+    within: Optional[float] = typer.Option(None, min=0.0, help=(
+        "The maximum amount of seconds between identical answers for them "
+        "to be merged. Defaults to each question's `compact_within`, or the "
+        "longest interval of its schedule plus its timeout (so that only "
+        "answers to consecutive prompts are merged), for questions that are "
+        "registered or given with `--config`; and to an hour for the others."
+    )),
+    unbounded: bool = typer.Option(False, help=(
+        "If set, merges identical answers however far apart. Answers days "
+        "apart are then merged into a single event spanning all the days "
+        "between them."
+    )),
+    config: Optional[Path] = typer.Option(
+        None, exists=True, dir_okay=False, help=(
+            "A JSON file with the questions whose answers are compacted, as "
+            "accepted by `aw-watcher-ask daemon`, to tell how far apart their "
+            "answers are merged."
+        ),
+    ),
+    dry_run: bool = typer.Option(False, help=(
+        "If set, only reports how many answers would be merged."
+    )),
+    testing: bool = typer.Option(
+        False, help="If set, compacts the answers gathered in testing mode."
+    ),
+):
+    """Merges repeated answers already stored in ActivityWatch.
+
+    Consecutive identical answers to each question are merged into a single
+    event, whose duration spans all of them.
+    """
+    from aw_watcher_ask.compaction import (
+        DEFAULT_WITHIN, compact_bucket, question_window
+    )
+    from aw_watcher_ask.core import _bucket_id, _client_setup
+    from aw_watcher_ask.daemon import fix_question, load_questions
+    from aw_watcher_ask.registry import (
+        QuestionRegistry, default_registry_path
+    )
+
+    if unbounded and within is not None:
+        raise typer.BadParameter(
+            "Can not be given along with --unbounded.", param_hint="--within"
+        )
+
+    windows = dict()
+    if within is None and not unbounded:
+        registry = QuestionRegistry(default_registry_path(testing=testing))
+        try:
+            questions = [entry.question for entry in registry.load()]
+        finally:
+            registry.close()
+        if config is not None:
+            try:
+                questions.extend(
+                    fix_question(question)
+                    for question in load_questions(config)
+                )
+            except ValueError as e:
+                raise typer.BadParameter(
+                    str(e), param_hint="--config"
+                ) from None
+        windows = {
+            question.question_id: question_window(question)
+            for question in questions
+        }
+        within = DEFAULT_WITHIN
+
+    client = _client_setup(testing=testing)
+    bucket_id = _bucket_id(client)
+    result = compact_bucket(
+        client, bucket_id, within, windows, dry_run=dry_run
+    )
+    typer.echo(
+        f"{'Would merge' if dry_run else 'Merged'} {result.removed} "
+        f"of {result.events} events in bucket '{bucket_id}' into "
+        f"{result.updated} others."
+    )
+
+
+@app.command()
+def export(
+    output: Optional[Path] = typer.Option(None, help=(
+        "A file to write the answers to. Defaults to the standard output "
+        "(except for Parquet files)."
+    )),
+    output_format: ExportFormat = typer.Option(
+        ExportFormat.ndjson, "--format", help=(
+            "How to write the answers: as JSON-encoded events (one per "
+            "line), comma-separated values or an Apache Parquet file "
+            "(which requires pyarrow)."
+        ),
+    ),
+    question_id: Optional[List[str]] = typer.Option(None, help=(
+        "A question to export. Might be given many times. Defaults to all "
+        "questions."
+    )),
+    start: Optional[datetime] = typer.Option(None, help=(
+        "The earliest date and time to export. Defaults to the creation of "
+        "the bucket."
+    )),
+    end: Optional[datetime] = typer.Option(None, help=(
+        "The latest date and time to export. Defaults to now."
+    )),
+    bucket: Optional[str] = typer.Option(None, help=(
+        "The bucket to export. Defaults to the one where the watcher stores "
+        "answers."
+    )),
+    page_size: int = typer.Option(1000, min=1, help=(
+        "The maximum number of events requested from ActivityWatch at once."
+    )),
+    testing: bool = typer.Option(
+        False, help="If set, exports the answers gathered in testing mode."
+    ),
+):
+    """Writes the answers stored in ActivityWatch to a file.
+
+    Answers are read from the server and written page by page, so that
+    memory use does not grow with the number of answers.
+    """
+    import sys
+
+    from aw_watcher_ask import export as exporting
+    from aw_watcher_ask.core import _bucket_id, _client_setup
+
+    if output is None and output_format == ExportFormat.parquet:
+        raise typer.BadParameter(
+            "Parquet files can not be written to the standard output.",
+            param_hint="--output",
+        )
+    start, end = (
+        moment.astimezone() if moment and not moment.tzinfo else moment
+        for moment in (start, end)
+    )
+
+    client = _client_setup(testing=testing)
+    bucket_id = bucket or _bucket_id(client)
+    events = exporting.filter_events(
+        exporting.iter_events(
+            client, bucket_id, start, end, page_size=page_size
+        ),
+        question_id,
+    )
+    try:
+        if output_format == ExportFormat.parquet:
+            count = exporting.write_parquet(events, output)
+        else:
+            write = (
+                exporting.write_csv if output_format == ExportFormat.csv
+                else exporting.write_ndjson
+            )
+            if output is None:
+                count = write(events, sys.stdout)
+            else:
+                with open(output, "w", encoding="utf-8", newline="") as file:
+                    count = write(events, file)
+    except (ImportError, ValueError) as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
+    typer.echo(
+        f"Exported {count} events from bucket '{bucket_id}'.", err=True
+    )
+
+
+@app.command()
+def aggregate(
+    endpoints: List[str] = typer.Argument(..., help=(
+        "The ActivityWatch servers to read answers from, as `host` or "
+        "`host:port`."
+    )),
+    output: Path = typer.Option(..., help=(
+        "A file to write the answers to. JSON lines and comma-separated "
+        "values are appended to it; Parquet files are replaced."
+    )),
+    output_format: ExportFormat = typer.Option(
+        ExportFormat.ndjson, "--format", help=(
+            "How to write the answers: as JSON-encoded events (one per "
+            "line), comma-separated values or an Apache Parquet file "
+            "(which requires pyarrow)."
+        ),
+    ),
+    question_id: Optional[List[str]] = typer.Option(None, help=(
+        "A question to aggregate. Might be given many times. Defaults to "
+        "all questions."
+    )),
+    state: Optional[Path] = typer.Option(None, help=(
+        "A file where to keep the last answer aggregated from each server, "
+        "to resume from on the next run. Defaults to the output file, "
+        "suffixed with `.state.json`."
+    )),
+    page_size: int = typer.Option(1000, min=1, help=(
+        "The maximum number of events requested from each server at once."
+    )),
+    max_workers: int = typer.Option(32, min=1, help=(
+        "The maximum number of servers read at the same time."
+    )),
+    testing: bool = typer.Option(
+        False, help="If set, aggregates the answers gathered in testing mode."
+    ),
+):
+    """Merges the answers gathered in many hosts into a single file.
+
+    All servers are read at the same time, and their answers are written in
+    chronological order. Each run resumes from the last answer aggregated
+    from each server, so that only new answers are fetched.
+    """
+    from aw_watcher_ask import export as exporting
+    from aw_watcher_ask.aggregation import (
+        AggregationState, Endpoint, aggregate as aggregate_answers
+    )
+
+    progress = AggregationState(
+        state or output.with_name(output.name + ".state.json")
+    )
+    failures: List[str] = list()
+    answers = aggregate_answers(
+        [Endpoint.parse(endpoint) for endpoint in endpoints],
+        progress,
+        testing=testing,
+        question_ids=question_id,
+        page_size=page_size,
+        max_workers=max_workers,
+        failures=failures,
+    )
+    try:
+        if output_format == ExportFormat.parquet:
+            count = exporting.write_parquet(answers, output)
+        elif output_format == ExportFormat.csv:
+            header = not output.exists() or output.stat().st_size == 0
+            with open(output, "a", encoding="utf-8", newline="") as file:
+                count = exporting.write_csv(answers, file, header=header)
+        else:
+            with open(output, "a", encoding="utf-8") as file:
+                count = exporting.write_ndjson(answers, file)
+    except ImportError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
+    # only once the answers are written, they are not fetched again
+    progress.save()
+
+    typer.echo(
+        f"Aggregated {count} new events from {len(endpoints)} servers.",
+        err=True,
+    )
+    if failures:
+        typer.echo(
+            "Failed to read (to be resumed on the next run): "
+            + ", ".join(failures),
+            err=True,
+        )
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def query(
+    question_id: Optional[List[str]] = typer.Option(None, help=(
+        "A question to query. Might be given many times. Defaults to all "
+        "questions."
+    )),
+    start: Optional[datetime] = typer.Option(None, help=(
+        "The earliest date and time to query."
+    )),
+    end: Optional[datetime] = typer.Option(None, help=(
+        "The latest date and time to query."
+    )),
+    answers: bool = typer.Option(False, help=(
+        "If set, lists every answer, instead of aggregate statistics."
+    )),
+    testing: bool = typer.Option(
+        False, help="If set, queries the answers gathered in testing mode."
+    ),
+):
+    """Summarizes the answers gathered, without querying ActivityWatch.
+
+    Prints the number of prompts, the response rate and the mean of numeric
+    answers (e.g., from scale dialogs) of each question.
+    """
+    from aw_watcher_ask.store import AnswerStore, default_store_path
+
+    store = AnswerStore(default_store_path(testing=testing))
+    try:
+        if answers:
+            rows = [
+                {
+                    "question_id": answer.question_id,
+                    "timestamp": answer.timestamp.isoformat(
+                        timespec="seconds"
+                    ),
+                    "success": answer.success,
+                    "value": answer.value,
+                }
+                for answer in store.answers(question_id, start, end)
+            ]
+        else:
+            rows = [
+                {
+                    "question_id": summary.question_id,
+                    "prompts": summary.prompts,
+                    "answered": summary.answered,
+                    "response_rate": f"{summary.response_rate:.1%}",
+                    "mean": (
+                        "" if summary.mean is None
+                        else f"{summary.mean:.2f}"
+                    ),
+                    "first": summary.first.isoformat(timespec="seconds"),
+                    "last": summary.last.isoformat(timespec="seconds"),
+                }
+                for summary in store.summarize(question_id, start, end)
+            ]
+    finally:
+        store.close()
+
+    if not rows:
+        typer.echo("No answers found.")
+        return
+    _echo_table(rows)
+
+
+@app.command(context_settings={
+    "allow_extra_args": True,
+    "ignore_unknown_options": True,
+    "allow_interspersed_args": False,
+})
+def register(
+    ctx: typer.Context,
+    question_type: DialogType = typer.Option(..., help=(
+        "The type of dialog box to present the user."
+    )),
+    question_id: str = typer.Option(..., help=(
+        "A short string to identify your question in ActivityWatch "
+        "server records. Should contain only lower-case letters, numbers and "
+        "dots. Registering a question with the same id of a registered one "
+        "replaces it."
+    )),
+    title: Optional[str] = typer.Option(None, help=(
+        "An optional title for the question."
+    )),
+    schedule: str = typer.Option("R * * * *", help=(
+        "A cron-tab expression that controls the execution intervals at "
+        "which the user should be prompted to answer the given question (see "
+        "`aw-watcher-ask run --help`)."
+    )),
+    until: datetime = typer.Option("2100-12-31", help=(
+        "A date and time when to stop gathering input from the user."
+    )),
+    timeout: int = typer.Option(
+        60, help="The amount of seconds to wait for user's input."
+    ),
+    overlap: OverlapPolicy = typer.Option(OverlapPolicy.queue, help=(
+        "What to do when the question is prompted again while previous "
+        "prompts are still open: queue the new prompt, drop it, or replace "
+        "the oldest open prompt with it."
+    )),
+    max_concurrent: int = typer.Option(1, min=1, help=(
+        "The maximum number of prompts open at the same time."
+    )),
+    adaptive: bool = typer.Option(False, help=(
+        "If set, postpones prompts while the user is away from the computer."
+    )),
+    compact_within: Optional[float] = typer.Option(None, help=(
+        "If set, merges consecutive identical answers given at most this "
+        "many seconds apart into a single event."
+    )),
+    testing: bool = typer.Option(
+        False, help="If set, uses the registry for testing mode."
+    ),
+):
+    """Registers a question, to be posed by `aw-watcher-ask start`."""
+    from aw_watcher_ask.cron import make_schedule
+    from aw_watcher_ask.daemon import fix_question
+    from aw_watcher_ask.registry import (
+        QuestionRegistry, default_registry_path
+    )
+
+    question = fix_question(Question(
+        question_id=question_id,
+        question_type=question_type,
+        title=title,
+        schedule=schedule,
+        until=until,
+        timeout=timeout,
+        max_concurrent=max_concurrent,
+        overlap=overlap,
+        adaptive=adaptive,
+        compact_within=compact_within,
+        options=_parse_extra_args(question_type, ctx.args),
+    ))
+    # validate the schedule once, and keep its first execution
+    next_execution = make_schedule(
+        question.schedule, seed=question.question_id
+    ).get_next(datetime)
+
+    registry = QuestionRegistry(default_registry_path(testing=testing))
+    try:
+        registry.register(question, next_execution)
+    finally:
+        registry.close()
+    typer.echo(
+        f"Registered question `{question.question_id}`, next due at "
+        f"{next_execution.isoformat()}."
+    )
+
+
+@app.command()
+def unregister(
+    question_id: str = typer.Argument(
+        ..., help="The id of the question to remove from the registry."
+    ),
+    testing: bool = typer.Option(
+        False, help="If set, uses the registry for testing mode."
+    ),
+):
+    """Removes a question from the registry."""
+    from aw_watcher_ask.registry import (
+        QuestionRegistry, default_registry_path
+    )
+
+    registry = QuestionRegistry(default_registry_path(testing=testing))
+    try:
+        removed = registry.unregister(question_id)
+    finally:
+        registry.close()
+    if not removed:
+        typer.echo(f"Question `{question_id}` is not registered.", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"Unregistered question `{question_id}`.")
+
+
+@app.command()
+def start(
+    testing: bool = typer.Option(
+        False, help="If set, starts ActivityWatch Client in testing mode."
+    ),
+    missed: MissedPolicy = typer.Option(MissedPolicy.coalesce, help=(
+        "What to do with prompts missed by more than a minute (e.g., because "
+        "the system was suspended or the watcher was not running): skip "
+        "them, or fire a single prompt for all of them."
+    )),
+    backend: DialogBackendType = typer.Option(
+        DialogBackendType.zenity, help=(
+            "How to present dialog boxes: run a new Zenity process for each "
+            "prompt, or keep a resident helper process between prompts."
+        ),
+    ),
+    max_workers: int = typer.Option(4, min=1, help=(
+        "The maximum number of prompts open at the same time, across all "
+        "questions."
+    )),
+    coalesce_within: float = typer.Option(0.0, min=0.0, help=(
+        "If positive, questions due within this many seconds of each other "
+        "are presented together, in a single dialog box."
+    )),
+):
+    """Poses all registered questions, resuming their schedules."""
+    from aw_watcher_ask import daemon as watcher_daemon
+    from aw_watcher_ask.registry import (
+        QuestionRegistry, default_registry_path
+    )
+
+    registry = QuestionRegistry(default_registry_path(testing=testing))
+    try:
+        watcher_daemon.start(
+            registry,
+            testing=testing,
+            missed=missed,
+            backend=backend,
+            max_workers=max_workers,
+            coalesce_within=coalesce_within,
+        )
+    finally:
+        registry.close()
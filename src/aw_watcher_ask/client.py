@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""ActivityWatch clients reusing connections to the server."""
+
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import requests
+from aw_client import ActivityWatchClient
+
+
+class SessionClient(ActivityWatchClient):
+    """An [`aw_client.ActivityWatchClient`]
+    (https://docs.activitywatch.net/en/latest/api/python.html
+    #aw_client.ActivityWatchClient) that keeps its HTTP connections alive.
+
+    The upstream client opens a new connection to the server for every
+    request. This one sends all requests through the same [`requests.Session`]
+    (https://docs.python-requests.org/en/latest/user/advanced/
+    #session-objects), so that consecutive requests reuse the same
+    connection.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.buckets = BucketManager(self)
+
+    def _get(
+        self, endpoint: str, params: Optional[dict] = None
+    ) -> requests.Response:
+        response = self.session.get(self._url(endpoint), params=params)
+        response.raise_for_status()
+        return response
+
+    def _post(
+        self,
+        endpoint: str,
+        data: Union[List[Any], Dict[str, Any]],
+        params: Optional[dict] = None,
+    ) -> requests.Response:
+        headers = {"Content-type": "application/json", "charset": "utf-8"}
+        response = self.session.post(
+            self._url(endpoint),
+            data=bytes(json.dumps(data), "utf8"),
+            headers=headers,
+            params=params,
+        )
+        response.raise_for_status()
+        return response
+
+    def _delete(self, endpoint: str, data: Any = None) -> requests.Response:
+        if data is None:
+            data = {}
+        headers = {"Content-type": "application/json"}
+        response = self.session.delete(
+            self._url(endpoint), data=json.dumps(data), headers=headers
+        )
+        response.raise_for_status()
+        return response
+
+    def disconnect(self) -> None:
+        super().disconnect()
+        self.session.close()
+
+
+class BucketManager:
+    """Creates buckets in the server only if they do not exist yet.
+
+    The list of buckets in the server is fetched once, on first use, and then
+    kept up to date locally as buckets are created through the manager. This
+    way, setting up many questions (or restarting the watcher) costs a single
+    request, instead of one creation request per question.
+
+    Arguments:
+        client: The client used to reach the server.
+    """
+
+    def __init__(self, client: ActivityWatchClient) -> None:
+        self.client = client
+        self._known: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Fetches the list of buckets from the server again."""
+        with self._lock:
+            self._known = self.client.get_buckets()
+
+    def ensure(self, bucket_id: str, event_type: str) -> bool:
+        """Makes sure a bucket exists in the server.
+
+        Arguments:
+            bucket_id: The id of the bucket.
+            event_type: The type of events in the bucket, used if the bucket
+                is created.
+
+        Returns:
+            Whether the bucket had to be created.
+        """
+        with self._lock:
+            if self._known is None:
+                self._known = self.client.get_buckets()
+            if bucket_id in self._known:
+                return False
+            self.client.create_bucket(bucket_id, event_type=event_type)
+            self._known[bucket_id] = {"id": bucket_id, "type": event_type}
+            return True
+
+
+# shared clients, by name and server
+_clients: Dict[
+    Tuple[str, bool, Optional[str], Optional[int]], SessionClient
+] = dict()
+_clients_lock = threading.Lock()
+
+
+def get_client(
+    client_name: str,
+    testing: bool = False,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+) -> SessionClient:
+    """Returns the process-wide client for a server, building it if needed.
+
+    Building many [`aw_client.ActivityWatchClient`]
+    (https://docs.activitywatch.net/en/latest/api/python.html
+    #aw_client.ActivityWatchClient) with the same name in a single process
+    is wasteful (and refused by their single-instance lock), so clients are
+    shared by everyone asking for the same name and server.
+
+    Arguments:
+        client_name: The name of the client.
+        testing: Whether to connect to the testing server.
+        host: The server's host. Defaults to the one in ActivityWatch's
+            configuration.
+        port: The server's port. Defaults to the one in ActivityWatch's
+            configuration.
+
+    Returns:
+        A client whose connections and known buckets are shared.
+    """
+    key = (client_name, testing, host, port)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = SessionClient(
+                client_name, testing=testing, host=host, port=port
+            )
+            _clients[key] = client
+        return client
@@ -0,0 +1,125 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Sources of time for the watcher, real or simulated."""
+
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from aw_watcher_ask.utils import get_current_datetime
+
+
+class Clock:
+    """The system clock.
+
+    The watcher reads the time (and waits for it to pass) only through a
+    clock, so that it might be replaced by a faster or simulated one (see
+    [`AcceleratedClock`][aw_watcher_ask.clock.AcceleratedClock] and
+    [`VirtualClock`][aw_watcher_ask.clock.VirtualClock]).
+
+    Attributes:
+        steady: Whether the wall clock is known to never move relative to
+            the monotonic clock (e.g., because of suspensions or clock
+            steps), so that waiting does not need to be done in short steps.
+    """
+
+    steady = False
+
+    def now(self) -> datetime:
+        """Returns the current, timezone-aware date and time."""
+        return get_current_datetime()
+
+    def monotonic(self) -> float:
+        """Returns the value of a monotonic clock, in seconds."""
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Suspends the calling thread for an amount of seconds."""
+        time.sleep(seconds)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        """Waits for an event to be set, for at most an amount of seconds.
+
+        Returns:
+            Whether the event was set.
+        """
+        return event.wait(seconds)
+
+
+SYSTEM_CLOCK = Clock()
+
+
+class AcceleratedClock(Clock):
+    """A clock that runs a number of times faster than the system clock.
+
+    Arguments:
+        speedup: How many seconds pass in this clock for each real second.
+        start: The date and time the clock starts at. Defaults to the
+            current date and time.
+    """
+
+    steady = True
+
+    def __init__(
+        self, speedup: float, start: Optional[datetime] = None
+    ) -> None:
+        self.speedup = speedup
+        self.start = start or get_current_datetime()
+        self._origin = time.monotonic()
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.monotonic())
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self._origin) * self.speedup
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(max(seconds, 0.0) / self.speedup)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        return event.wait(max(seconds, 0.0) / self.speedup)
+
+
+class VirtualClock(Clock):
+    """A simulated clock, where waiting makes time pass instantly.
+
+    Sleeping jumps the clock straight to the end of the sleep, so that a
+    scheduler driven by it goes from one deadline to the next with no
+    delay, and months of prompts are simulated in seconds.
+
+    Arguments:
+        start: The date and time the clock starts at. Defaults to the
+            current date and time.
+    """
+
+    steady = True
+
+    def __init__(self, start: Optional[datetime] = None) -> None:
+        self.start = start or get_current_datetime()
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.monotonic())
+
+    def monotonic(self) -> float:
+        with self._lock:
+            return self._elapsed
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        # events set by other threads are only noticed once time passes
+        if not event.is_set():
+            self.advance(seconds)
+        return event.is_set()
+
+    def advance(self, seconds: float) -> None:
+        """Makes an amount of seconds pass."""
+        with self._lock:
+            self._elapsed += max(seconds, 0.0)
@@ -0,0 +1,204 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Coalescing of prompts due at about the same time into a single dialog.
+
+Questions that come due together are presented as the fields of a single
+`forms` dialog box, rather than as one dialog box each. Each type of dialog
+is asked with the field closest to it:
+
+- `question`: a combo box with the dialog's ok and cancel labels (`Yes` and
+    `No` by default).
+- `scale`: a combo box with every value of the scale, or an entry if the
+    scale has too many values to be listed.
+- `calendar`: a calendar.
+- `entry` and `password`: an entry, hidden for passwords.
+
+Other types of dialogs can not be presented as fields, and are prompted on
+their own. The answer to the coalesced dialog is split back into one answer
+per question, typed as if it had been given to the question's own dialog
+(see [`aw_watcher_ask.answers`][aw_watcher_ask.answers]). Fields left empty
+are taken as unanswered.
+"""
+
+
+from itertools import zip_longest
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from aw_watcher_ask.answers import is_answered, parse_answer
+from aw_watcher_ask.dialogs import (
+    DATE_FORMAT, DialogResult, PreparedDialog, prepare_dialog
+)
+from aw_watcher_ask.models import DialogType
+
+
+# types of dialogs that can be presented as fields of a forms dialog
+COALESCIBLE = frozenset({
+    DialogType.calendar,
+    DialogType.entry,
+    DialogType.password,
+    DialogType.question,
+    DialogType.scale,
+})
+
+# the most values of a scale listed in a combo box, rather than typed
+MAX_CHOICES = 21
+
+# Zenity's defaults for scales with no bounds or step
+_SCALE_DEFAULTS = {"min-value": 0, "max-value": 100, "step": 1}
+
+# options of forms dialogs that add fields, in the order fields are output
+_FIELDS = ("add-entry", "add-password", "add-calendar", "add-combo")
+
+
+class CoalescedDialog(NamedTuple):
+    """A forms dialog box presenting many questions at once.
+
+    Attributes:
+        dialog: The forms dialog box presented to the user.
+        question_ids: The ids of the questions asked, in the order of the
+            dialog's fields.
+        parts: The dialog boxes of the questions asked, in the same order.
+    """
+
+    dialog: PreparedDialog
+    question_ids: List[str]
+    parts: List[PreparedDialog]
+
+
+def coalescible(dialog: PreparedDialog) -> bool:
+    """Tells whether a dialog box can be presented as a field of a form."""
+    # passwords asked along with user names have two fields of their own
+    return (
+        dialog.question_type in COALESCIBLE
+        and not dialog.options.get("username")
+    )
+
+
+def _choices(dialog: PreparedDialog) -> Optional[List[str]]:
+    """Lists the values offered for a question in a combo box, if any."""
+    if dialog.question_type == DialogType.question:
+        return [
+            dialog.options.get("ok-label", "Yes"),
+            dialog.options.get("cancel-label", "No"),
+        ]
+    if dialog.question_type == DialogType.scale:
+        bounds = dict(_SCALE_DEFAULTS, **dialog.options)
+        values = range(
+            bounds["min-value"], bounds["max-value"] + 1, bounds["step"] or 1
+        )
+        if len(values) <= MAX_CHOICES:
+            return [str(value) for value in values]
+    return None
+
+
+def _label(dialog: PreparedDialog) -> str:
+    """Tells the label of a question's field."""
+    return dialog.options.get("text") or dialog.title
+
+
+def _field(dialog: PreparedDialog) -> str:
+    """Tells the option of forms dialogs that adds a question's field."""
+    if _choices(dialog) is not None:
+        return "add-combo"
+    if dialog.question_type == DialogType.password or dialog.options.get(
+        "hide-text"
+    ):
+        return "add-password"
+    if dialog.question_type == DialogType.calendar:
+        return "add-calendar"
+    return "add-entry"
+
+
+def coalesce(
+    questions: Sequence[Tuple[str, PreparedDialog]], title: str = "Questions"
+) -> CoalescedDialog:
+    """Combines the dialog boxes of many questions into a forms dialog box.
+
+    Each question's field is labeled with its dialog's text, or its title
+    if it has none. The forms dialog times out as late as the latest of the
+    questions' dialogs (never, if any of them does not time out).
+
+    Arguments:
+        questions: The ids and dialog boxes of the questions to ask. All of
+            them must be `coalescible()`.
+        title: The title of the forms dialog box.
+
+    Returns:
+        The forms dialog box, and the questions it asks.
+
+    Raises:
+        ValueError: If a question can not be presented as a field.
+    """
+    fields: Dict[str, List[Tuple[str, PreparedDialog]]] = {
+        option: list() for option in _FIELDS
+    }
+    for question_id, dialog in questions:
+        if not coalescible(dialog):
+            raise ValueError(
+                f"A {dialog.question_type.value} dialog can not be presented "
+                f"as a field (question `{question_id}`)."
+            )
+        fields[_field(dialog)].append((question_id, dialog))
+
+    ordered = [item for option in _FIELDS for item in fields[option]]
+    options: Dict[str, Any] = {
+        option: [_label(dialog) for _, dialog in items]
+        for option, items in fields.items()
+        if items
+    }
+    if fields["add-combo"]:
+        options["combo-values"] = [
+            "|".join(_choices(dialog)) for _, dialog in fields["add-combo"]
+        ]
+    if fields["add-calendar"]:
+        options["forms-date-format"] = DATE_FORMAT
+    timeouts = [dialog.options.get("timeout") for _, dialog in ordered]
+    if all(timeouts):
+        options["timeout"] = max(timeouts)
+    return CoalescedDialog(
+        dialog=prepare_dialog(DialogType.forms, title, **options),
+        question_ids=[question_id for question_id, _ in ordered],
+        parts=[dialog for _, dialog in ordered],
+    )
+
+
+def _parse_field(dialog: PreparedDialog, content: str) -> Tuple[bool, Any]:
+    """Parses the value of a question's field, as given to its own dialog."""
+    if not content:
+        return False, None
+    if dialog.question_type == DialogType.question:
+        value = dict(zip(_choices(dialog), (True, False))).get(content)
+        return is_answered(dialog, True, value), value
+    if dialog.question_type == DialogType.calendar:
+        # forms output dates in the format they are given
+        dialog = dialog._replace(
+            options=dict(dialog.options, **{"date-format": DATE_FORMAT})
+        )
+    return True, parse_answer(dialog, DialogResult(True, content, 0))
+
+
+def split_answers(
+    coalesced: CoalescedDialog, success: bool, fields: List[str]
+) -> Dict[str, Tuple[bool, Any]]:
+    """Splits the answer to a coalesced dialog into one answer per question.
+
+    Arguments:
+        coalesced: The coalesced dialog box presented to the user.
+        success: Whether the forms dialog was accepted.
+        fields: The values of the dialog's fields, in order.
+
+    Returns:
+        Whether each question was answered, and its typed answer (`None` if
+        it was not), by question id. Questions are left unanswered if the
+        dialog was not accepted, or their fields were left empty.
+    """
+    answers: Dict[str, Tuple[bool, Any]] = dict()
+    for question_id, dialog, content in zip_longest(
+        coalesced.question_ids, coalesced.parts, fields if success else []
+    ):
+        if question_id is None:
+            break
+        answers[question_id] = _parse_field(dialog, (content or "").strip())
+    return answers
@@ -0,0 +1,230 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Compaction of answers already stored in ActivityWatch."""
+
+
+from datetime import timedelta
+from typing import (
+    Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+)
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+
+from aw_watcher_ask.answers import is_answer, is_description
+from aw_watcher_ask.cron import longest_interval
+from aw_watcher_ask.export import iter_events
+from aw_watcher_ask.models import Question
+
+
+# the maximum amount of seconds between identical answers to be merged, for
+# questions whose schedules are not known (that of the default schedule)
+DEFAULT_WITHIN = 3600.0
+
+# the most merged events held in memory before they are written
+CHUNK_SIZE = 1000
+
+
+class CompactionResult(NamedTuple):
+    """What compacting a bucket did (or would do).
+
+    Attributes:
+        events: The number of events in the bucket before compaction.
+        updated: The number of events kept, with their durations extended.
+        removed: The number of events merged into others, and deleted.
+    """
+
+    events: int
+    updated: int
+    removed: int
+
+
+def question_window(question: Question) -> float:
+    """Tells how far apart consecutive answers to a question might be.
+
+    That is the question's `compact_within`, if set. Otherwise, it is the
+    longest interval between two prompts of its schedule, plus its timeout
+    (as answers are timestamped when given), so that only answers to
+    consecutive prompts are merged.
+
+    Returns:
+        The maximum amount of seconds between identical answers to the
+        question for them to be merged.
+    """
+    if question.compact_within is not None:
+        return question.compact_within
+    return longest_interval(
+        question.schedule, seed=question.question_id
+    ) + question.timeout
+
+
+def _mergeable(
+    last: Event, event: Event, within: Optional[timedelta]
+) -> bool:
+    """Checks whether an event repeats the answer of the previous one.
+
+    Unanswered prompts are never merged, as they hold no answer to repeat.
+    """
+    if last.data != event.data or event.timestamp < last.timestamp:
+        return False
+    if not is_answer(event.data):
+        return False
+    if within is None:
+        return True
+    return event.timestamp <= last.timestamp + last.duration + within
+
+
+def iter_merges(
+    events: Iterable[Event],
+    within: Optional[float] = DEFAULT_WITHIN,
+    windows: Optional[Mapping[str, float]] = None,
+    chunk_size: Optional[int] = CHUNK_SIZE,
+) -> Iterator[Tuple[Event, List[Event]]]:
+    """Merges consecutive identical answers to each question, as they come.
+
+    Works as [`compact_events()`][aw_watcher_ask.compaction.compact_events],
+    but reads events in chronological order (e.g., as read by
+    [`aw_watcher_ask.export.iter_events()`]
+    [aw_watcher_ask.export.iter_events]), and yields merges as soon as they
+    are known, holding at most `chunk_size` merged events in memory per
+    question. Events describing the questions, and unanswered prompts, are
+    left as they are.
+
+    Yields:
+        Events kept, with their durations extended so far (modified in
+        place), and events merged into them since they were last yielded.
+        Events kept might be yielded many times, as their durations grow.
+    """
+    windows = windows or dict()
+    last: Dict[Optional[str], Event] = dict()
+    merged: Dict[Optional[str], List[Event]] = dict()
+    for event in events:
+        if is_description(event.data):
+            continue
+        question_id = event.data.get("question_id")
+        window = windows.get(question_id, within)
+        previous = last.get(question_id)
+        if previous is not None and _mergeable(
+            previous,
+            event,
+            timedelta(seconds=window) if window is not None else None,
+        ):
+            previous.duration = max(
+                previous.duration,
+                event.timestamp + event.duration - previous.timestamp,
+            )
+            run = merged.setdefault(question_id, list())
+            run.append(event)
+            if chunk_size is not None and len(run) >= chunk_size:
+                yield previous, merged.pop(question_id)
+            continue
+        if merged.get(question_id):
+            yield previous, merged.pop(question_id)
+        last[question_id] = event
+    for question_id, run in merged.items():
+        if run:
+            yield last[question_id], run
+
+
+def compact_events(
+    events: Iterable[Event],
+    within: Optional[float] = DEFAULT_WITHIN,
+    windows: Optional[Mapping[str, float]] = None,
+) -> Tuple[List[Event], List[Event]]:
+    """Merges consecutive identical answers to each question.
+
+    Answers are compared with the previous answer to the same question
+    (told by the `question_id` in their data), regardless of answers to other
+    questions given in the meanwhile. Merged answers are represented by the
+    earliest of them, with its duration extended up to the end of the
+    latest, as done by ActivityWatch's heartbeats.
+
+    Arguments:
+        events: The events to compact, in any order.
+        within: The maximum amount of seconds between identical answers for
+            them to be merged. Answers further apart are kept apart, so as
+            not to make up an answer held over the time between them. If
+            `None`, answers are merged however far apart.
+        windows: The maximum amount of seconds between identical answers to
+            each question, by question id (e.g., as told by
+            [`question_window()`][aw_watcher_ask.compaction.question_window]).
+            Questions left out are merged within `within` seconds.
+
+    Returns:
+        The events kept whose durations were extended (modified in place),
+        from the earliest to the latest, and the events merged into them.
+    """
+    updated: Dict[int, Event] = dict()
+    removed: List[Event] = list()
+    for kept, run in iter_merges(
+        sorted(events, key=lambda event: event.timestamp),
+        within,
+        windows,
+        chunk_size=None,
+    ):
+        updated[id(kept)] = kept
+        removed.extend(run)
+    return (
+        sorted(updated.values(), key=lambda event: event.timestamp), removed
+    )
+
+
+def compact_bucket(
+    client: ActivityWatchClient,
+    bucket_id: str,
+    within: Optional[float] = DEFAULT_WITHIN,
+    windows: Optional[Mapping[str, float]] = None,
+    dry_run: bool = False,
+    page_size: int = 1000,
+) -> CompactionResult:
+    """Rewrites the history of a bucket, merging repeated answers.
+
+    The bucket is read page by page (see [`aw_watcher_ask.export.
+    iter_events()`][aw_watcher_ask.export.iter_events]), and merges are
+    written as they are found, so that memory use does not grow with the
+    size of the bucket. Each event kept is updated first, and only then the
+    events merged into it are deleted, so that an interrupted compaction
+    leaves overlapping duplicates (to be merged by running it again) rather
+    than losing answers.
+
+    Arguments:
+        client: The client used to reach the server.
+        bucket_id: The bucket to compact.
+        within: The maximum amount of seconds between identical answers for
+            them to be merged, or `None` to merge them however far apart
+            (see [`compact_events()`]
+            [aw_watcher_ask.compaction.compact_events]).
+        windows: The maximum amount of seconds between identical answers to
+            each question, by question id.
+        dry_run: If set, only computes what would be done.
+        page_size: The maximum number of events read at once.
+
+    Returns:
+        What was (or would be) done.
+    """
+    events = 0
+
+    def counted(stream: Iterable[Event]) -> Iterator[Event]:
+        nonlocal events
+        for event in stream:
+            events += 1
+            yield event
+
+    updated = set()
+    removed = 0
+    for kept, run in iter_merges(
+        counted(iter_events(client, bucket_id, page_size=page_size)),
+        within,
+        windows,
+    ):
+        updated.add(kept.id)
+        removed += len(run)
+        if dry_run:
+            continue
+        # events with ids replace the stored ones
+        client.insert_event(bucket_id, kept)
+        for event in run:
+            client.delete_event(bucket_id, event.id)
+    return CompactionResult(events, len(updated), removed)
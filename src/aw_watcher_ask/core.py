@@ -6,61 +6,388 @@
 """Watcher function and helpers."""
 
 
-import sys
-import time
 from datetime import datetime
-from typing import Any, Dict, Optional
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional
 
-import zenity
 from aw_client import ActivityWatchClient
+from aw_core.dirs import get_data_dir
 from aw_core.models import Event
-from croniter import croniter
 from loguru import logger
 
-from aw_watcher_ask.models import DialogType
+from aw_watcher_ask import logs, metrics
+from aw_watcher_ask.answers import (
+    ANSWER_KEY,
+    DESCRIPTION_KEY,
+    describe,
+    is_answered,
+    parse_answer,
+    parse_fields,
+)
+from aw_watcher_ask.client import BucketManager, get_client
+from aw_watcher_ask.coalescing import CoalescedDialog, split_answers
+from aw_watcher_ask.clock import SYSTEM_CLOCK, Clock
+from aw_watcher_ask.cron import make_schedule
+from aw_watcher_ask.dialogs import (
+    MULTIPLE_FIELDS,
+    DialogBackend,
+    PreparedDialog,
+    ZenityBackend,
+    get_backend,
+    prepare_dialog,
+)
+from aw_watcher_ask.journal import AnswerJournal, JournalFlusher
+from aw_watcher_ask.models import (
+    DialogBackendType, DialogType, MissedPolicy, OverlapPolicy
+)
+from aw_watcher_ask.presence import AfkMonitor, OwedPrompts
+from aw_watcher_ask.prompts import PromptPool
+from aw_watcher_ask.scheduling import Scheduler
+from aw_watcher_ask.store import AnswerStore, default_store_path
 from aw_watcher_ask.utils import fix_id, is_valid_id, get_current_datetime
 
 
+def _bucket_id(client: ActivityWatchClient) -> str:
+    """Returns the id of the bucket where the client stores answers."""
+    return "{}_{}".format(client.client_name, client.client_hostname)
+
+
 def _bucket_setup(client: ActivityWatchClient, question_id: str) -> str:
-    """Makes sure a bucket exists in the client for the given event type."""
+    """Makes sure a bucket exists in the client for the given event type.
+
+    The bucket is only created if the server does not have it yet, as told
+    by the client's [`BucketManager`][aw_watcher_ask.client.BucketManager].
+    """
 
-    bucket_id = "{}_{}".format(client.client_name, client.client_hostname)
-    client.create_bucket(bucket_id, event_type=question_id)
+    bucket_id = _bucket_id(client)
+    buckets = getattr(client, "buckets", None) or BucketManager(client)
+    buckets.ensure(bucket_id, event_type=question_id)
 
     return bucket_id
 
 
 def _client_setup(testing: bool = False) -> ActivityWatchClient:
-    """Builds a new ActivityWatcher client instance and bucket."""
+    """Gets the ActivityWatch client shared by the whole process."""
 
     # set client name
     client_name = "aw-watcher-ask"
     if testing:
         client_name = "test-" + client_name
 
-    # create client representation
-    return ActivityWatchClient(client_name, testing=testing)
+    # share a single client per process, reusing connections to the server
+    return get_client(client_name, testing=testing)
+
+
+def _journal_setup(testing: bool = False) -> AnswerJournal:
+    """Opens the local journal of answers yet to be sent to the server."""
+    journal_name = "journal.sqlite"
+    if testing:
+        journal_name = "test-" + journal_name
+    return AnswerJournal(Path(get_data_dir("aw-watcher-ask")) / journal_name)
+
+
+def _store_setup(testing: bool = False) -> AnswerStore:
+    """Opens the local store of answers, used for analysis."""
+    return AnswerStore(default_store_path(testing=testing))
 
 
 def _ask_one(
-    question_type: DialogType, title: str, *args, **kwargs
+    dialog: PreparedDialog, backend: Optional[DialogBackend] = None
 ) -> Dict[str, Any]:
-    """Captures an user's response to a dialog box with a single field."""
-    kwargs.pop("ctx", None)
-    success, content = zenity.show(
-        question_type.value, title=title, *args, **kwargs
-    )
+    """Captures an user's response to a dialog box with a single field.
+
+    The answer is parsed into a value of the type suited to the dialog (see
+    [`aw_watcher_ask.answers`][aw_watcher_ask.answers]), stored under
+    `ANSWER_KEY`.
+    """
+    if backend is None:
+        backend = ZenityBackend()
+    result = backend.show_prepared(dialog)
+    value = parse_answer(dialog, result)
     return {
-        "success": success,
-        title: content,
+        "success": is_answered(dialog, result.success, value),
+        ANSWER_KEY: value,
     }
 
 
 def _ask_many(
-    question_type: DialogType, separator: str = "|", *args, **kwargs
+    dialog: PreparedDialog, backend: Optional[DialogBackend] = None
 ) -> Dict[str, Any]:
-    """Captures the user's response to a dialog box with multiple fields."""
-    raise NotImplementedError
+    """Captures the user's response to a dialog box with multiple fields.
+
+    Answers to `DialogType.forms` dialogs are stored as a dictionary of the
+    forms' labels and values; and answers to `DialogType.list` and
+    `DialogType.file_selection` dialogs, as a list of the selected items.
+    """
+    if backend is None:
+        backend = ZenityBackend()
+    success, fields, _ = backend.show_fields_prepared(dialog)
+    return {
+        "success": success,
+        ANSWER_KEY: parse_fields(dialog, success, fields),
+    }
+
+
+def _ask(
+    dialog: PreparedDialog, backend: Optional[DialogBackend] = None
+) -> Dict[str, Any]:
+    """Presents the dialog box suitable for the question type to the user."""
+    if dialog.question_type in MULTIPLE_FIELDS:
+        return _ask_many(dialog, backend=backend)
+    return _ask_one(dialog, backend=backend)
+
+
+def _ask_coalesced(
+    coalesced: CoalescedDialog, backend: Optional[DialogBackend] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Presents many questions at once, in a single forms dialog box.
+
+    The answer is split back into one answer per question, typed as if it
+    had been given to the question's own dialog (see
+    [`aw_watcher_ask.coalescing`][aw_watcher_ask.coalescing]).
+
+    Arguments:
+        coalesced: The dialog box presenting the questions.
+        backend: How to present the dialog box.
+
+    Returns:
+        The answer to each question, by question id.
+    """
+    if backend is None:
+        backend = ZenityBackend()
+    success, fields, _ = backend.show_fields_prepared(coalesced.dialog)
+    return {
+        question_id: {
+            "success": answered,
+            ANSWER_KEY: value,
+        }
+        for question_id, (answered, value) in split_answers(
+            coalesced, success, fields
+        ).items()
+    }
+
+
+def _prepare(
+    question_type: DialogType,
+    question_id: str,
+    title: Optional[str] = None,
+    timeout: int = 60,
+    *args,
+    **kwargs,
+) -> PreparedDialog:
+    """Validates the options of a question, and prepares its dialog box."""
+    return prepare_dialog(
+        question_type,
+        title if title else question_id,
+        *args,
+        timeout=timeout,
+        **kwargs,
+    )
+
+
+def _ask_when_present(
+    log: Any,
+    presence: AfkMonitor,
+    deadline: datetime,
+    question_id: str,
+    ask: Callable[[], Dict[str, Any]],
+    owed: Optional[OwedPrompts] = None,
+    present: Optional[Callable[[], Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Presents a prompt once the user is at the computer.
+
+    Prompts are postponed while the user is away, up to `deadline` (usually
+    the next time the question is due). Prompts still postponed by then are
+    owed to the user, and the next prompt of the question to find the user
+    at the computer presents them too (with `present`), right after its own,
+    so that each period of the schedule still gets its sample. Prompts are
+    only skipped when too many are owed already (see [`OwedPrompts`]
+    [aw_watcher_ask.presence.OwedPrompts]), or if `owed` is not given.
+
+    Arguments:
+        log: The logger of the question.
+        presence: Tells whether the user is at the computer.
+        deadline: The date and time when to stop postponing the prompt.
+        question_id: The question's id, to label metrics.
+        ask: A function that presents the prompt.
+        owed: The prompts owed to the user for the question.
+        present: A function that presents an owed prompt (e.g., by
+            submitting it to a [`PromptPool`]
+            [aw_watcher_ask.prompts.PromptPool]).
+
+    Returns:
+        The user's answer, or `None` if the prompt was owed or skipped.
+    """
+    if presence.is_active() is False:
+        log.info("User is away. Postponing prompt until they are back.")
+        metrics.PROMPTS_POSTPONED.inc(question_id=question_id)
+        if not presence.wait_until_active(deadline):
+            # waiting also stops early when the prompt is cancelled
+            if (
+                owed is not None
+                and presence.clock.now() >= deadline
+                and owed.owe()
+            ):
+                log.info(
+                    "User was away until the next prompt. Keeping this one "
+                    "until they are back."
+                )
+                metrics.PROMPTS_OWED.inc(question_id=question_id)
+            else:
+                log.info("User was away until the next prompt. Skipping it.")
+                metrics.PROMPTS_SKIPPED.inc(question_id=question_id)
+            return None
+    answer = ask()
+    if owed is not None and present is not None:
+        for _ in range(owed.settle()):
+            log.info("User is back. Presenting a prompt owed to them.")
+            try:
+                present()
+            except RuntimeError:
+                # the watcher is stopping, and takes no more prompts
+                metrics.PROMPTS_SKIPPED.inc(question_id=question_id)
+    return answer
+
+
+def _log_latencies(log: Any, backend: DialogBackend) -> None:
+    """Logs a summary of the time taken for dialogs to become visible."""
+    if backend.latencies:
+        log.info(
+            "Dialog latency ({}): mean {:.1f}ms, max {:.1f}ms.",
+            backend.name,
+            sum(backend.latencies) / len(backend.latencies) * 1000,
+            max(backend.latencies) * 1000,
+        )
+
+
+def _answer_event(
+    question_id: str,
+    answer: Dict[str, Any],
+    timestamp: Optional[datetime] = None,
+) -> Event:
+    """Wraps an user's answer in an event to be stored in ActivityWatch."""
+    return Event(
+        timestamp=timestamp or get_current_datetime(),
+        data=dict(answer, question_id=question_id),
+    )
+
+
+def _store_answer(
+    log: Any,
+    journal: AnswerJournal,
+    flusher: JournalFlusher,
+    store: AnswerStore,
+    bucket_id: str,
+    question_id: str,
+    answer: Optional[Dict[str, Any]],
+    clock: Clock = SYSTEM_CLOCK,
+    pulsetime: Optional[float] = None,
+) -> None:
+    """Journals an user's answer, to be sent to the server in background.
+
+    The answer is also added to the local store of answers, for analysis.
+    Its timestamp is read from `clock`. Skipped prompts (with no answer) are
+    not stored. If `pulsetime` is given, the answer is merged with the
+    previous one in the bucket when they are identical and at most
+    `pulsetime` seconds apart.
+    """
+    if answer is None:
+        return
+    if not answer["success"]:
+        log.info("Prompt timed out with no response from user.")
+    event = _answer_event(question_id, answer, clock.now())
+    journal.append(bucket_id, event, pulsetime)
+    flusher.notify()
+    store.add(question_id, event)
+    metrics.ANSWERS.inc(
+        question_id=question_id, answered=bool(answer["success"])
+    )
+    log.info("Event stored in bucket '{}'.", bucket_id)
+
+
+def _describe_question(
+    log: Any,
+    journal: AnswerJournal,
+    flusher: JournalFlusher,
+    store: AnswerStore,
+    bucket_id: str,
+    question_id: str,
+    dialog: PreparedDialog,
+    clock: Clock = SYSTEM_CLOCK,
+) -> bool:
+    """Journals the description of a question, if it changed.
+
+    The description (see [`aw_watcher_ask.answers.describe()`]
+    [aw_watcher_ask.answers.describe]) is stored in the bucket as an event of
+    its own, timestamped from `clock`, which applies to the answers stored
+    after it. The local store keeps the latest description journaled for
+    each question, so that the same description is not stored again.
+
+    Returns:
+        Whether the description was journaled.
+    """
+    description = describe(dialog)
+    if not store.describe(bucket_id, question_id, description):
+        return False
+    journal.append(bucket_id, Event(
+        timestamp=clock.now(),
+        data={"question_id": question_id, DESCRIPTION_KEY: description},
+    ))
+    flusher.notify()
+    log.info("Question described in bucket '{}'.", bucket_id)
+    return True
+
+
+def _store_answers(
+    log: Any,
+    journal: AnswerJournal,
+    flusher: JournalFlusher,
+    store: AnswerStore,
+    bucket_ids: Mapping[str, str],
+    answers: Optional[Dict[str, Dict[str, Any]]],
+    clock: Clock = SYSTEM_CLOCK,
+    pulsetimes: Optional[Mapping[str, Optional[float]]] = None,
+) -> None:
+    """Journals the answers to many questions asked at once.
+
+    Works as `_store_answer()`, but answers are journaled in a single write,
+    and sent to the server together. They all share the same timestamp.
+
+    Arguments:
+        bucket_ids: The bucket to store each answer in, by question id.
+        answers: The answer to each question, by question id, or `None` if
+            the prompt was skipped.
+        pulsetimes: The pulsetime of each question, by question id (see
+            `_store_answer()`).
+    """
+    if answers is None:
+        return
+    pulsetimes = pulsetimes or dict()
+    if not any(answer["success"] for answer in answers.values()):
+        log.info("Prompt timed out with no response from user.")
+    timestamp = clock.now()
+    events = {
+        question_id: _answer_event(question_id, answer, timestamp)
+        for question_id, answer in answers.items()
+    }
+    journal.append_many(
+        (bucket_ids[question_id], event, pulsetimes.get(question_id))
+        for question_id, event in events.items()
+    )
+    flusher.notify()
+    for question_id, event in events.items():
+        store.add(question_id, event)
+        metrics.ANSWERS.inc(
+            question_id=question_id,
+            answered=bool(answers[question_id]["success"]),
+        )
+    buckets = sorted({bucket_ids[question_id] for question_id in events})
+    log.info(
+        "{} events stored in buckets {}.",
+        len(events),
+        ", ".join(f"'{bucket_id}'" for bucket_id in buckets),
+    )
 
 
 def main(
@@ -71,6 +398,13 @@ def main(
     until: datetime = datetime(2100, 12, 31),
     timeout: int = 60,
     testing: bool = False,
+    missed: MissedPolicy = MissedPolicy.coalesce,
+    backend: DialogBackendType = DialogBackendType.zenity,
+    overlap: OverlapPolicy = OverlapPolicy.queue,
+    max_concurrent: int = 1,
+    adaptive: bool = False,
+    compact_within: Optional[float] = None,
+    clock: Clock = SYSTEM_CLOCK,
     *args,
     **kwargs,
 ) -> None:
@@ -86,24 +420,23 @@ def main(
         question_id: A short string to identify your question in ActivityWatch
             server records. Should contain only lower-case letters, numbers and
             dots. If `title` is not provided, this will also be the
-            key to identify the content of the answer in the ActivityWatch
-            bucket's raw data.
+            title of the dialog box.
         question_type: The type of dialog box to present the user, provided as
             one of [`aw_watcher_ask.models.DialogType`]
-            [aw_watcher_ask.models.DialogType] enumeration types. Currently,
-            `DialogType.forms`, `DialogType.list` and
-            `DialogType.file_selection` are not supported. Defaults to
+            [aw_watcher_ask.models.DialogType] enumeration types. Defaults to
             `DialogType.question`.
-        title: An optional title for the question. If provided, this
-            will be both the title of the dialog box and the key that
-            identifies the content of the answer in the ActivityWatch bucket's
-            raw data.
+        title: An optional title for the question, shown as the title of
+            the dialog box. Answers are stored under the `value` key of the
+            events' data, and the title in an event describing the question
+            (see [`aw_watcher_ask.answers`][aw_watcher_ask.answers]).
         schedule: A [cron-tab expression](https://en.wikipedia.org/wiki/Cron)
             that controls the execution intervals at which the user should be
             prompted to answer the given question. Accepts 'R' as a keyword at
-            second, minute and hour positions, for prompting at random times.
-            Might be a classic five-element expression, or optionally have a
-            sixth element to indicate the seconds.
+            second, minute and hour positions, for prompting at random times
+            (e.g., `R * * * *` prompts once each hour, at a different random
+            minute). Random times are seeded by the `question_id`, so that
+            they are reproducible. Might be a classic five-element expression,
+            or optionally have a sixth element to indicate the seconds.
         until: A [`datetime.datetime`]
             (https://docs.python.org/3/library/datetime.html#datetime-objects)
             object, that indicates the date and time when to stop gathering
@@ -113,20 +446,52 @@ def main(
         testing: Whether to run the [`aw_client.ActivityWatchClient`]
             (https://docs.activitywatch.net/en/latest/api/python.html
             #aw_client.ActivityWatchClient) client in testing mode.
-        *args: Variable lenght argument list to be passed to [`zenity.show()`]
-            (https://pyzenity.gitbook.io/docs/) Zenity wrapper.
-        **kwargs: Variable lenght argument list to be passed to
-            [`zenity.show()`](https://pyzenity.gitbook.io/docs/) Zenity
-            wrapper.
+        missed: What to do with prompts missed by more than a minute (e.g.,
+            because the system was suspended), provided as one of
+            [`aw_watcher_ask.models.MissedPolicy`]
+            [aw_watcher_ask.models.MissedPolicy] enumeration types. Defaults
+            to `MissedPolicy.coalesce`, which fires a single prompt for all
+            missed ones.
+        backend: How to present dialog boxes to the user, provided as one of
+            [`aw_watcher_ask.models.DialogBackendType`]
+            [aw_watcher_ask.models.DialogBackendType] enumeration types.
+            Defaults to `DialogBackendType.zenity`, which runs a new Zenity
+            process for each prompt.
+        overlap: What to do when the question is prompted again while
+            `max_concurrent` previous prompts are still open, provided as one
+            of [`aw_watcher_ask.models.OverlapPolicy`]
+            [aw_watcher_ask.models.OverlapPolicy] enumeration types. Defaults
+            to `OverlapPolicy.queue`, which presents the new prompt once a
+            previous one is closed.
+        max_concurrent: The maximum number of prompts open at the same time.
+            Defaults to 1.
+        adaptive: Whether to postpone prompts while the user is away from
+            the computer (according to [aw-watcher-afk]
+            (https://docs.activitywatch.net/en/latest/watchers.html
+            #aw-watcher-afk)), until they are back. Prompts of periods the
+            user was away for are presented once they are back (see
+            [`aw_watcher_ask.presence.OwedPrompts`]
+            [aw_watcher_ask.presence.OwedPrompts]). Defaults to `False`.
+        compact_within: If set, consecutive identical answers given at most
+            this many seconds apart are merged into a single event, whose
+            duration spans all of them (as done by ActivityWatch's
+            heartbeats). Defaults to `None`, which stores each answer as a
+            separate event.
+        clock: The source of time for schedules and answers' timestamps (see
+            [`aw_watcher_ask.clock.Clock`][aw_watcher_ask.clock.Clock]).
+            Defaults to the system clock.
+        *args: Variable lenght argument list of flags to be passed to the
+            dialog box (e.g., `"no-wrap"`).
+        **kwargs: Variable lenght argument list of options to be passed to the
+            dialog box (e.g., `text="Are you feeling happy right now?"`).
 
     Raises:
-        NotImplementedError: If the provided `question_type` is one of
-            `DialogType.forms`, `DialogType.list` or
-            `DialogType.file_selection`.
+        ValueError: If an option is not accepted by the type of dialog box
+            (see [`aw_watcher_ask.options`][aw_watcher_ask.options]), or is
+            given an invalid value.
     """
 
-    log_format = "{time} <{extra[question_id]}>: {level} - {message}"
-    logger.add(sys.stderr, level="INFO", format=log_format)
+    logs.ensure_configured()
     log = logger.bind(question_id=question_id)
 
     log.info("Starting new watcher...")
@@ -135,7 +500,7 @@ def main(
     if not is_valid_id(question_id):
         question_id = fix_id(question_id)
         log.warning(
-            f"An invalid question_id was provided. Fixed to `{question_id}`."
+            "An invalid question_id was provided. Fixed to `{}`.", question_id
         )
         log = log.bind(question_id=question_id)
 
@@ -144,51 +509,96 @@ def main(
         system_timezone = get_current_datetime().astimezone().tzinfo
         until = until.replace(tzinfo=system_timezone)
 
+    # validate the dialog's options before anything else, and build it once
+    dialog = _prepare(
+        question_type, question_id, title, timeout, *args, **kwargs
+    )
+
     # start client and bucket
     client = _client_setup(testing=testing)
     log.info(
-        f"Client created and connected to server at {client.server_address}."
+        "Client created and connected to server at {}.", client.server_address
     )
     bucket_id = _bucket_setup(client, question_id)
 
+    # answers are journaled locally, and sent to the server in background
+    journal = _journal_setup(testing=testing)
+    flusher = JournalFlusher(journal, client)
+    flusher.start()
+    store = _store_setup(testing=testing)
+    _describe_question(
+        log, journal, flusher, store, bucket_id, question_id, dialog,
+        clock=clock,
+    )
+
+    dialogs = get_backend(backend)
+
     # execution schedule
-    executions = croniter(schedule, start_time=get_current_datetime())
+    scheduler = Scheduler(missed_policy=missed, clock=clock)
+    scheduler.add(
+        question_id,
+        make_schedule(schedule, start_time=clock.now(), seed=question_id),
+        until=until,
+    )
 
-    # run service
-    while get_current_datetime() < until:
-        # wait until next execution
-        next_execution = executions.get_next(datetime)
-        log.info(
-            f"Next execution scheduled to {next_execution.isoformat()}."
-        )
-        sleep_time = next_execution - get_current_datetime()
-        time.sleep(max(sleep_time.seconds, 0))
+    # prompts wait for the user in background, not to hold up the schedule
+    prompts = PromptPool(max_workers=max_concurrent)
+    store_answer = partial(
+        _store_answer,
+        log,
+        journal,
+        flusher,
+        store,
+        bucket_id,
+        clock=clock,
+        pulsetime=compact_within,
+    )
 
-        log.info(
-            "New prompt fired. Waiting for user input..."
-        )
-        if question_type.value in ["forms", "file-selection", "list"]:
-            # TODO: not implemented
-            answer = _ask_many(
-                question_type=question_type,
-                title=title,
-                timeout=timeout,
-                *args,
-                **kwargs,
+    # prompts are postponed while the user is away, in adaptive mode
+    presence = AfkMonitor(client, clock=clock) if adaptive else None
+    owed = OwedPrompts()
+
+    # run service
+    try:
+        for _ in scheduler.due():
+            log.info(
+                "New prompt fired. Waiting for user input..."
             )
-        else:
-            answer = _ask_one(
-                question_type=question_type,
-                title=(
-                    title if title else question_id
-                ),
-                timeout=timeout,
-                *args,
-                **kwargs,
+            ask = partial(_ask, dialog, backend=dialogs)
+            callback = partial(store_answer, question_id)
+            if presence is not None:
+                ask = partial(
+                    _ask_when_present,
+                    log,
+                    presence,
+                    scheduler.next_execution(question_id) or until,
+                    question_id,
+                    ask,
+                    owed,
+                    # owed prompts wait for the one presenting them
+                    partial(
+                        prompts.submit,
+                        question_id,
+                        ask,
+                        callback=callback,
+                        limit=max_concurrent,
+                        overlap=OverlapPolicy.queue,
+                    ),
+                )
+            prompts.submit(
+                question_id,
+                ask,
+                callback=callback,
+                limit=max_concurrent,
+                overlap=overlap,
             )
-        if not answer["success"]:
-            log.info("Prompt timed out with no response from user.")
-
-        event = Event(timestamp=get_current_datetime(), data=answer)
-        client.insert_event(bucket_id, event)
-        log.info(f"Event stored in bucket '{bucket_id}'.")
+        prompts.shutdown()
+    finally:
+        prompts.shutdown(cancel=True)
+        log.info("Scheduling jitter: {}.", scheduler.jitter)
+        _log_latencies(log, dialogs)
+        dialogs.close()
+        flusher.stop()
+        journal.close()
+        store.close()
+        logs.flush()
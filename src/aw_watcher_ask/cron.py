@@ -0,0 +1,429 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Precompiled cron-tab schedules, with support for random times."""
+
+
+import calendar
+import hashlib
+import random
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+from croniter import croniter
+
+from aw_watcher_ask.utils import get_current_datetime
+
+
+_MASK = (1 << 64) - 1
+
+_ALIASES = {
+    "month": {
+        name.lower(): number
+        for number, name in enumerate(calendar.month_abbr) if name
+    },
+    "weekday": {
+        name.lower(): (number + 1) % 7
+        for number, name in enumerate(calendar.day_abbr)
+    },
+}
+
+# maximum number of carries when looking for the next execution, after which
+# the expression is considered to never match (e.g., `0 0 30 2 *`)
+_MAX_STEPS = 100000
+
+
+def _mix(value: int) -> int:
+    """Scrambles a 64-bit integer (SplitMix64 finalizer)."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+def _seed_value(seed: Union[int, str, None]) -> int:
+    """Converts a seed of any supported type to a 64-bit integer."""
+    if seed is None:
+        return random.getrandbits(64)
+    if isinstance(seed, int):
+        return seed & _MASK
+    digest = hashlib.blake2b(str(seed).encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+class _Field:
+    """A compiled field of a cron-tab expression.
+
+    Allowed values are stored as a lookup table, where each position holds
+    the smallest allowed value greater than or equal to it (or `-1`, if there
+    is none). Random fields (`R`) hold a single value, which is drawn anew for
+    each period of the enclosing field (e.g., for each hour, in the case of a
+    random minute).
+    """
+
+    __slots__ = ("name", "low", "high", "any", "random", "salt", "_next")
+
+    def __init__(
+        self,
+        name: str,
+        low: int,
+        high: int,
+        values: Optional[List[int]],
+        salt: int = 0,
+    ) -> None:
+        self.name = name
+        self.low = low
+        self.high = high
+        self.random = values is None
+        self.any = values is not None and len(values) == high - low + 1
+        self.salt = salt
+        self._next = [-1] * (high + 2)
+        if values is not None:
+            allowed = set(values)
+            following = -1
+            for value in range(high, low - 1, -1):
+                if value in allowed:
+                    following = value
+                self._next[value] = following
+
+    @property
+    def first(self) -> int:
+        return self._next[self.low]
+
+    def next(self, value: int, seed: int = 0, period: int = 0) -> int:
+        """Returns the first allowed value not smaller than the given one."""
+        if self.random:
+            drawn = self.low + (
+                _mix(seed ^ _mix(period * 8 + self.salt))
+                % (self.high - self.low + 1)
+            )
+            return drawn if drawn >= value else -1
+        return self._next[value]
+
+
+def _parse_field(
+    text: str, name: str, low: int, high: int
+) -> Optional[List[int]]:
+    """Parses a cron-tab field into a list of values (`None` if random)."""
+    if text.upper() == "R":
+        if name not in ("second", "minute", "hour"):
+            raise ValueError(f"Random {name} is not supported.")
+        return None
+
+    aliases = _ALIASES.get(name, dict())
+
+    def to_int(token: str) -> int:
+        number = aliases.get(token.lower())
+        if number is None:
+            number = int(token)
+        if name == "weekday" and number == 7:
+            number = 0  # both 0 and 7 stand for Sunday
+        if not low <= number <= high:
+            raise ValueError(f"Value out of range for {name}: {token}.")
+        return number
+
+    values: List[int] = []
+    for token in text.split(","):
+        token, _, step_text = token.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"Invalid step for {name}: {step_text}.")
+        if token in ("*", "?"):
+            start, end = low, high
+        elif "-" in token:
+            start_text, end_text = token.split("-", 1)
+            start, end = to_int(start_text), to_int(end_text)
+            if name == "weekday" and end_text.strip() == "7":
+                end = 7  # e.g., `5-7`, from Friday to Sunday
+        else:
+            start = to_int(token)
+            end = high if step_text else start
+        if start > end:
+            raise ValueError(f"Invalid range for {name}: {token}.")
+        values.extend(
+            value % 7 if name == "weekday" else value
+            for value in range(start, end + 1, step)
+        )
+    return values
+
+
+class CronExpression:
+    """A cron-tab expression, compiled once into lookup tables.
+
+    Supports classic five-element expressions (minute, hour, day of month,
+    month and day of week), optionally followed by a sixth element for the
+    seconds. Each element might be a `*`, a single value, a range (`a-b`), a
+    step (`*/n` or `a-b/n`) or a comma-separated list of those. Months and
+    days of week might be given by their English abbreviations.
+
+    The `R` keyword might be used as the second, minute and hour elements,
+    for a random value to be drawn for each enclosing period. For instance,
+    `R * * * *` fires once each hour, at a different random minute; and
+    `0 R * * *` fires once each day, at the start of a different random hour.
+
+    Arguments:
+        expression: The cron-tab expression.
+
+    Raises:
+        ValueError: If the expression uses an unsupported syntax.
+    """
+
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        elements = expression.split()
+        if len(elements) == 5:
+            elements.append("0")
+        if len(elements) != 6:
+            raise ValueError(
+                f"Expected 5 or 6 elements in expression `{expression}`."
+            )
+        minute, hour, day, month, weekday, second = elements
+
+        self.second = _Field(
+            "second", 0, 59, _parse_field(second, "second", 0, 59), salt=1
+        )
+        self.minute = _Field(
+            "minute", 0, 59, _parse_field(minute, "minute", 0, 59), salt=2
+        )
+        self.hour = _Field(
+            "hour", 0, 23, _parse_field(hour, "hour", 0, 23), salt=3
+        )
+        self.month = _Field(
+            "month", 1, 12, _parse_field(month, "month", 1, 12)
+        )
+        days = _Field("day", 1, 31, _parse_field(day, "day", 1, 31))
+        weekdays = _Field(
+            "weekday", 0, 6, _parse_field(weekday, "weekday", 0, 6)
+        )
+
+        # precompute the allowed days for every possible month layout, given
+        # by its number of days and the day of week it starts on
+        self._days: Dict[Tuple[int, int], List[int]] = dict()
+        for month_length in range(28, 32):
+            for first_weekday in range(7):
+                allowed = [
+                    day_number for day_number in range(1, month_length + 1)
+                    if self._day_matches(
+                        days,
+                        weekdays,
+                        day_number,
+                        (first_weekday + day_number - 1) % 7,
+                    )
+                ]
+                lookup = [-1] * (month_length + 2)
+                following = -1
+                for day_number in range(month_length, 0, -1):
+                    if day_number in allowed:
+                        following = day_number
+                    lookup[day_number] = following
+                self._days[(month_length, first_weekday)] = lookup
+
+    @staticmethod
+    def _day_matches(
+        days: _Field, weekdays: _Field, day: int, weekday: int
+    ) -> bool:
+        day_allowed = days.next(day) == day
+        weekday_allowed = weekdays.next(weekday) == weekday
+        if days.any:
+            return weekday_allowed
+        if weekdays.any:
+            return day_allowed
+        # as in classic cron, restricting both matches either of them
+        return day_allowed or weekday_allowed
+
+    def next_after(self, moment: datetime, seed: int = 0) -> datetime:
+        """Computes the first execution strictly after a given moment.
+
+        Arguments:
+            moment: The reference date and time. The result is computed in
+                (and bears) the same timezone.
+            seed: A 64-bit integer that determines the random values drawn
+                for `R` elements.
+
+        Returns:
+            The date and time of the next execution.
+
+        Raises:
+            ValueError: If the expression never matches any date.
+        """
+        year, month, day = moment.year, moment.month, moment.day
+        hour, minute = moment.hour, moment.minute
+        second = moment.second + 1
+
+        for _ in range(_MAX_STEPS):
+            next_month = self.month.next(month)
+            if next_month < 0:
+                year, month, day, hour, minute, second = (
+                    year + 1, self.month.first, 1, 0, 0, 0
+                )
+                continue
+            if next_month != month:
+                month, day, hour, minute, second = next_month, 1, 0, 0, 0
+
+            month_length = calendar.monthrange(year, month)[1]
+            first_weekday = (date(year, month, 1).weekday() + 1) % 7
+            next_day = self._days[(month_length, first_weekday)][day]
+            if next_day < 0:
+                if month == 12:
+                    year, month = year + 1, 1
+                else:
+                    month += 1
+                day, hour, minute, second = 1, 0, 0, 0
+                continue
+            if next_day != day:
+                day, hour, minute, second = next_day, 0, 0, 0
+
+            days_period = date(year, month, day).toordinal()
+            next_hour = self.hour.next(hour, seed, days_period)
+            if next_hour < 0:
+                day, hour, minute, second = day + 1, 0, 0, 0
+                continue
+            if next_hour != hour:
+                hour, minute, second = next_hour, 0, 0
+
+            hours_period = days_period * 24 + hour
+            next_minute = self.minute.next(minute, seed, hours_period)
+            if next_minute < 0:
+                hour, minute, second = hour + 1, 0, 0
+                continue
+            if next_minute != minute:
+                minute, second = next_minute, 0
+
+            minutes_period = hours_period * 60 + minute
+            next_second = self.second.next(second, seed, minutes_period)
+            if next_second < 0:
+                minute, second = minute + 1, 0
+                continue
+
+            return moment.replace(
+                year=year,
+                month=month,
+                day=day,
+                hour=hour,
+                minute=minute,
+                second=next_second,
+                microsecond=0,
+            )
+
+        raise ValueError(
+            f"Expression `{self.expression}` does not match any date."
+        )
+
+
+@lru_cache(maxsize=None)
+def compile_expression(expression: str) -> CronExpression:
+    """Compiles a cron-tab expression, reusing previously compiled ones."""
+    return CronExpression(expression)
+
+
+class CronSchedule:
+    """An iterator over the executions of a compiled cron-tab expression.
+
+    Mimics the parts of the [`croniter`](https://github.com/kiorky/croniter)
+    interface used by the watcher, so that both can be used interchangeably.
+
+    Arguments:
+        expression: The cron-tab expression (see
+            [`CronExpression`][aw_watcher_ask.cron.CronExpression]).
+        start_time: The date and time after which executions are computed.
+            Defaults to the current (UTC) date and time.
+        seed: An integer or string to make the random (`R`) elements
+            reproducible. If not provided, a random seed is used.
+    """
+
+    def __init__(
+        self,
+        expression: str,
+        start_time: Optional[datetime] = None,
+        seed: Union[int, str, None] = None,
+    ) -> None:
+        self.expression = compile_expression(expression)
+        self.seed = _seed_value(seed)
+        self.set_current(start_time)
+
+    def set_current(self, start_time: Optional[datetime]) -> None:
+        """Resets the iterator, to compute executions after a given time."""
+        if start_time is None:
+            start_time = get_current_datetime()
+        self.current = start_time
+
+    def get_current(self, ret_type: type = datetime) -> datetime:
+        return self.current
+
+    def get_next(self, ret_type: type = datetime) -> datetime:
+        """Advances the iterator, returning the next execution time."""
+        self.current = self.expression.next_after(self.current, self.seed)
+        return self.current
+
+
+Schedule = Union[CronSchedule, croniter]
+
+
+def make_schedule(
+    expression: str,
+    start_time: Optional[datetime] = None,
+    seed: Union[int, str, None] = None,
+) -> Schedule:
+    """Builds an iterator over the executions of a cron-tab expression.
+
+    Expressions are compiled by [`CronExpression`]
+    [aw_watcher_ask.cron.CronExpression] whenever possible. Extended syntaxes
+    it does not support (such as `L`, `W`, `#` or `H`) are handed to
+    [`croniter`](https://github.com/kiorky/croniter) instead.
+
+    Arguments:
+        expression: The cron-tab expression.
+        start_time: The date and time after which executions are computed.
+        seed: An integer or string to make the random (`R`) elements
+            reproducible.
+
+    Returns:
+        An iterator of execution times, with `get_next()` and `set_current()`
+        methods.
+    """
+    try:
+        return CronSchedule(expression, start_time=start_time, seed=seed)
+    except ValueError:
+        return croniter(expression, start_time=start_time)
+
+
+def longest_interval(
+    expression: str,
+    start_time: Optional[datetime] = None,
+    seed: Union[int, str, None] = None,
+    span: float = 8 * 86400.0,
+    max_executions: int = 10000,
+) -> float:
+    """Finds the longest time between consecutive executions of a schedule.
+
+    Executions are listed over `span` seconds (by default, more than a week,
+    to cover the weekly patterns of schedules), and at least two of them.
+
+    Arguments:
+        expression: The cron-tab expression.
+        start_time: The date and time after which executions are listed.
+            Defaults to the current (UTC) date and time.
+        seed: An integer or string to make the random (`R`) elements
+            reproducible.
+        span: The amount of seconds over which executions are listed.
+        max_executions: The maximum number of executions listed.
+
+    Returns:
+        The longest interval between two executions, in seconds.
+    """
+    schedule = make_schedule(
+        expression,
+        start_time=start_time or get_current_datetime(),
+        seed=seed,
+    )
+    first = previous = schedule.get_next(datetime)
+    longest = 0.0
+    for _ in range(max_executions):
+        execution = schedule.get_next(datetime)
+        longest = max(longest, (execution - previous).total_seconds())
+        previous = execution
+        if (execution - first).total_seconds() >= span:
+            break
+    return longest
@@ -0,0 +1,661 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Watcher for posing many questions from a single process."""
+
+
+import json
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple,
+    Optional, Tuple, Union,
+)
+
+from aw_client import ActivityWatchClient
+from loguru import logger
+
+from aw_watcher_ask import logs, metrics
+from aw_watcher_ask.clock import SYSTEM_CLOCK, Clock
+from aw_watcher_ask.coalescing import coalesce, coalescible
+from aw_watcher_ask.core import (
+    _ask,
+    _ask_coalesced,
+    _ask_when_present,
+    _bucket_setup,
+    _client_setup,
+    _describe_question,
+    _journal_setup,
+    _log_latencies,
+    _prepare,
+    _store_answer,
+    _store_answers,
+    _store_setup,
+)
+from aw_watcher_ask.dialogs import PreparedDialog, get_backend
+from aw_watcher_ask.journal import JournalFlusher
+from aw_watcher_ask.cron import make_schedule
+from aw_watcher_ask.models import (
+    DialogBackendType, MissedPolicy, OverlapPolicy, Question
+)
+from aw_watcher_ask.options import validate_options
+from aw_watcher_ask.presence import AfkMonitor, OwedPrompts
+from aw_watcher_ask.prompts import PromptPool
+from aw_watcher_ask.registry import QuestionRegistry, RegisteredQuestion
+from aw_watcher_ask.reloading import FileWatcher, diff_questions
+from aw_watcher_ask.scheduling import Scheduler
+from aw_watcher_ask.utils import fix_id, is_valid_id, get_current_datetime
+
+
+_JSON_TYPES = {
+    str: "a string",
+    int: "an integer",
+    float: "a number",
+    bool: "a boolean",
+    dict: "an object",
+    type(None): "null",
+}
+
+# the JSON types accepted for each parameter of a question
+_PARAMETER_TYPES: Dict[str, Tuple[type, ...]] = {
+    "question_id": (str,),
+    "question_type": (str,),
+    "title": (str, type(None)),
+    "schedule": (str,),
+    "until": (str,),
+    "timeout": (int,),
+    "max_concurrent": (int,),
+    "overlap": (str,),
+    "adaptive": (bool,),
+    "compact_within": (int, float, type(None)),
+    "options": (dict, type(None)),
+}
+
+
+def load_questions(path: Union[str, Path]) -> List[Question]:
+    """Reads question definitions from a JSON configuration file.
+
+    The file must contain an object with a `questions` list, where each item
+    holds the parameters of a single question, as accepted by
+    [`aw_watcher_ask.core.main()`][aw_watcher_ask.core.main]. Extra options
+    to be passed to Zenity go in an optional `options` object, and are
+    validated against the schema of the question's dialog type (see
+    [`aw_watcher_ask.options`][aw_watcher_ask.options]).
+
+    Arguments:
+        path: Path to the configuration file.
+
+    Returns:
+        A list of question definitions.
+
+    Raises:
+        ValueError: If the file is not valid JSON, a question is malformed
+            (e.g., it has no `question_id`, or a parameter of the wrong
+            type) or has invalid options, or two questions share the same
+            `question_id` once fixed (see [`fix_question()`]
+            [aw_watcher_ask.daemon.fix_question]).
+    """
+    with open(path, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+
+    items = config.get("questions") if isinstance(config, dict) else None
+    if not isinstance(items, list):
+        raise ValueError(
+            f"Configuration file {path} must hold a `questions` list."
+        )
+
+    questions = [_load_question(ix, item) for ix, item in enumerate(items)]
+
+    # ids are compared as fixed, since that is how they are posed
+    question_ids: Dict[str, List[str]] = dict()
+    for question in questions:
+        question_id = question.question_id
+        fixed_id = question_id if is_valid_id(question_id) else fix_id(
+            question_id
+        )
+        question_ids.setdefault(fixed_id, []).append(question_id)
+    duplicated = {
+        fixed_id: ids for fixed_id, ids in question_ids.items() if len(ids) > 1
+    }
+    if duplicated:
+        raise ValueError(
+            "Duplicated question ids in configuration file: "
+            + ", ".join(
+                f"`{fixed_id}` (given as "
+                + ", ".join(f"`{question_id}`" for question_id in ids)
+                + ")"
+                for fixed_id, ids in sorted(duplicated.items())
+            )
+        )
+
+    return questions
+
+
+def _load_question(ix: int, item: Any) -> Question:
+    """Reads a single question definition from a configuration file.
+
+    Raises:
+        ValueError: If the definition is malformed, naming the question.
+    """
+    name = f"#{ix + 1}"
+    if isinstance(item, dict) and "question_id" in item:
+        name += f" (`{item['question_id']}`)"
+    try:
+        if not isinstance(item, dict):
+            raise TypeError("not an object")
+        if "question_id" not in item:
+            raise ValueError("missing `question_id`")
+        for key, types in _PARAMETER_TYPES.items():
+            if key in item and not isinstance(item[key], types):
+                raise TypeError(
+                    f"`{key}` must be "
+                    + " or ".join(_JSON_TYPES[t] for t in types)
+                )
+        question = Question.from_dict(item)
+        question.options = validate_options(
+            question.question_type, question.options
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid question {name}: {e}") from e
+    return question
+
+
+def fix_question(question: Question, log: Any = logger) -> Question:
+    """Fixes forbidden characters in a question's id, and naive datetimes.
+
+    Arguments:
+        question: The question to fix, in place.
+        log: The logger to warn about invalid ids.
+
+    Returns:
+        The same question, fixed.
+    """
+    # fix question-id if it was provided with forbidden characters
+    if not is_valid_id(question.question_id):
+        fixed_id = fix_id(question.question_id)
+        log.warning(
+            "An invalid question_id was provided: `{}`. Fixed to `{}`.",
+            question.question_id,
+            fixed_id,
+        )
+        question.question_id = fixed_id
+
+    # fix offset-naive datetimes
+    if not question.until.tzinfo:
+        system_timezone = get_current_datetime().astimezone().tzinfo
+        question.until = question.until.replace(tzinfo=system_timezone)
+
+    return question
+
+
+class PosedQuestion(NamedTuple):
+    """A question being posed, with what is needed to pose it.
+
+    Attributes:
+        question: The question's definition.
+        dialog: The question's dialog box, prepared once.
+        bucket_id: The bucket where answers are stored.
+    """
+
+    question: Question
+    dialog: PreparedDialog
+    bucket_id: str
+
+
+def _prepare_question(question: Question) -> PreparedDialog:
+    """Validates the options of a question, and prepares its dialog box."""
+    return _prepare(
+        question.question_type,
+        question.question_id,
+        question.title,
+        question.timeout,
+        **question.options,
+    )
+
+
+def _schedule_questions(
+    log: Any,
+    client: ActivityWatchClient,
+    scheduler: Scheduler,
+    entries: Iterable[RegisteredQuestion],
+) -> Tuple[Dict[str, Question], Dict[str, str]]:
+    """Creates the buckets of the questions and adds them to a scheduler.
+
+    Questions with a known next execution resume their schedules from it;
+    the others are scheduled from the current time.
+
+    Returns:
+        The scheduled questions and their bucket ids, by question id.
+    """
+    now = scheduler.now()
+    scheduled: Dict[str, Question] = dict()
+    bucket_ids: Dict[str, str] = dict()
+    for question, next_execution in entries:
+        bucket_ids[question.question_id] = _bucket_setup(
+            client, question.question_id
+        )
+        scheduled[question.question_id] = question
+        scheduler.add(
+            question.question_id,
+            make_schedule(
+                question.schedule,
+                start_time=next_execution or now,
+                seed=question.question_id,
+            ),
+            until=question.until,
+            next_execution=next_execution,
+        )
+    log.info("Scheduled {} questions.", len(scheduler))
+    return scheduled, bucket_ids
+
+
+def _reload(
+    log: Any,
+    client: ActivityWatchClient,
+    scheduler: Scheduler,
+    posed: Dict[str, PosedQuestion],
+    path: Union[str, Path],
+    describe_question: Optional[
+        Callable[[str, str, PreparedDialog], Any]
+    ] = None,
+) -> None:
+    """Applies the changes made to the configuration file of the questions.
+
+    Only the questions that changed are prepared again, have their buckets
+    checked, and are described again (by `describe_question`, called with
+    their bucket ids, ids and dialogs; see
+    [`aw_watcher_ask.core._describe_question()`]
+    [aw_watcher_ask.core._describe_question]). Questions whose schedules
+    (or end dates) changed are rescheduled from the current time, and the
+    others keep their next executions. Configuration files that can not be
+    read are ignored, and the questions being posed are kept.
+    """
+    try:
+        questions = [
+            fix_question(question, log) for question in load_questions(path)
+        ]
+        current = {
+            question_id: entry.question for question_id, entry in posed.items()
+        }
+        changes = diff_questions(current, questions)
+        changed = changes.added + changes.rescheduled + changes.updated
+        prepared = {
+            question.question_id: _prepare_question(question)
+            for question in changed
+        }
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        log.error(
+            "Failed to reload questions from {} ({}). Keeping the current "
+            "ones.",
+            path,
+            e,
+        )
+        return
+    if not changes:
+        return
+
+    for question_id in changes.removed:
+        del posed[question_id]
+        if question_id in scheduler:
+            scheduler.remove(question_id)
+    for question in changed:
+        question_id = question.question_id
+        dialog = prepared[question_id]
+        bucket_id = _bucket_setup(client, question_id)
+        posed[question_id] = PosedQuestion(question, dialog, bucket_id)
+        if describe_question is not None:
+            describe_question(bucket_id, question_id, dialog)
+    for question in changes.added + changes.rescheduled:
+        question_id = question.question_id
+        if question_id in scheduler:
+            scheduler.remove(question_id)
+        scheduler.add(
+            question_id,
+            make_schedule(
+                question.schedule,
+                start_time=scheduler.now(),
+                seed=question_id,
+            ),
+            until=question.until,
+        )
+    log.info("Reloaded questions: {}.", changes)
+
+
+def _prompt_groups(
+    scheduler: Scheduler,
+    posed: Mapping[str, PosedQuestion],
+    within: float = 0.0,
+) -> Iterator[List[str]]:
+    """Waits for questions to be due, grouping those to be asked at once.
+
+    When a question that can be presented as a field of a form comes due,
+    the other such questions due in the next `within` seconds are fired
+    along with it (see [`aw_watcher_ask.coalescing`]
+    [aw_watcher_ask.coalescing]). Other questions are fired on their own.
+
+    Yields:
+        The ids of the questions fired together, starting with the one that
+        came due.
+    """
+    window = timedelta(seconds=within)
+    for execution, question_id in scheduler.due():
+        group = [question_id]
+        if within > 0 and coalescible(posed[question_id].dialog):
+            group.extend(
+                other
+                for _, other in scheduler.take(
+                    max(execution, scheduler.now()) + window,
+                    accept=lambda key: (
+                        key not in group and coalescible(posed[key].dialog)
+                    ),
+                )
+            )
+        yield group
+
+
+def _serve(
+    log: Any,
+    entries: Iterable[RegisteredQuestion],
+    testing: bool,
+    missed: MissedPolicy,
+    backend: DialogBackendType,
+    max_workers: int,
+    registry: Optional[QuestionRegistry] = None,
+    clock: Clock = SYSTEM_CLOCK,
+    config: Optional[Union[str, Path]] = None,
+    reload_interval: float = 5.0,
+    coalesce_within: float = 0.0,
+) -> None:
+    """Runs the loop that poses the questions (see `run()`)."""
+    # dialog boxes are validated and built once, and reused by every prompt
+    entries = list(entries)
+    prepared = {
+        question.question_id: _prepare_question(question)
+        for question, _ in entries
+    }
+
+    # start client
+    client = _client_setup(testing=testing)
+    log.info(
+        "Client created and connected to server at {}.", client.server_address
+    )
+
+    # changes to the configuration file are checked while waiting
+    posed: Dict[str, PosedQuestion] = dict()
+    watcher = FileWatcher(config) if config is not None else None
+
+    def reload() -> None:
+        if watcher is not None and watcher.changed():
+            _reload(
+                log,
+                client,
+                scheduler,
+                posed,
+                watcher.path,
+                partial(
+                    _describe_question, log, journal, flusher, store,
+                    clock=clock,
+                ),
+            )
+
+    scheduler = Scheduler(
+        missed_policy=missed,
+        clock=clock,
+        poll=reload if watcher is not None else None,
+        poll_interval=reload_interval,
+    )
+    scheduled, bucket_ids = _schedule_questions(
+        log, client, scheduler, entries
+    )
+
+    # answers are journaled locally, and sent to the server in background
+    journal = _journal_setup(testing=testing)
+    flusher = JournalFlusher(journal, client)
+    flusher.start()
+    store = _store_setup(testing=testing)
+
+    for question_id, question in scheduled.items():
+        bucket_id = bucket_ids[question_id]
+        dialog = prepared[question_id]
+        posed[question_id] = PosedQuestion(question, dialog, bucket_id)
+        _describe_question(
+            log, journal, flusher, store, bucket_id, question_id, dialog,
+            clock=clock,
+        )
+
+    dialogs = get_backend(backend)
+
+    # prompts wait for the user in background, not to hold up the schedule
+    prompts = PromptPool(max_workers=max_workers)
+
+    # prompts of adaptive questions are postponed while the user is away
+    presence = AfkMonitor(client, clock=clock)
+    owed: Dict[str, OwedPrompts] = dict()
+
+    # run service
+    try:
+        for group in _prompt_groups(scheduler, posed, coalesce_within):
+            question, dialog, bucket_id = posed[group[0]]
+            qlog = log.bind(question_id=question.question_id)
+            if registry is not None:
+                for question_id in group:
+                    registry.save_state(
+                        question_id, scheduler.next_execution(question_id)
+                    )
+            if len(group) == 1:
+                qlog.info("New prompt fired. Waiting for user input...")
+                ask = partial(_ask, dialog, backend=dialogs)
+                callback = partial(
+                    _store_answer,
+                    qlog,
+                    journal,
+                    flusher,
+                    store,
+                    bucket_id,
+                    question.question_id,
+                    clock=clock,
+                    pulsetime=question.compact_within,
+                )
+            else:
+                qlog.info(
+                    "New prompt fired, along with {}. Waiting for user "
+                    "input...",
+                    ", ".join(group[1:]),
+                )
+                metrics.PROMPTS_COALESCED.inc(len(group))
+                ask = partial(
+                    _ask_coalesced,
+                    coalesce([
+                        (question_id, posed[question_id].dialog)
+                        for question_id in group
+                    ]),
+                    backend=dialogs,
+                )
+                callback = partial(
+                    _store_answers,
+                    qlog,
+                    journal,
+                    flusher,
+                    store,
+                    {
+                        question_id: posed[question_id].bucket_id
+                        for question_id in group
+                    },
+                    clock=clock,
+                    pulsetimes={
+                        question_id: posed[question_id].question.compact_within
+                        for question_id in group
+                    },
+                )
+            # prompts are postponed up to the next one of any adaptive question
+            deadlines = [
+                scheduler.next_execution(question_id)
+                or posed[question_id].question.until
+                for question_id in group
+                if posed[question_id].question.adaptive
+            ]
+            if deadlines:
+                ask = partial(
+                    _ask_when_present,
+                    qlog,
+                    presence,
+                    min(deadlines),
+                    question.question_id,
+                    ask,
+                    owed.setdefault(question.question_id, OwedPrompts()),
+                    # owed prompts wait for the one presenting them
+                    partial(
+                        prompts.submit,
+                        question.question_id,
+                        ask,
+                        callback=callback,
+                        limit=question.max_concurrent,
+                        overlap=OverlapPolicy.queue,
+                    ),
+                )
+            prompts.submit(
+                question.question_id,
+                ask,
+                callback=callback,
+                limit=question.max_concurrent,
+                overlap=question.overlap,
+            )
+
+        log.info("All questions are past their end dates. Stopping.")
+        prompts.shutdown()
+    finally:
+        prompts.shutdown(cancel=True)
+        log.info("Scheduling jitter: {}.", scheduler.jitter)
+        _log_latencies(log, dialogs)
+        dialogs.close()
+        flusher.stop()
+        journal.close()
+        store.close()
+        logs.flush()
+
+
+def run(
+    questions: Iterable[Question],
+    testing: bool = False,
+    missed: MissedPolicy = MissedPolicy.coalesce,
+    backend: DialogBackendType = DialogBackendType.zenity,
+    max_workers: int = 4,
+    clock: Clock = SYSTEM_CLOCK,
+    config: Optional[Union[str, Path]] = None,
+    reload_interval: float = 5.0,
+    coalesce_within: float = 0.0,
+) -> None:
+    """Poses many questions to the user, sharing a single client and loop.
+
+    Instead of running one [`aw_watcher_ask.core.main()`]
+    [aw_watcher_ask.core.main] loop per question, this keeps the next
+    execution time of every question in a single [`Scheduler`]
+    [aw_watcher_ask.scheduling.Scheduler], and sleeps until the earliest one
+    is due. Prompts are presented from a [`PromptPool`]
+    [aw_watcher_ask.prompts.PromptPool], so that a question left unanswered
+    does not hold up the others.
+
+    Arguments:
+        questions: The questions to pose to the user.
+        testing: Whether to run the [`aw_client.ActivityWatchClient`]
+            (https://docs.activitywatch.net/en/latest/api/python.html
+            #aw_client.ActivityWatchClient) client in testing mode.
+        missed: What to do with prompts missed by more than a minute (e.g.,
+            because the system was suspended). Defaults to
+            `MissedPolicy.coalesce`, which fires a single prompt for all
+            missed ones.
+        backend: How to present dialog boxes to the user. Defaults to
+            `DialogBackendType.zenity`, which runs a new Zenity process for
+            each prompt.
+        max_workers: The maximum number of prompts open at the same time,
+            across all questions. Each question's own limit is given by its
+            `max_concurrent` attribute.
+        clock: The source of time for schedules and answers' timestamps.
+            Defaults to the system clock.
+        config: The configuration file the questions were read from (see
+            [`load_questions()`][aw_watcher_ask.daemon.load_questions]). If
+            given, the file is checked for changes every `reload_interval`
+            seconds, and the changes are applied without restarting: only
+            the questions added or changed are set up, and questions whose
+            schedules did not change keep their next executions.
+        reload_interval: The amount of seconds between checks of `config`.
+        coalesce_within: If positive, questions due within this amount of
+            seconds of each other are presented together, as the fields of a
+            single forms dialog box (see [`aw_watcher_ask.coalescing`]
+            [aw_watcher_ask.coalescing]), sparing dialogs and server writes.
+            Their answers are still stored as one event per question.
+    """
+
+    logs.ensure_configured()
+    log = logger.bind(question_id="*")
+
+    log.info("Starting new watcher daemon...")
+
+    entries = [
+        RegisteredQuestion(fix_question(question, log), None)
+        for question in questions
+    ]
+    _serve(
+        log,
+        entries,
+        testing,
+        missed,
+        backend,
+        max_workers,
+        clock=clock,
+        config=config,
+        reload_interval=reload_interval,
+        coalesce_within=coalesce_within,
+    )
+
+
+def start(
+    registry: QuestionRegistry,
+    testing: bool = False,
+    missed: MissedPolicy = MissedPolicy.coalesce,
+    backend: DialogBackendType = DialogBackendType.zenity,
+    max_workers: int = 4,
+    clock: Clock = SYSTEM_CLOCK,
+    coalesce_within: float = 0.0,
+) -> None:
+    """Poses all questions in a registry, resuming their schedules.
+
+    Works as [`run()`][aw_watcher_ask.daemon.run], but reads the questions
+    from a [`QuestionRegistry`][aw_watcher_ask.registry.QuestionRegistry].
+    Registered questions were already validated, and are scheduled from the
+    next execution times saved in the registry, which are kept up to date as
+    prompts fire. Executions missed while the watcher was not running are
+    handled according to `missed`.
+
+    Arguments:
+        registry: The registry to read the questions from.
+        testing: Whether to run the client in testing mode.
+        missed: What to do with prompts missed by more than a minute.
+        backend: How to present dialog boxes to the user.
+        max_workers: The maximum number of prompts open at the same time,
+            across all questions.
+        clock: The source of time for schedules and answers' timestamps.
+        coalesce_within: The amount of seconds within which questions due
+            are presented together.
+    """
+
+    logs.ensure_configured()
+    log = logger.bind(question_id="*")
+
+    log.info("Starting registered questions...")
+
+    entries = registry.load()
+    log.info("Loaded {} questions from registry.", len(entries))
+    _serve(
+        log,
+        entries,
+        testing,
+        missed,
+        backend,
+        max_workers,
+        registry,
+        clock,
+        coalesce_within=coalesce_within,
+    )
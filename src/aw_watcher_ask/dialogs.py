@@ -0,0 +1,642 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Backends for presenting dialog boxes to the user."""
+
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from loguru import logger
+
+from aw_watcher_ask import metrics
+from aw_watcher_ask.models import DialogBackendType, DialogType
+from aw_watcher_ask.options import validate_options
+
+
+class DialogResult(NamedTuple):
+    """The outcome of presenting a dialog box to the user.
+
+    Attributes:
+        success: Whether the user accepted the dialog (e.g., clicked "OK").
+        content: The raw content of the user's answer.
+        returncode: Zenity's exit code (`0` when accepted, `1` when refused
+            and `5` when timed out), or a negative number if the dialog could
+            not be presented or was cancelled.
+    """
+
+    success: bool
+    content: str
+    returncode: int
+
+
+class PreparedDialog(NamedTuple):
+    """A dialog box validated and ready to be presented, any number of times.
+
+    Attributes:
+        question_type: The type of dialog box.
+        title: The title of the dialog box.
+        options: The options of the dialog, validated against its schema
+            (see [`aw_watcher_ask.options.validate_options()`]
+            [aw_watcher_ask.options.validate_options]).
+        argv: The command line to present the dialog with Zenity.
+        separator: The string that separates the values of each field in
+            the output of dialogs with multiple fields, or `None` for dialogs
+            with a single field.
+        labels: The labels of the fields of `forms` dialogs, in order.
+    """
+
+    question_type: DialogType
+    title: str
+    options: Dict[str, Any]
+    argv: List[str]
+    separator: Optional[str]
+    labels: List[str]
+
+
+# dialog types whose answers have multiple fields
+MULTIPLE_FIELDS = {
+    DialogType.file_selection, DialogType.forms, DialogType.list
+}
+
+
+# the format calendar dialogs output dates in, unless told otherwise
+DATE_FORMAT = "%Y-%m-%d"
+
+
+# return code of dialogs closed by a cancellation (as if sent a SIGTERM)
+CANCELLED = -15
+
+
+class Cancellation:
+    """A handle to close the dialog boxes presented by a worker thread.
+
+    Backends register how to close each dialog as soon as it is presented
+    (see [`cancellable()`][aw_watcher_ask.dialogs.cancellable]). Dialogs
+    presented after the cancellation are closed right away.
+    """
+
+    def __init__(self) -> None:
+        self.cancelled = False
+        self._callbacks: List[Callable[[], None]] = list()
+        self._lock = threading.Lock()
+
+    def register(self, callback: Callable[[], None]) -> None:
+        """Registers a function to be called when cancelled."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> None:
+        """Closes every dialog registered so far, and any to come."""
+        with self._lock:
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, list()
+        for callback in callbacks:
+            try:
+                callback()
+            except (OSError, ValueError) as e:
+                logger.debug("Failed to cancel dialog ({}).", e)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def cancellable(cancellation: Cancellation) -> Iterator[Cancellation]:
+    """Binds a cancellation to the dialogs presented by the current thread."""
+    previous = getattr(_local, "cancellation", None)
+    _local.cancellation = cancellation
+    try:
+        yield cancellation
+    finally:
+        _local.cancellation = previous
+
+
+def on_cancel(callback: Callable[[], None]) -> None:
+    """Registers a callback with the current thread's cancellation, if any.
+
+    Lets anything a prompt waits on, besides dialogs (e.g., the user coming
+    back to the computer), stop waiting when the prompt is cancelled (see
+    [`cancellable()`][aw_watcher_ask.dialogs.cancellable]).
+    """
+    cancellation = getattr(_local, "cancellation", None)
+    if cancellation is not None:
+        cancellation.register(callback)
+
+
+class DialogBackend(ABC):
+    """Interface for presenting dialog boxes to the user.
+
+    Backends keep track of the time between being asked to present a dialog
+    box and the dialog becoming visible to the user.
+    """
+
+    name: str = ""
+
+    def __init__(self) -> None:
+        self.latencies: Deque[float] = deque(maxlen=1000)
+
+    def _record_latency(self, latency: float) -> None:
+        """Records the time a dialog box took to become visible."""
+        self.latencies.append(latency)
+        metrics.DIALOG_LATENCY.observe(latency, backend=self.name)
+
+    @abstractmethod
+    def show(
+        self,
+        question_type: DialogType,
+        title: str,
+        *args,
+        **kwargs,
+    ) -> DialogResult:
+        """Presents a dialog box to the user, and waits for the answer.
+
+        Arguments:
+            question_type: The type of dialog box to present.
+            title: The title of the dialog box.
+            *args: Flags to be passed to the dialog (e.g., `"no-wrap"`).
+            **kwargs: Options to be passed to the dialog (e.g.,
+                `timeout=60`).
+
+        Returns:
+            The user's answer.
+        """
+
+    def show_prepared(self, dialog: PreparedDialog) -> DialogResult:
+        """Presents a prepared dialog box to the user.
+
+        Works as `show()`, with the options of the prepared dialog. Backends
+        might reuse what was prepared ahead (e.g., Zenity's command line).
+        """
+        return self.show(dialog.question_type, dialog.title, **dialog.options)
+
+    def show_fields_prepared(
+        self, dialog: PreparedDialog
+    ) -> Tuple[bool, List[str], int]:
+        """Presents a prepared dialog box with multiple fields to the user.
+
+        Works as `show_fields()`, with the options and separator of the
+        prepared dialog.
+        """
+        options = dict(dialog.options)
+        separator = options.pop("separator", dialog.separator or "|")
+        return self.show_fields(
+            dialog.question_type, dialog.title, separator, **options
+        )
+
+    def show_fields(
+        self,
+        question_type: DialogType,
+        title: str,
+        separator: str = "|",
+        *args,
+        **kwargs,
+    ) -> Tuple[bool, List[str], int]:
+        """Presents a dialog box with multiple fields to the user.
+
+        Arguments:
+            question_type: The type of dialog box to present.
+            title: The title of the dialog box.
+            separator: The string that separates the values of each field in
+                the dialog's output.
+            *args: Flags to be passed to the dialog (e.g., `"multiple"`).
+            **kwargs: Options to be passed to the dialog (e.g.,
+                `timeout=60`).
+
+        Returns:
+            Whether the user accepted the dialog, the values of each field,
+            and the dialog's return code.
+        """
+        result = self.show(
+            question_type, title, *args, separator=separator, **kwargs
+        )
+        fields = result.content.split(separator) if result.content else []
+        return result.success, fields, result.returncode
+
+    def close(self) -> None:
+        """Releases any resources held by the backend."""
+
+
+def iter_fields(
+    stream: IO[bytes], separator: str, chunk_size: int = 4096
+) -> Iterator[str]:
+    """Splits separator-delimited values from a stream, as they are read.
+
+    Arguments:
+        stream: A binary stream with values separated by `separator`, and
+            optionally terminated by a new line.
+        separator: The string that separates values.
+        chunk_size: The maximum amount of bytes read at once.
+
+    Yields:
+        Each of the values in the stream.
+    """
+    delimiter = separator.encode("utf-8")
+    buffer = b""
+    empty = True
+    while True:
+        chunk = stream.read1(chunk_size)  # type: ignore
+        if not chunk:
+            break
+        empty = False
+        buffer += chunk
+        *complete, buffer = buffer.split(delimiter)
+        for value in complete:
+            yield value.decode("utf-8", errors="replace")
+    if not empty:
+        # the last value is terminated by a new line, instead of a separator
+        yield buffer.rstrip(b"\r\n").decode("utf-8", errors="replace")
+
+
+def form_labels(**kwargs) -> List[str]:
+    """Lists the labels of the fields added to a forms dialog, in order."""
+    labels: List[str] = []
+    for option, value in kwargs.items():
+        option = option.replace("_", "-")
+        if not option.startswith("add-"):
+            continue
+        labels.extend(value if isinstance(value, (list, tuple)) else [value])
+    return labels
+
+
+def zenity_argv(
+    question_type: DialogType, title: str, *args, **kwargs
+) -> List[str]:
+    """Builds the command line to present a dialog box with Zenity."""
+    argv = ["zenity", f"--{question_type.value}", f"--title={title}"]
+    argv.extend(f"--{flag}" for flag in args)
+    for option, value in kwargs.items():
+        option = option.replace("_", "-")
+        if value is True:
+            argv.append(f"--{option}")
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, (list, tuple)):
+            argv.extend(f"--{option}={item}" for item in value)
+        else:
+            argv.append(f"--{option}={value}")
+    return argv
+
+
+def prepare_dialog(
+    question_type: DialogType, title: str, *args, **kwargs
+) -> PreparedDialog:
+    """Validates the options of a dialog box, and prepares it to be presented.
+
+    Options are checked once, against the schema of the dialog type (see
+    [`aw_watcher_ask.options`][aw_watcher_ask.options]), so that invalid
+    ones are reported right away rather than when the dialog is due. Zenity's
+    command line is also built once, and reused by every prompt.
+
+    Arguments:
+        question_type: The type of dialog box to present.
+        title: The title of the dialog box.
+        *args: Flags to be passed to the dialog (e.g., `"no-wrap"`).
+        **kwargs: Options to be passed to the dialog (e.g., `timeout=60`).
+
+    Returns:
+        The prepared dialog box.
+
+    Raises:
+        ValueError: If an option is not accepted by the dialog type, or is
+            given an invalid value.
+    """
+    options = validate_options(
+        question_type, dict(kwargs, **{flag: True for flag in args})
+    )
+    separator = None
+    if question_type in MULTIPLE_FIELDS:
+        separator = options.setdefault("separator", "|")
+    if question_type == DialogType.calendar:
+        # dates are read back in a known format, rather than the locale's
+        options.setdefault("date-format", DATE_FORMAT)
+    return PreparedDialog(
+        question_type=question_type,
+        title=title,
+        options=options,
+        argv=zenity_argv(question_type, title, **options),
+        separator=separator,
+        labels=form_labels(**options),
+    )
+
+
+class ZenityBackend(DialogBackend):
+    """Presents each dialog box by running a new Zenity process.
+
+    Zenity gives no signal of when its window becomes visible, so the latency
+    recorded is the time taken to spawn the process. The toolkit startup that
+    follows is not accounted for.
+    """
+
+    name = "zenity"
+
+    def _run(self, argv: List[str]) -> subprocess.Popen:
+        """Starts a Zenity process, and binds it to the current prompt."""
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._record_latency(time.perf_counter() - start)
+        on_cancel(process.terminate)
+        return process
+
+    def _result(self, argv: List[str]) -> DialogResult:
+        process = self._run(argv)
+        stdout, _ = process.communicate()
+        return DialogResult(
+            success=process.returncode == 0,
+            content=stdout.decode("utf-8", errors="replace").strip(),
+            returncode=process.returncode,
+        )
+
+    def _fields(
+        self, argv: List[str], separator: str
+    ) -> Tuple[bool, List[str], int]:
+        process = self._run(argv)
+        fields = list(iter_fields(process.stdout, separator))
+        process.wait()
+        return process.returncode == 0, fields, process.returncode
+
+    def show(
+        self,
+        question_type: DialogType,
+        title: str,
+        *args,
+        **kwargs,
+    ) -> DialogResult:
+        return self._result(zenity_argv(question_type, title, *args, **kwargs))
+
+    def show_prepared(self, dialog: PreparedDialog) -> DialogResult:
+        return self._result(dialog.argv)
+
+    def show_fields(
+        self,
+        question_type: DialogType,
+        title: str,
+        separator: str = "|",
+        *args,
+        **kwargs,
+    ) -> Tuple[bool, List[str], int]:
+        argv = zenity_argv(
+            question_type, title, *args, separator=separator, **kwargs
+        )
+        return self._fields(argv, separator)
+
+    def show_fields_prepared(
+        self, dialog: PreparedDialog
+    ) -> Tuple[bool, List[str], int]:
+        return self._fields(dialog.argv, dialog.separator or "|")
+
+
+class _PendingRequest:
+    """A request sent to the dialog helper, waiting for its result."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.result: Optional[DialogResult] = None
+        self.done = threading.Event()
+
+    def resolve(self, result: DialogResult) -> None:
+        self.result = result
+        self.done.set()
+
+
+class ResidentBackend(DialogBackend):
+    """Presents dialog boxes through a long-lived helper process.
+
+    The helper process is started once, and keeps its graphical toolkit
+    initialized between prompts. It receives requests and sends responses as
+    JSON lines, over its standard input and output. Each request is an object
+    with an `id`, the `question_type`, the `title`, and any other `options`;
+    the helper replies with a `{"id": ..., "event": "visible"}` message as
+    soon as the dialog is shown, and a `{"id": ..., "event": "result",
+    "success": ..., "content": ..., "returncode": ...}` message when it is
+    closed. A `{"id": ..., "event": "cancel"}` request closes the dialog
+    (or drops the request, if not shown yet).
+
+    Many threads might present dialogs at the same time: their requests are
+    sent to the same helper, and the responses are dispatched back by `id`.
+
+    Dialog types the helper does not support (replied with a `returncode` of
+    `-2`) are handed to a fallback backend. So are all dialogs for a while
+    after the helper fails to run (e.g., with no display, or no Tk), rather
+    than starting it again for each of them.
+
+    Arguments:
+        command: The command line to start the helper process. Defaults to
+            the Tk-based helper bundled with aw-watcher-ask.
+        fallback: The backend to use for unsupported dialog types. Defaults
+            to a [`ZenityBackend`][aw_watcher_ask.dialogs.ZenityBackend].
+        retry_after: The amount of seconds to wait after the helper fails
+            before starting it again.
+    """
+
+    name = "resident"
+
+    def __init__(
+        self,
+        command: Optional[List[str]] = None,
+        fallback: Optional[DialogBackend] = None,
+        retry_after: float = 300.0,
+    ) -> None:
+        super().__init__()
+        self.command = command or [
+            sys.executable, "-m", "aw_watcher_ask.tk_worker"
+        ]
+        self.fallback = fallback or ZenityBackend()
+        self.retry_after = retry_after
+        self._process: Optional[subprocess.Popen] = None
+        # when the helper last failed to run, as told by time.monotonic()
+        self._failed_at: Optional[float] = None
+        self._pending: Dict[int, _PendingRequest] = dict()
+        # guards starting the helper, and writing to its standard input
+        self._lock = threading.Lock()
+        self._ids = count()
+
+    def _worker(self) -> Tuple[subprocess.Popen, Dict[int, _PendingRequest]]:
+        if self._process is None or self._process.poll() is not None:
+            logger.debug("Starting dialog helper: {}", self.command)
+            self._process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                bufsize=1,
+                universal_newlines=True,
+            )
+            # requests are bound to the helper process that received them
+            self._pending = dict()
+            threading.Thread(
+                target=self._read,
+                args=(self._process, self._pending),
+                name="dialog-helper-reader",
+                daemon=True,
+            ).start()
+        return self._process, self._pending
+
+    def _read(
+        self,
+        process: subprocess.Popen,
+        pending: Dict[int, _PendingRequest],
+    ) -> None:
+        """Dispatches the helper's responses to the waiting requests."""
+        try:
+            for line in process.stdout:
+                message = json.loads(line)
+                request = pending.get(message.get("id"))
+                if request is None:
+                    continue
+                self._failed_at = None
+                if message["event"] == "visible":
+                    self._record_latency(time.perf_counter() - request.start)
+                elif message["event"] == "result":
+                    request.resolve(DialogResult(
+                        success=message["success"],
+                        content=message["content"],
+                        returncode=message["returncode"],
+                    ))
+        except (OSError, ValueError) as e:
+            logger.warning("Dialog helper failed ({}).", e)
+        with self._lock:
+            if self._process is process:
+                self._process = None
+            # helper exited before answering: it is probably unable to run
+            for request in pending.values():
+                if not request.done.is_set():
+                    self._failed(request)
+
+    def _failed(self, request: _PendingRequest) -> None:
+        """Hands a request to the fallback backend, as the helper failed."""
+        if self._failed_at is None:
+            logger.warning(
+                "Dialog helper is unavailable. Presenting dialogs with {} "
+                "for the next {:.0f} seconds.",
+                self.fallback.name or type(self.fallback).__name__,
+                self.retry_after,
+            )
+        self._failed_at = time.monotonic()
+        request.resolve(DialogResult(False, "", -2))
+
+    def _send(
+        self, process: subprocess.Popen, message: Dict[str, Any]
+    ) -> None:
+        process.stdin.write(json.dumps(message) + "\n")
+        process.stdin.flush()
+
+    def _cancel(self, process: subprocess.Popen, request_id: int) -> None:
+        with self._lock:
+            self._send(process, {"id": request_id, "event": "cancel"})
+
+    def _request(
+        self,
+        question_type: DialogType,
+        title: str,
+        options: Dict[str, Any],
+    ) -> DialogResult:
+        """Presents a dialog through the helper, and waits for the answer."""
+        request_id = next(self._ids)
+        request = _PendingRequest()
+        try:
+            with self._lock:
+                if (
+                    self._failed_at is not None
+                    and time.monotonic() - self._failed_at < self.retry_after
+                ):
+                    return DialogResult(False, "", -2)
+                process, pending = self._worker()
+                pending[request_id] = request
+                self._send(process, {
+                    "id": request_id,
+                    "question_type": question_type.value,
+                    "title": title,
+                    "options": options,
+                })
+        except (OSError, ValueError) as e:
+            logger.warning("Dialog helper failed ({}).", e)
+            self.close()
+            self._failed(request)
+            return request.result  # type: ignore
+        on_cancel(lambda: self._cancel(process, request_id))
+        request.done.wait()
+        pending.pop(request_id, None)
+        return request.result  # type: ignore
+
+    def show(
+        self,
+        question_type: DialogType,
+        title: str,
+        *args,
+        **kwargs,
+    ) -> DialogResult:
+        options = dict(kwargs, **{flag: True for flag in args})
+        result = self._request(question_type, title, options)
+        if result.returncode == -2:
+            return self.fallback.show(question_type, title, *args, **kwargs)
+        return result
+
+    def show_prepared(self, dialog: PreparedDialog) -> DialogResult:
+        result = self._request(
+            dialog.question_type, dialog.title, dialog.options
+        )
+        if result.returncode == -2:
+            return self.fallback.show_prepared(dialog)
+        return result
+
+    def show_fields(
+        self,
+        question_type: DialogType,
+        title: str,
+        separator: str = "|",
+        *args,
+        **kwargs,
+    ) -> Tuple[bool, List[str], int]:
+        # dialogs with multiple fields are not supported by the helper
+        return self.fallback.show_fields(
+            question_type, title, separator, *args, **kwargs
+        )
+
+    def show_fields_prepared(
+        self, dialog: PreparedDialog
+    ) -> Tuple[bool, List[str], int]:
+        return self.fallback.show_fields_prepared(dialog)
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def get_backend(backend_type: DialogBackendType) -> DialogBackend:
+    """Builds a dialog backend of the given type."""
+    if backend_type == DialogBackendType.resident:
+        return ResidentBackend()
+    return ZenityBackend()
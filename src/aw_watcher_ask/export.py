@@ -0,0 +1,332 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Streaming export of the answers stored in ActivityWatch."""
+
+
+import csv
+import json
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Any,
+    Collection,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+
+from aw_watcher_ask.answers import is_description, split_answer
+from aw_watcher_ask.utils import get_current_datetime
+
+
+# where to start exporting buckets with no known creation date
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ExportRow(NamedTuple):
+    """An answer, flattened to be written as a table row.
+
+    Attributes:
+        id: The id of the event in ActivityWatch.
+        timestamp: The date and time of the answer.
+        duration: The amount of seconds the answer spans (e.g., for merged
+            repeated answers).
+        question_id: The question answered.
+        success: Whether the user accepted the dialog.
+        title: The title of the dialog, for answers keyed by it in the
+            event's data (see [`aw_watcher_ask.answers`]
+            [aw_watcher_ask.answers]). Answers stored under the `value` key
+            have no title: it is stored in events describing the question.
+        answer: The content of the answer, JSON-encoded unless it is a
+            string.
+        hostname: The host where the answer was given, if known (e.g., when
+            aggregating answers from many hosts).
+    """
+
+    id: Optional[int]
+    timestamp: datetime
+    duration: float
+    question_id: Optional[str]
+    success: Optional[bool]
+    title: Optional[str]
+    answer: Optional[str]
+    hostname: Optional[str] = None
+
+
+class HostEvent(NamedTuple):
+    """An event read from the bucket of a given host.
+
+    Attributes:
+        hostname: The host where the event was recorded.
+        event: The event.
+    """
+
+    hostname: str
+    event: Event
+
+
+# events to export, optionally tagged with their hosts
+Exportable = Union[Event, HostEvent]
+
+
+def _unpack(item: Exportable) -> Tuple[Optional[str], Event]:
+    """Splits an event to export from its host, if any."""
+    if isinstance(item, HostEvent):
+        return item.hostname, item.event
+    return None, item
+
+
+def _bucket_start(
+    client: ActivityWatchClient, bucket_id: str
+) -> datetime:
+    """Returns when a bucket was created, or the epoch if unknown."""
+    buckets = client.get_buckets()
+    if bucket_id not in buckets:
+        raise ValueError(f"There is no bucket `{bucket_id}` in the server.")
+    created = buckets[bucket_id].get("created")
+    if not created:
+        return EPOCH
+    created = datetime.fromisoformat(created)
+    if not created.tzinfo:
+        created = created.replace(tzinfo=timezone.utc)
+    return created
+
+
+def iter_events(
+    client: ActivityWatchClient,
+    bucket_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page_size: int = 1000,
+    window: float = 86400.0,
+) -> Iterator[Event]:
+    """Reads the events of a bucket in chronological order, page by page.
+
+    Events are requested in consecutive time windows, each holding at most
+    `page_size` events, so that only a page is kept in memory at a time
+    however large the bucket is. Windows adapt to the density of events:
+    a window that would hold more events than a page is split in halves,
+    and windows holding few events are doubled.
+
+    Arguments:
+        client: The client used to reach the server.
+        bucket_id: The bucket to read.
+        start: The earliest date and time to read. Defaults to the bucket's
+            creation.
+        end: The latest date and time to read. Defaults to now.
+        page_size: The maximum number of events requested at once.
+        window: The amount of seconds covered by the first request.
+
+    Yields:
+        The events in the bucket starting between `start` and `end`, from
+        the earliest to the latest. Each event is yielded once, even if it
+        lasts over many windows.
+
+    Raises:
+        ValueError: If the bucket does not exist.
+    """
+    if start is None:
+        start = _bucket_start(client, bucket_id)
+    if end is None:
+        end = get_current_datetime()
+    span = timedelta(seconds=window)
+    shortest = timedelta(seconds=1)
+    # events at the boundary of two windows are returned by both
+    previous_ids: Set[Any] = set()
+    since = start
+    while since <= end:
+        until = min(since + span, end)
+        page = client.get_events(
+            bucket_id, limit=page_size, start=since, end=until
+        )
+        page.sort(key=lambda event: event.timestamp)
+        # only the latest events of the window are returned, so a full
+        # page holds every event starting in the window only if it also
+        # holds events overlapping the window but starting before it
+        if len(page) >= page_size and page[0].timestamp >= since:
+            if span > shortest:
+                span /= 2
+                continue
+            # too many events at once to split them further
+            page = client.get_events(bucket_id, start=since, end=until)
+            page.sort(key=lambda event: event.timestamp)
+
+        # events starting before the window were read with an earlier
+        # window (or are before `start`)
+        page = [event for event in page if event.timestamp >= since]
+        for event in page:
+            if event.id is None or event.id not in previous_ids:
+                yield event
+        previous_ids = {event.id for event in page}
+
+        if until >= end:
+            break
+        since = until
+        if len(page) * 4 < page_size:
+            span = min(span * 2, end - start)
+
+
+def filter_events(
+    events: Iterable[Event], question_ids: Optional[Collection[str]] = None
+) -> Iterator[Event]:
+    """Keeps only the answers to some questions.
+
+    Events describing the questions (see [`aw_watcher_ask.answers`]
+    [aw_watcher_ask.answers]) are left out as well.
+
+    Arguments:
+        events: The events to filter.
+        question_ids: The questions to keep. Defaults to all questions.
+
+    Yields:
+        The answers to the given questions, in the same order.
+    """
+    question_ids = set(question_ids or ())
+    for event in events:
+        if is_description(event.data):
+            continue
+        if not question_ids or event.data.get("question_id") in question_ids:
+            yield event
+
+
+def to_row(event: Event, hostname: Optional[str] = None) -> ExportRow:
+    """Flattens an answer into a table row."""
+    title, content = split_answer(event.data)
+    answer = content
+    if content is not None and not isinstance(content, str):
+        answer = json.dumps(content, ensure_ascii=False)
+    return ExportRow(
+        id=event.id,
+        timestamp=event.timestamp,
+        duration=event.duration.total_seconds(),
+        question_id=event.data.get("question_id"),
+        success=event.data.get("success"),
+        title=title,
+        answer=answer,
+        hostname=hostname,
+    )
+
+
+def _rows(events: Iterable[Exportable]) -> Iterator[ExportRow]:
+    """Flattens events to export, tagged with their hosts or not."""
+    for item in events:
+        hostname, event = _unpack(item)
+        yield to_row(event, hostname)
+
+
+def write_ndjson(events: Iterable[Exportable], file: TextIO) -> int:
+    """Writes events as newline-delimited JSON, one event per line.
+
+    Arguments:
+        events: The events to write. Events tagged with their hosts are
+            written with a `hostname` key.
+        file: An open text file to write to.
+
+    Returns:
+        The number of events written.
+    """
+    count = 0
+    for item in events:
+        hostname, event = _unpack(item)
+        record = event.to_json_dict()
+        if hostname is not None:
+            record["hostname"] = hostname
+        file.write(json.dumps(record, ensure_ascii=False))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(
+    events: Iterable[Exportable], file: TextIO, header: bool = True
+) -> int:
+    """Writes answers as comma-separated values, one answer per row.
+
+    Arguments:
+        events: The events to write, optionally tagged with their hosts.
+        file: An open text file to write to.
+        header: Whether to start with a header row (e.g., unless appending
+            to a previous export).
+
+    Returns:
+        The number of events written.
+    """
+    writer = csv.writer(file)
+    if header:
+        writer.writerow(ExportRow._fields)
+    count = 0
+    for row in _rows(events):
+        writer.writerow(row._replace(timestamp=row.timestamp.isoformat()))
+        count += 1
+    return count
+
+
+def write_parquet(
+    events: Iterable[Exportable],
+    path: Union[str, Path],
+    batch_size: int = 10000,
+) -> int:
+    """Writes answers to an Apache Parquet file, in row groups.
+
+    Requires [pyarrow](https://arrow.apache.org/docs/python/), which is
+    installed with the `parquet` extra of aw-watcher-ask. Only a row group
+    of answers is kept in memory at a time.
+
+    Arguments:
+        events: The events to write, optionally tagged with their hosts.
+        path: The path of the file to write.
+        batch_size: The number of answers in each row group.
+
+    Returns:
+        The number of events written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Exporting to Parquet requires pyarrow. Install it with "
+            "`pip install aw-watcher-ask[parquet]`."
+        ) from None
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("duration", pa.float64()),
+        ("question_id", pa.string()),
+        ("success", pa.bool_()),
+        ("title", pa.string()),
+        ("answer", pa.string()),
+        ("hostname", pa.string()),
+    ])
+    rows = _rows(events)
+    count = 0
+    with pq.ParquetWriter(str(path), schema) as writer:
+        while True:
+            batch: List[ExportRow] = list(islice(rows, batch_size))
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_pydict(
+                {
+                    name: [row[ix] for row in batch]
+                    for ix, name in enumerate(ExportRow._fields)
+                },
+                schema=schema,
+            ))
+            count += len(batch)
+    return count
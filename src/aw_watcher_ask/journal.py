@@ -0,0 +1,402 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Local write-ahead journal for answers not yet sent to ActivityWatch."""
+
+
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import groupby
+from pathlib import Path
+from typing import (
+    Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+)
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+from aw_transform.heartbeats import heartbeat_merge
+from loguru import logger
+
+from aw_watcher_ask import metrics
+from aw_watcher_ask.answers import is_answer
+
+
+class JournalEntry(NamedTuple):
+    """An event in the journal, yet to be sent to the server.
+
+    Attributes:
+        entry_id: The id of the entry in the journal.
+        bucket_id: The bucket to store the event in.
+        event: The event to store.
+        pulsetime: If not `None`, the event is merged with the previous
+            answer to the same question, if identical and given at most this
+            many seconds after it ended, instead of being stored apart.
+    """
+
+    entry_id: int
+    bucket_id: str
+    event: Event
+    pulsetime: Optional[float]
+
+
+class AnswerJournal:
+    """An append-only, SQLite-backed journal of events to be stored.
+
+    Events are written to the journal before any attempt to send them to the
+    ActivityWatch server, and only removed from it once the server has
+    acknowledged them. This way, answers survive crashes and server downtimes.
+    An answer might be sent twice if the watcher crashes between sending it
+    and acknowledging it, but it is never lost.
+
+    Arguments:
+        path: Path to the journal file. Use `":memory:"` for a transient
+            in-memory journal.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "bucket_id TEXT NOT NULL, "
+            "event TEXT NOT NULL, "
+            "pulsetime REAL"
+            ")"
+        )
+        # journals written by older versions have no heartbeats
+        columns = {
+            row[1] for row in self._conn.execute("PRAGMA table_info(journal)")
+        }
+        if "pulsetime" not in columns:
+            self._conn.execute("ALTER TABLE journal ADD COLUMN pulsetime REAL")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM journal"
+            ).fetchone()
+        return count
+
+    def append(
+        self,
+        bucket_id: str,
+        event: Event,
+        pulsetime: Optional[float] = None,
+    ) -> int:
+        """Writes a new event to the journal, returning its entry id.
+
+        Arguments:
+            bucket_id: The bucket to store the event in.
+            event: The event to store.
+            pulsetime: If given, the event is merged with the last event
+                sent for the same question, if they have the same data and
+                are at most `pulsetime` seconds apart.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO journal (bucket_id, event, pulsetime) "
+                "VALUES (?, ?, ?)",
+                (bucket_id, event.to_json_str(), pulsetime),
+            )
+        return cursor.lastrowid
+
+    def append_many(
+        self, entries: Iterable[Tuple[str, Event, Optional[float]]]
+    ) -> None:
+        """Writes many events to the journal, in a single transaction.
+
+        Arguments:
+            entries: The bucket ids, events and pulsetimes of the events to
+                store (see `append()`).
+        """
+        rows = [
+            (bucket_id, event.to_json_str(), pulsetime)
+            for bucket_id, event, pulsetime in entries
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO journal (bucket_id, event, pulsetime) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def entries(self, limit: int = 100) -> List[JournalEntry]:
+        """Returns the oldest entries yet to be acknowledged by the server.
+
+        Arguments:
+            limit: The maximum number of entries to return.
+
+        Returns:
+            The entries, in the order they were appended.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, bucket_id, event, pulsetime FROM journal "
+                "ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            JournalEntry(
+                entry_id, bucket_id, Event(**json.loads(event)), pulsetime
+            )
+            for entry_id, bucket_id, event, pulsetime in rows
+        ]
+
+    def ack(self, entry_ids: Iterable[int]) -> None:
+        """Removes entries already stored in the server from the journal."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM journal WHERE id = ?",
+                [(entry_id,) for entry_id in entry_ids],
+            )
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class JournalFlusher(threading.Thread):
+    """Drains journaled events to the ActivityWatch server in the background.
+
+    Pending events are sent in batches, with one request per bucket. Events
+    journaled with a pulse time are merged with the last event sent for the
+    same question, as ActivityWatch merges heartbeats; this is done locally,
+    as the server only merges a heartbeat with the last event of the bucket,
+    which is seldom an answer to the same question. After a new event is
+    appended to the journal, the flusher keeps gathering events for up to
+    `batch_window` seconds, or until `batch_size` events are pending, before
+    sending them all together. If the server cannot be
+    reached, the flusher waits before retrying, doubling the waiting time
+    after each consecutive failure.
+
+    Arguments:
+        journal: The journal to drain.
+        client: The client used to send the events to the server.
+        batch_size: The maximum number of events sent at once.
+        batch_window: The maximum amount of seconds to hold a new event,
+            waiting for others to be sent along with it. Use `0` to send
+            events as soon as they are appended.
+        interval: The amount of seconds between checks for pending events,
+            when no new events are appended.
+        min_backoff: The amount of seconds to wait after a first failure.
+        max_backoff: The maximum amount of seconds to wait between retries.
+    """
+
+    def __init__(
+        self,
+        journal: AnswerJournal,
+        client: ActivityWatchClient,
+        batch_size: int = 100,
+        batch_window: float = 1.0,
+        interval: float = 5.0,
+        min_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ) -> None:
+        super().__init__(name="aw-watcher-ask-flusher", daemon=True)
+        self.journal = journal
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.interval = interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._appended = 0
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        # the last event sent for each question, by bucket and question id
+        self._last: Dict[Tuple[str, Optional[str]], Event] = dict()
+        metrics.JOURNAL_PENDING.set_function(journal.__len__)
+
+    def notify(self) -> None:
+        """Signals that a new event was appended to the journal."""
+        with self._condition:
+            self._appended += 1
+            self._condition.notify()
+
+    def _wait_batch(self) -> None:
+        """Waits for a batch of new events to be appended to the journal."""
+        with self._condition:
+            # wait for a first event
+            self._condition.wait_for(
+                lambda: self._appended or self._stopping.is_set(),
+                timeout=self.interval,
+            )
+            # then gather events until the window closes or the batch is full
+            if self._appended and self.batch_window > 0:
+                self._condition.wait_for(
+                    lambda: (
+                        self._appended >= self.batch_size
+                        or self._stopping.is_set()
+                    ),
+                    timeout=self.batch_window,
+                )
+            self._appended = 0
+
+    def flush(self) -> int:
+        """Sends pending events to the server, until the journal is empty.
+
+        Returns:
+            The number of events sent.
+
+        Raises:
+            requests.RequestException: If the server could not be reached.
+        """
+        sent = 0
+        with self._flush_lock:
+            while True:
+                entries = self.journal.entries(limit=self.batch_size)
+                if not entries:
+                    return sent
+
+                # group events per bucket, keeping their order
+                batches: "OrderedDict[str, List[JournalEntry]]" = (
+                    OrderedDict()
+                )
+                for entry in entries:
+                    batches.setdefault(entry.bucket_id, []).append(entry)
+
+                for bucket_id, batch in batches.items():
+                    # inserts and heartbeats are sent in the order they came
+                    for pulsetime, run in groupby(
+                        batch, key=lambda entry: entry.pulsetime
+                    ):
+                        run = list(run)
+                        events = [entry.event for entry in run]
+                        self._send(bucket_id, events, pulsetime)
+                        self.journal.ack(entry.entry_id for entry in run)
+                        sent += len(run)
+                    logger.debug(
+                        "Sent {} events to bucket '{}'.", len(batch), bucket_id
+                    )
+
+    def _send(
+        self,
+        bucket_id: str,
+        events: List[Event],
+        pulsetime: Optional[float],
+    ) -> None:
+        """Inserts events in a bucket, merging them with earlier answers.
+
+        If a `pulsetime` is given, each answer is merged with the last event
+        sent for the same question, if they are identical and it was given
+        at most `pulsetime` seconds after that one ended (as told by
+        `aw_transform.heartbeats.heartbeat_merge()`). Events extended this
+        way are stored again under their ids, replacing the stored ones.
+        """
+        last: Dict[Tuple[str, Optional[str]], Event] = dict()
+        inserted: Dict[int, Event] = dict()
+        # events sent before, extended since (both by their object ids)
+        updated: Dict[int, Event] = dict()
+        for event in events:
+            if pulsetime is None:
+                inserted[id(event)] = event
+                continue
+            key = (bucket_id, event.data.get("question_id"))
+            previous = last.get(key)
+            if previous is None and key in self._last:
+                # extend a copy, so that a failed request leaves it as sent
+                previous = copy.deepcopy(self._last[key])
+            if (
+                previous is not None
+                and is_answer(event.data)
+                and heartbeat_merge(previous, event, pulsetime) is not None
+            ):
+                if id(previous) not in inserted:
+                    updated[id(previous)] = previous
+                last[key] = previous
+                continue
+            inserted[id(event)] = event
+            last[key] = event
+
+        start = time.monotonic()
+        try:
+            if inserted:
+                self.client.insert_events(bucket_id, list(inserted.values()))
+            for event in updated.values():
+                if event.id is None:
+                    event.id = self._find_id(bucket_id, event)
+                self.client.insert_event(bucket_id, event)
+        except Exception:
+            metrics.INSERT_FAILURES.inc()
+            raise
+        metrics.INSERT_DURATION.observe(time.monotonic() - start)
+        metrics.EVENTS_INSERTED.inc(len(inserted))
+        self._last.update(last)
+
+    def _find_id(self, bucket_id: str, event: Event) -> Optional[int]:
+        """Finds the id an event was stored under, in a bucket.
+
+        Returns:
+            The id of the stored event with the same timestamp and data, or
+            `None` if there is none (e.g., if it was deleted meanwhile).
+        """
+        for stored in self.client.get_events(
+            bucket_id, start=event.timestamp, end=event.timestamp
+        ):
+            if (
+                stored.timestamp == event.timestamp
+                and stored.data == event.data
+            ):
+                return stored.id
+        return None
+
+    def run(self) -> None:
+        backoff = 0.0
+        while not self._stopping.is_set():
+            try:
+                self.flush()
+            except Exception as e:
+                backoff = min(
+                    max(backoff * 2, self.min_backoff), self.max_backoff
+                )
+                logger.warning(
+                    "Could not send events to server ({}). "
+                    "Retrying in {} seconds.",
+                    e,
+                    backoff,
+                )
+                # do not let new events cut the backoff short
+                self._stopping.wait(timeout=backoff)
+                continue
+            backoff = 0.0
+            self._wait_batch()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stops the flusher, making one last attempt to drain the journal.
+
+        Arguments:
+            timeout: The maximum amount of seconds to wait for the background
+                thread to finish.
+        """
+        with self._condition:
+            self._stopping.set()
+            self._condition.notify_all()
+        self.join(timeout=timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(
+                "Could not send {} events to server ({}). They will be sent "
+                "the next time the watcher starts.",
+                len(self.journal),
+                e,
+            )
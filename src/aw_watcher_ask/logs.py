@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Configuration of the watcher's log output."""
+
+
+import sys
+import threading
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+from loguru import logger
+
+
+LOG_FORMAT = "{time} <{extra[question_id]}>: {level} - {message}"
+
+
+class LevelSampler:
+    """Filters log records, keeping only one in every few of some levels.
+
+    Arguments:
+        rates: The sampling rate of each level name (e.g., `{"INFO": 10}`
+            keeps the first and then every tenth `INFO` record). Levels not
+            listed are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, int]) -> None:
+        self.rates = {level.upper(): rate for level, rate in rates.items()}
+        self._counts: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]) -> bool:
+        level = record["level"].name
+        rate = self.rates.get(level, 1)
+        if rate <= 1:
+            return True
+        with self._lock:
+            count = self._counts.get(level, 0)
+            self._counts[level] = count + 1
+        return count % rate == 0
+
+
+_lock = threading.Lock()
+# the watcher's sink, and the configuration it was registered with
+_handler: Optional[Tuple[int, Tuple[Any, ...]]] = None
+
+
+def configure(
+    level: str = "INFO",
+    serialize: bool = False,
+    enqueue: bool = False,
+    sample: Optional[Dict[str, int]] = None,
+    sink: Optional[TextIO] = None,
+) -> None:
+    """Registers the watcher's log sink, replacing any registered before.
+
+    Configuring the logs again with the same parameters does nothing, so
+    that calling the watcher many times in the same interpreter does not
+    duplicate log lines. Loguru's default sink is removed on the first call.
+
+    Arguments:
+        level: The minimum level of the messages to log. Messages below it
+            are discarded before being formatted.
+        serialize: Whether to write each record as a JSON object, instead of
+            a line of text.
+        enqueue: Whether to write records from a background thread, so that
+            logging does not block on slow I/O (e.g., a full pipe). Records
+            are pickled to be handed over, which costs some CPU time.
+        sample: The sampling rate of some levels (see
+            [`LevelSampler`][aw_watcher_ask.logs.LevelSampler]).
+        sink: Where to write the records to. Defaults to the standard error
+            stream at the time of the call.
+    """
+    global _handler
+    if sink is None:
+        sink = sys.stderr
+    config = (
+        level, serialize, enqueue, tuple(sorted((sample or {}).items())), sink
+    )
+    with _lock:
+        if _handler is not None:
+            handler_id, current = _handler
+            if current == config:
+                return
+            logger.remove(handler_id)
+        else:
+            try:
+                logger.remove(0)
+            except ValueError:
+                pass  # already removed by someone else
+            # records from modules that do not refer to a single question
+            logger.configure(extra={"question_id": "*"})
+        handler_id = logger.add(
+            sink,
+            level=level,
+            format=LOG_FORMAT,
+            serialize=serialize,
+            enqueue=enqueue,
+            filter=LevelSampler(sample) if sample else None,
+        )
+        _handler = (handler_id, config)
+
+
+def ensure_configured(level: str = "INFO") -> None:
+    """Registers the default log sink, unless the logs were configured.
+
+    Arguments:
+        level: The minimum level of the messages to log, if the logs were
+            not configured yet.
+    """
+    with _lock:
+        if _handler is not None:
+            return
+    configure(level=level)
+
+
+def flush() -> None:
+    """Waits for records enqueued by asynchronous sinks to be written."""
+    logger.complete()
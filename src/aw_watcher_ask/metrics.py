@@ -0,0 +1,439 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Counters and histograms of the watcher's behavior, in Prometheus format.
+
+The watcher's components record their measurements in the module-level
+[`REGISTRY`][aw_watcher_ask.metrics.REGISTRY], which can be exposed through a
+local HTTP endpoint (see [`MetricsServer`]
+[aw_watcher_ask.metrics.MetricsServer]) or periodically written to a file
+(see [`MetricsDumper`][aw_watcher_ask.metrics.MetricsDumper]), in the
+[Prometheus text format](https://prometheus.io/docs/instrumenting/
+exposition_formats/).
+"""
+
+
+import bisect
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0,
+    300.0,
+)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", r"\\").replace('"', r"\"").replace(
+            "\n", r"\n"
+        ))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    """Base for metrics, holding one value per combination of labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """Lists the metric's samples, as `(name, labels, value)` tuples."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(
+            f"{name}{_format_labels(labels)} {_format_value(value)}"
+            for name, labels, value in self.samples()
+        )
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    """A value that only goes up (e.g., the number of prompts fired)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, float] = dict()
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        """Increases the counter of the given labels."""
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: object) -> float:
+        """Returns the current value of the counter of the given labels."""
+        with self._lock:
+            return self._values.get(_labels(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [
+                (self.name, labels, value)
+                for labels, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down (e.g., the number of pending events).
+
+    Gauges might be given a function instead of a value, to be called
+    whenever the metrics are collected.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, Union[float, Callable[[], float]]] = dict()
+
+    def set(self, value: float, **labels: object) -> None:
+        """Sets the value of the gauge of the given labels."""
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+    def set_function(
+        self, function: Callable[[], float], **labels: object
+    ) -> None:
+        """Makes the gauge of the given labels report a function's result."""
+        with self._lock:
+            self._values[_labels(labels)] = function
+
+    def get(self, **labels: object) -> float:
+        """Returns the current value of the gauge of the given labels."""
+        with self._lock:
+            value = self._values.get(_labels(labels), 0.0)
+        return value() if callable(value) else value
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: item[0])
+        samples = []
+        for labels, value in values:
+            try:
+                samples.append(
+                    (self.name, labels, value() if callable(value) else value)
+                )
+            except Exception:
+                continue  # e.g., the gauge's source was already closed
+        return samples
+
+
+class Histogram(_Metric):
+    """Counts observations (e.g., durations) in configurable buckets.
+
+    Arguments:
+        name: The name of the metric.
+        documentation: A description of the metric.
+        buckets: The upper bounds of the buckets, in increasing order.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # counts per bucket (not cumulative), sum and count, per labels
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = dict()
+
+    def observe(self, value: float, **labels: object) -> None:
+        """Records an observation with the given labels."""
+        key = _labels(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * len(self.buckets), [0.0])
+            )
+            counts[position] += 1
+            total[0] += value
+
+    def count(self, **labels: object) -> int:
+        """Returns the number of observations with the given labels."""
+        with self._lock:
+            counts, _ = self._values.get(_labels(labels), ([0], [0.0]))
+            return sum(counts)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        samples: List[Tuple[str, Labels, float]] = []
+        with self._lock:
+            values = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in sorted(self._values.items())
+            ]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((
+                    f"{self.name}_bucket",
+                    labels + (("le", _format_value(bound)),),
+                    cumulative,
+                ))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """A collection of metrics, rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = dict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(
+                        f"Metric `{metric.name}` is already registered as a "
+                        f"{existing.kind}."
+                    )
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        """Registers a counter, or returns the one with the same name."""
+        return self._register(Counter(name, documentation))  # type: ignore
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        """Registers a gauge, or returns the one with the same name."""
+        return self._register(Gauge(name, documentation))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Registers a histogram, or returns the one with the same name."""
+        return self._register(  # type: ignore
+            Histogram(name, documentation, buckets)
+        )
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+SCHEDULE_LATENESS = REGISTRY.histogram(
+    "aw_watcher_ask_schedule_lateness_seconds",
+    "How late prompts fired, relative to their schedules.",
+)
+MISSED_EXECUTIONS = REGISTRY.counter(
+    "aw_watcher_ask_missed_executions_total",
+    "Executions missed by more than the grace period.",
+)
+PROMPTS_FIRED = REGISTRY.counter(
+    "aw_watcher_ask_prompts_fired_total",
+    "Prompts fired by the schedules.",
+)
+PROMPTS_DROPPED = REGISTRY.counter(
+    "aw_watcher_ask_prompts_dropped_total",
+    "Prompts dropped because previous ones were still open.",
+)
+PROMPTS_POSTPONED = REGISTRY.counter(
+    "aw_watcher_ask_prompts_postponed_total",
+    "Prompts postponed because the user was away.",
+)
+PROMPTS_OWED = REGISTRY.counter(
+    "aw_watcher_ask_prompts_owed_total",
+    "Postponed prompts kept until the user is back, past their periods.",
+)
+PROMPTS_SKIPPED = REGISTRY.counter(
+    "aw_watcher_ask_prompts_skipped_total",
+    "Postponed prompts skipped because too many were owed to the user.",
+)
+PROMPTS_COALESCED = REGISTRY.counter(
+    "aw_watcher_ask_prompts_coalesced_total",
+    "Prompts presented along with others, in a single dialog.",
+)
+PROMPTS_OPEN = REGISTRY.gauge(
+    "aw_watcher_ask_prompts_open",
+    "Prompts currently open or waiting for a worker.",
+)
+PROMPTS_QUEUED = REGISTRY.gauge(
+    "aw_watcher_ask_prompts_queued",
+    "Prompts queued behind open prompts of the same question.",
+)
+DIALOG_LATENCY = REGISTRY.histogram(
+    "aw_watcher_ask_dialog_latency_seconds",
+    "Time taken for dialog boxes to be spawned or become visible.",
+)
+PROMPT_DURATION = REGISTRY.histogram(
+    "aw_watcher_ask_prompt_duration_seconds",
+    "Time prompts stayed open, waiting for the user.",
+)
+ANSWERS = REGISTRY.counter(
+    "aw_watcher_ask_answers_total",
+    "Prompts closed, by whether the user answered them.",
+)
+INSERT_DURATION = REGISTRY.histogram(
+    "aw_watcher_ask_insert_duration_seconds",
+    "Time taken to send a batch of events to the server.",
+)
+EVENTS_INSERTED = REGISTRY.counter(
+    "aw_watcher_ask_events_inserted_total",
+    "Events sent to the server.",
+)
+INSERT_FAILURES = REGISTRY.counter(
+    "aw_watcher_ask_insert_failures_total",
+    "Failed attempts to send events to the server.",
+)
+JOURNAL_PENDING = REGISTRY.gauge(
+    "aw_watcher_ask_journal_pending_events",
+    "Events journaled locally, yet to be sent to the server.",
+)
+
+
+def _handler_class(registry: MetricsRegistry) -> type:
+    """Builds a request handler serving a registry's metrics at `/metrics`."""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args) -> None:  # noqa: A002
+            pass
+
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            payload = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """A local HTTP endpoint serving metrics, in a background thread.
+
+    Arguments:
+        port: The port to listen to. Use `0` for a random free port.
+        host: The address to listen to. Defaults to the local host only.
+        registry: The metrics to serve.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        host: str = "127.0.0.1",
+        registry: MetricsRegistry = REGISTRY,
+    ) -> None:
+        # imported here, as the HTTP server is only needed if requested
+        from http.server import ThreadingHTTPServer
+        self.registry = registry
+        self._server = ThreadingHTTPServer(
+            (host, port), _handler_class(registry)
+        )
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """The port the server is listening to."""
+        return self._server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        """Starts serving metrics in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="metrics-server",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops serving metrics."""
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsDumper(threading.Thread):
+    """Periodically writes metrics to a file, in a background thread.
+
+    The file is replaced atomically, so that readers never see it half
+    written.
+
+    Arguments:
+        path: The file to write the metrics to.
+        interval: The amount of seconds between writes.
+        registry: The metrics to write.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        interval: float = 60.0,
+        registry: MetricsRegistry = REGISTRY,
+    ) -> None:
+        super().__init__(name="metrics-dumper", daemon=True)
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry
+        self._stopping = threading.Event()
+
+    def dump(self) -> None:
+        """Writes the current metrics to the file."""
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(self.registry.render(), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.dump()
+
+    def stop(self) -> None:
+        """Stops the periodic writes, writing the metrics a last time."""
+        self._stopping.set()
+        if self.is_alive():
+            self.join()
+        self.dump()
@@ -5,7 +5,10 @@
 """Representations for exchanging data with Zenity and ActivityWatch."""
 
 
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
 from enum import Enum
+from typing import Any, Dict, Optional
 
 
 class DialogType(str, Enum):
@@ -24,3 +27,95 @@ class DialogType(str, Enum):
     question = "question"  # Display question dialog
     password = "password"  # Display password dialog
     forms = "forms"  # Display forms dialog
+
+
+class DialogBackendType(str, Enum):
+    zenity = "zenity"  # Run a new Zenity process for each dialog
+    resident = "resident"  # Keep a helper process running between dialogs
+
+
+class MissedPolicy(str, Enum):
+    skip = "skip"  # Drop occurrences missed while the system was asleep
+    coalesce = "coalesce"  # Fire once for all occurrences missed
+
+
+class OverlapPolicy(str, Enum):
+    queue = "queue"  # Present the new prompt after the previous ones
+    drop = "drop"  # Discard the new prompt while previous ones are open
+    replace = "replace"  # Close the oldest open prompt, and present the new
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"  # One JSON-encoded event per line
+    csv = "csv"  # Comma-separated values, one answer per row
+    parquet = "parquet"  # Apache Parquet columnar file (requires pyarrow)
+
+
+@dataclass
+class Question:
+    """A question to be periodically posed to the user.
+
+    Attributes:
+        question_id: A short string to identify the question in ActivityWatch
+            server records.
+        question_type: The type of dialog box to present the user.
+        title: An optional title for the dialog box.
+        schedule: A cron-tab expression that controls when the user should be
+            prompted to answer the question.
+        until: The date and time when to stop posing the question.
+        timeout: The amount of seconds to wait for user's input.
+        max_concurrent: The maximum number of prompts of this question that
+            might be open at the same time.
+        overlap: What to do with a new prompt when `max_concurrent` prompts
+            of this question are already open.
+        adaptive: Whether to postpone prompts while the user is away from
+            the computer, until they are back (see
+            [`aw_watcher_ask.presence.OwedPrompts`]
+            [aw_watcher_ask.presence.OwedPrompts]).
+        compact_within: If set, consecutive identical answers given at most
+            this many seconds apart are merged into a single event.
+        options: Extra options passed unaltered to Zenity.
+    """
+
+    question_id: str
+    question_type: DialogType = DialogType.question
+    title: Optional[str] = None
+    schedule: str = "R * * * *"
+    until: datetime = datetime(2100, 12, 31)
+    timeout: int = 60
+    max_concurrent: int = 1
+    overlap: OverlapPolicy = OverlapPolicy.queue
+    adaptive: bool = False
+    compact_within: Optional[float] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Question":
+        """Builds a question from its (e.g., JSON-decoded) representation.
+
+        Any keys that are not attributes of the question are considered extra
+        options to be passed to Zenity.
+        """
+        data = dict(data)
+        known_fields = {name for name in cls.__dataclass_fields__}
+        options = dict(data.pop("options", None) or dict())
+        for key in set(data) - known_fields:
+            options[key] = data.pop(key)
+        data["options"] = options
+        data["question_type"] = DialogType(
+            data.get("question_type", DialogType.question)
+        )
+        data["overlap"] = OverlapPolicy(
+            data.get("overlap", OverlapPolicy.queue)
+        )
+        if isinstance(data.get("until"), str):
+            data["until"] = datetime.fromisoformat(data["until"])
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts the question to a JSON-serializable representation."""
+        data = asdict(self)
+        data["question_type"] = self.question_type.value
+        data["overlap"] = self.overlap.value
+        data["until"] = self.until.isoformat()
+        return data
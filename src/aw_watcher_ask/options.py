@@ -0,0 +1,269 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Schema of the options accepted by each type of dialog box."""
+
+
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence
+
+from aw_watcher_ask.models import DialogType
+
+
+class OptionSpec(NamedTuple):
+    """An option accepted by Zenity dialogs.
+
+    Attributes:
+        name: The name of the option, without leading dashes.
+        type: The type of the option's values, or `bool` for flags (options
+            without values).
+        multiple: Whether the option might be given many values (e.g.,
+            the `--column` of `list` dialogs).
+    """
+
+    name: str
+    type: type = str
+    multiple: bool = False
+
+
+def _flags(*names: str) -> List[OptionSpec]:
+    return [OptionSpec(name, bool) for name in names]
+
+
+# options accepted by every type of dialog (except the title, which is a
+# parameter of its own)
+_GENERAL = [
+    OptionSpec("window-icon"),
+    OptionSpec("width", int),
+    OptionSpec("height", int),
+    OptionSpec("timeout", int),
+    OptionSpec("ok-label"),
+    OptionSpec("cancel-label"),
+    OptionSpec("extra-button", multiple=True),
+    OptionSpec("attach"),
+    *_flags("modal"),
+]
+
+_MESSAGE = [
+    OptionSpec("text"),
+    OptionSpec("icon-name"),
+    *_flags("no-wrap", "no-markup", "ellipsize"),
+]
+
+_SCHEMAS: Dict[DialogType, List[OptionSpec]] = {
+    DialogType.calendar: [
+        OptionSpec("text"),
+        OptionSpec("day", int),
+        OptionSpec("month", int),
+        OptionSpec("year", int),
+        OptionSpec("date-format"),
+    ],
+    DialogType.entry: [
+        OptionSpec("text"),
+        OptionSpec("entry-text"),
+        *_flags("hide-text"),
+    ],
+    DialogType.error: _MESSAGE,
+    DialogType.info: _MESSAGE,
+    DialogType.warning: _MESSAGE,
+    DialogType.question: [
+        *_MESSAGE,
+        *_flags("default-cancel", "switch"),
+    ],
+    DialogType.file_selection: [
+        OptionSpec("filename"),
+        OptionSpec("separator"),
+        OptionSpec("file-filter", multiple=True),
+        *_flags("multiple", "directory", "save", "confirm-overwrite"),
+    ],
+    DialogType.list: [
+        OptionSpec("text"),
+        OptionSpec("column", multiple=True),
+        OptionSpec("separator"),
+        OptionSpec("print-column"),
+        OptionSpec("hide-column", int),
+        *_flags(
+            "checklist",
+            "radiolist",
+            "imagelist",
+            "multiple",
+            "editable",
+            "hide-header",
+            "mid-search",
+        ),
+    ],
+    DialogType.notification: [
+        OptionSpec("text"),
+        *_flags("listen"),
+    ],
+    DialogType.progress: [
+        OptionSpec("text"),
+        OptionSpec("percentage", int),
+        *_flags(
+            "pulsate", "auto-close", "auto-kill", "no-cancel",
+            "time-remaining",
+        ),
+    ],
+    DialogType.scale: [
+        OptionSpec("text"),
+        OptionSpec("value", int),
+        OptionSpec("min-value", int),
+        OptionSpec("max-value", int),
+        OptionSpec("step", int),
+        *_flags("print-partial", "hide-value"),
+    ],
+    DialogType.text_info: [
+        OptionSpec("filename"),
+        OptionSpec("font"),
+        OptionSpec("checkbox"),
+        OptionSpec("url"),
+        *_flags("editable", "html", "auto-scroll"),
+    ],
+    DialogType.color_selection: [
+        OptionSpec("color"),
+        *_flags("show-palette"),
+    ],
+    DialogType.password: _flags("username"),
+    DialogType.forms: [
+        OptionSpec("text"),
+        OptionSpec("separator"),
+        OptionSpec("forms-date-format"),
+        OptionSpec("add-entry", multiple=True),
+        OptionSpec("add-password", multiple=True),
+        OptionSpec("add-calendar", multiple=True),
+        OptionSpec("add-list", multiple=True),
+        OptionSpec("list-values", multiple=True),
+        OptionSpec("column-values", multiple=True),
+        OptionSpec("add-combo", multiple=True),
+        OptionSpec("combo-values", multiple=True),
+        *_flags("show-header"),
+    ],
+}
+
+# the schema of each dialog type, by option name
+SCHEMAS: Dict[DialogType, Dict[str, OptionSpec]] = {
+    question_type: {spec.name: spec for spec in _GENERAL + specs}
+    for question_type, specs in _SCHEMAS.items()
+}
+
+
+def _spec(question_type: DialogType, name: str) -> OptionSpec:
+    """Looks up an option in the schema of a dialog type."""
+    spec = SCHEMAS[question_type].get(name)
+    if spec is None:
+        raise ValueError(
+            f"Option `--{name}` is not accepted by "
+            f"`{question_type.value}` dialogs."
+        )
+    return spec
+
+
+def _convert(spec: OptionSpec, value: Any) -> Any:
+    """Converts a value to the type of an option."""
+    if spec.type is bool:
+        if not isinstance(value, bool):
+            raise ValueError(f"Option `--{spec.name}` does not take a value.")
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Option `--{spec.name}` requires a value.")
+    try:
+        return spec.type(value)
+    except ValueError:
+        raise ValueError(
+            f"Option `--{spec.name}` expects {spec.type.__name__} values, "
+            f"got `{value}`."
+        ) from None
+
+
+def _store(
+    options: Dict[str, Any], spec: OptionSpec, values: Iterable[Any]
+) -> None:
+    """Adds the values of an option, converted, to the parsed options."""
+    converted = [_convert(spec, value) for value in values]
+    if spec.multiple:
+        options.setdefault(spec.name, []).extend(converted)
+    elif spec.name in options or len(converted) != 1:
+        raise ValueError(f"Option `--{spec.name}` accepts a single value.")
+    else:
+        options[spec.name] = converted[0]
+
+
+def parse_args(
+    question_type: DialogType, args: Sequence[str]
+) -> Dict[str, Any]:
+    """Parses the extra command-line options of a dialog box.
+
+    Options are read in a single pass, in any of the forms `--name=value`,
+    `--name value` or, for options with many values, `--name value1 value2`
+    and `--name=value1 --name=value2`. Flags are given by their name alone.
+
+    Arguments:
+        question_type: The type of the dialog box.
+        args: The unprocessed arguments forwarded by a Click/Typer
+            command-line application.
+
+    Returns:
+        A dictionary of option names (without leading dashes) and their
+        values, converted to the types in the schema.
+
+    Raises:
+        ValueError: If an option is not accepted by the dialog type, or is
+            given an invalid value.
+    """
+    options: Dict[str, Any] = dict()
+    ix = 0
+    while ix < len(args):
+        token = args[ix]
+        ix += 1
+        if not token.startswith("-"):
+            raise ValueError(f"Unexpected argument `{token}`.")
+        name, equals, value = token.lstrip("-").partition("=")
+        spec = _spec(question_type, name)
+
+        if spec.type is bool:
+            _store(options, spec, [True] if not equals else [value])
+            continue
+
+        values = [value] if equals else []
+        if spec.multiple:
+            while ix < len(args) and not args[ix].startswith("-"):
+                values.append(args[ix])
+                ix += 1
+        elif not equals and ix < len(args):
+            values.append(args[ix])
+            ix += 1
+        if not values:
+            raise ValueError(f"Option `--{name}` requires a value.")
+        _store(options, spec, values)
+    return options
+
+
+def validate_options(
+    question_type: DialogType, options: Mapping[str, Any]
+) -> Dict[str, Any]:
+    """Checks the options of a dialog box against its schema.
+
+    Arguments:
+        question_type: The type of the dialog box.
+        options: The options given to the dialog (e.g., from a configuration
+            file), with names in either `min-value` or `min_value` forms.
+            Flags are set to `True` or `False`, and options with many values
+            to lists.
+
+    Returns:
+        A dictionary of option names (in `min-value` form) and their values,
+        converted to the types in the schema. Flags set to `False` and
+        options set to `None` are left out.
+
+    Raises:
+        ValueError: If an option is not accepted by the dialog type, or is
+            given an invalid value.
+    """
+    validated: Dict[str, Any] = dict()
+    for name, value in options.items():
+        spec = _spec(question_type, name.replace("_", "-"))
+        if value is None or value is False:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        _store(validated, spec, values)
+    return validated
@@ -0,0 +1,200 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Detection of the user's presence, from ActivityWatch's AFK watcher."""
+
+
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+from loguru import logger
+
+from aw_watcher_ask.clock import SYSTEM_CLOCK, Clock
+from aw_watcher_ask.dialogs import on_cancel
+
+
+# the most prompts of a question owed to the user at a time
+MAX_OWED_PROMPTS = 3
+
+
+class AfkMonitor:
+    """Tells whether the user is at the computer, from recent AFK events.
+
+    The events of [aw-watcher-afk]
+    (https://docs.activitywatch.net/en/latest/watchers.html#aw-watcher-afk)
+    are cached locally. Each refresh only asks the server for the events
+    since the last cached one (which might still be growing, as the AFK
+    watcher merges its heartbeats), and refreshes are spaced by at least
+    `refresh_interval` seconds, however often the state is asked.
+
+    Arguments:
+        client: The client used to reach the server.
+        bucket_id: The AFK watcher's bucket. Defaults to the one of the
+            client's host.
+        refresh_interval: The minimum amount of seconds between requests to
+            the server.
+        stale_after: The amount of seconds after which the AFK watcher's last
+            report is too old to be trusted (e.g., because it is not
+            running).
+        history: The amount of seconds of events to keep cached.
+        clock: The source of the current time.
+    """
+
+    def __init__(
+        self,
+        client: ActivityWatchClient,
+        bucket_id: Optional[str] = None,
+        refresh_interval: float = 10.0,
+        stale_after: float = 300.0,
+        history: float = 3600.0,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.client = client
+        self.bucket_id = (
+            bucket_id or f"aw-watcher-afk_{client.client_hostname}"
+        )
+        self.refresh_interval = refresh_interval
+        self.stale_after = timedelta(seconds=stale_after)
+        self.history = timedelta(seconds=history)
+        self.clock = clock
+        self._events: List[Event] = list()
+        self._refreshed_at: Optional[float] = None
+        self._available = True
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        """Fetches the AFK events since the last cached one."""
+        now = self.clock.now()
+        since = self._events[-1].timestamp if self._events else (
+            now - self.history
+        )
+        try:
+            fetched = self.client.get_events(self.bucket_id, start=since)
+        except Exception as e:
+            if self._available:
+                logger.warning(
+                    "Could not read AFK events from bucket '{}' ({}). "
+                    "Prompting regardless of the user's presence.",
+                    self.bucket_id,
+                    e,
+                )
+            self._available = False
+            return
+        self._available = True
+        if not fetched:
+            return
+
+        # the server lists the most recent events first
+        fetched.sort(key=lambda event: event.timestamp)
+        cut = min(fetched[0].timestamp, since)
+        horizon = now - self.history
+        self._events = [
+            event for event in self._events
+            if horizon <= event.timestamp < cut
+        ] + fetched
+
+    def is_active(self) -> Optional[bool]:
+        """Tells whether the user is at the computer right now.
+
+        Returns:
+            Whether the AFK watcher last reported the user as active, or
+            `None` if its reports are unavailable or stale.
+        """
+        with self._lock:
+            monotonic = self.clock.monotonic()
+            if (
+                self._refreshed_at is None
+                or monotonic - self._refreshed_at >= self.refresh_interval
+            ):
+                self._refresh()
+                self._refreshed_at = monotonic
+            if not self._events:
+                return None
+            last = self._events[-1]
+        if self.clock.now() - (last.timestamp + last.duration) > (
+            self.stale_after
+        ):
+            return None
+        return last.data.get("status") != "afk"
+
+    def wait_until_active(
+        self, deadline: datetime, interval: float = 30.0
+    ) -> bool:
+        """Waits for the user to be at the computer.
+
+        Users whose presence is unknown (see [`is_active()`]
+        [aw_watcher_ask.presence.AfkMonitor.is_active]) are considered
+        active. Waiting stops early if the current prompt is cancelled (see
+        [`aw_watcher_ask.dialogs.cancellable()`]
+        [aw_watcher_ask.dialogs.cancellable]).
+
+        Arguments:
+            deadline: The date and time when to stop waiting.
+            interval: The amount of seconds between checks.
+
+        Returns:
+            Whether the user is active, or `False` if the deadline passed
+            (or the prompt was cancelled) while they were away.
+        """
+        cancelled = threading.Event()
+        on_cancel(cancelled.set)
+        while not cancelled.is_set():
+            if self.is_active() is not False:
+                return True
+            remaining = (deadline - self.clock.now()).total_seconds()
+            if remaining <= 0:
+                return False
+            self.clock.wait(cancelled, min(interval, remaining))
+        return False
+
+
+class OwedPrompts:
+    """Counts the prompts of a question owed to the user while they are away.
+
+    A postponed prompt whose period of the schedule ends before the user is
+    back is owed, rather than skipped, and presented once they are back
+    (see [`aw_watcher_ask.core._ask_when_present()`]
+    [aw_watcher_ask.core._ask_when_present]), so that each period still
+    gets its sample. At most `limit` prompts are owed at a time, so that a
+    long absence does not end in a burst of dialogs; further prompts are
+    skipped.
+
+    Arguments:
+        limit: The most prompts owed at a time.
+    """
+
+    def __init__(self, limit: int = MAX_OWED_PROMPTS) -> None:
+        self.limit = limit
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def owe(self) -> bool:
+        """Owes a prompt to the user.
+
+        Returns:
+            Whether the prompt is owed, or `False` if `limit` prompts are
+            already owed (and the prompt is to be skipped).
+        """
+        with self._lock:
+            if self._count >= self.limit:
+                return False
+            self._count += 1
+            return True
+
+    def settle(self) -> int:
+        """Takes all prompts owed, to be presented.
+
+        Returns:
+            The number of prompts owed.
+        """
+        with self._lock:
+            count, self._count = self._count, 0
+            return count
@@ -0,0 +1,191 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Concurrent presentation of prompts to the user."""
+
+
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+from loguru import logger
+
+from aw_watcher_ask import metrics
+from aw_watcher_ask.dialogs import Cancellation, cancellable
+from aw_watcher_ask.models import OverlapPolicy
+
+
+class _Prompt:
+    """A prompt submitted to the pool."""
+
+    def __init__(
+        self,
+        key: Hashable,
+        function: Callable[[], Any],
+        callback: Optional[Callable[[Any], None]],
+        limit: int,
+    ) -> None:
+        self.key = key
+        self.function = function
+        self.callback = callback
+        self.limit = limit
+        self.cancellation = Cancellation()
+
+
+class PromptPool:
+    """Presents prompts to the user from a bounded pool of worker threads.
+
+    Waiting for the user's answer does not block the caller, so that the
+    schedules of other prompts (and of the same question) keep running while
+    a dialog box is open. Each question might have at most `limit` prompts
+    open at the same time; new prompts submitted beyond that are handled
+    according to an [`OverlapPolicy`][aw_watcher_ask.models.OverlapPolicy]:
+
+    - `OverlapPolicy.queue` presents the new prompt as soon as one of the
+      previous ones is closed;
+    - `OverlapPolicy.drop` discards the new prompt;
+    - `OverlapPolicy.replace` closes the oldest open prompt, and presents the
+      new one in its place (discarding any other prompts yet to be shown).
+
+    Arguments:
+        max_workers: The maximum number of prompts open at the same time,
+            across all questions.
+    """
+
+    def __init__(self, max_workers: int = 4) -> None:
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prompt"
+        )
+        self._lock = threading.Lock()
+        # notified whenever all prompts of a question are closed
+        self._closed = threading.Condition(self._lock)
+        self._running: Dict[Hashable, List[_Prompt]] = defaultdict(list)
+        self._waiting: Dict[Hashable, Deque[_Prompt]] = defaultdict(deque)
+        self._shutdown = False
+        metrics.PROMPTS_OPEN.set_function(self._count_running)
+        metrics.PROMPTS_QUEUED.set_function(self._count_waiting)
+
+    def _count_running(self) -> int:
+        with self._lock:
+            return sum(len(prompts) for prompts in self._running.values())
+
+    def _count_waiting(self) -> int:
+        with self._lock:
+            return sum(len(prompts) for prompts in self._waiting.values())
+
+    def running(self, key: Hashable) -> int:
+        """Counts the prompts of a question that are open or about to be."""
+        with self._lock:
+            return len(self._running.get(key, ()))
+
+    def waiting(self, key: Hashable) -> int:
+        """Counts the prompts of a question queued behind the open ones."""
+        with self._lock:
+            return len(self._waiting.get(key, ()))
+
+    def submit(
+        self,
+        key: Hashable,
+        function: Callable[[], Any],
+        callback: Optional[Callable[[Any], None]] = None,
+        limit: int = 1,
+        overlap: OverlapPolicy = OverlapPolicy.queue,
+    ) -> bool:
+        """Submits a prompt to be presented to the user.
+
+        Arguments:
+            key: Identifies the question the prompt belongs to.
+            function: A function that presents the prompt and returns the
+                user's answer. It is called from a worker thread.
+            callback: An optional function to be called with the answer,
+                from the same worker thread.
+            limit: The maximum number of prompts of the same question that
+                might be open at the same time.
+            overlap: What to do if `limit` prompts of the same question are
+                already open.
+
+        Returns:
+            Whether the prompt was accepted (i.e., not dropped).
+
+        Raises:
+            ValueError: If `limit` is smaller than 1.
+            RuntimeError: If the pool was already shut down.
+        """
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1.")
+        prompt = _Prompt(key, function, callback, limit)
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Prompt pool was already shut down.")
+            running = self._running[key]
+            if len(running) < limit:
+                self._start(prompt)
+                return True
+            if overlap == OverlapPolicy.drop:
+                logger.bind(question_id=key).info(
+                    "Previous prompt is still open. Dropping new prompt."
+                )
+                metrics.PROMPTS_DROPPED.inc(question_id=key)
+                return False
+            waiting = self._waiting[key]
+            if overlap == OverlapPolicy.replace:
+                logger.bind(question_id=key).info(
+                    "Previous prompt is still open. Replacing it."
+                )
+                waiting.clear()
+                for previous in running:
+                    if not previous.cancellation.cancelled:
+                        previous.cancellation.cancel()
+                        break
+            waiting.append(prompt)
+            return True
+
+    def _start(self, prompt: _Prompt) -> None:
+        self._running[prompt.key].append(prompt)
+        self._executor.submit(self._run, prompt)
+
+    def _run(self, prompt: _Prompt) -> None:
+        try:
+            # prompts replaced before reaching a worker are never shown
+            if not prompt.cancellation.cancelled:
+                start = time.monotonic()
+                with cancellable(prompt.cancellation):
+                    answer = prompt.function()
+                metrics.PROMPT_DURATION.observe(time.monotonic() - start)
+                if prompt.callback is not None:
+                    prompt.callback(answer)
+        except Exception:
+            logger.bind(question_id=prompt.key).exception("Prompt failed.")
+        finally:
+            with self._lock:
+                running = self._running[prompt.key]
+                running.remove(prompt)
+                waiting = self._waiting.get(prompt.key)
+                if waiting and len(running) < prompt.limit:
+                    self._start(waiting.popleft())
+                if not running:
+                    del self._running[prompt.key]
+                    self._waiting.pop(prompt.key, None)
+                    self._closed.notify_all()
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """Stops accepting prompts, and waits for the submitted ones.
+
+        Arguments:
+            cancel: Whether to close the open prompts and discard the queued
+                ones, instead of waiting for them to be answered.
+        """
+        with self._lock:
+            self._shutdown = True
+            if cancel:
+                self._waiting.clear()
+                for prompts in self._running.values():
+                    for prompt in prompts:
+                        prompt.cancellation.cancel()
+            while self._running:
+                self._closed.wait()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""On-disk registry of the questions to pose, and of their schedules."""
+
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union
+
+from aw_core.dirs import get_data_dir
+
+from aw_watcher_ask.models import Question
+
+
+class RegisteredQuestion(NamedTuple):
+    """A question read back from the registry.
+
+    Attributes:
+        question: The question definition.
+        next_execution: The next time the question is due, as saved by the
+            last run (or at registration), if any.
+    """
+
+    question: Question
+    next_execution: Optional[datetime]
+
+
+def default_registry_path(testing: bool = False) -> Path:
+    """Returns the path of the registry used by the watcher."""
+    registry_name = "registry.sqlite"
+    if testing:
+        registry_name = "test-" + registry_name
+    return Path(get_data_dir("aw-watcher-ask")) / registry_name
+
+
+class QuestionRegistry:
+    """A SQLite-backed registry of questions and their schedules' state.
+
+    Questions are validated once, when they are registered, and stored along
+    with their next execution time. This way, the watcher can restore all of
+    them at startup with a single query, resuming their schedules where they
+    were left instead of deriving them anew.
+
+    Arguments:
+        path: Path to the registry file. Use `":memory:"` for a transient
+            in-memory registry.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "question_id TEXT PRIMARY KEY, "
+            "definition TEXT NOT NULL, "
+            "next_execution TEXT"
+            ")"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM questions"
+            ).fetchone()
+        return count
+
+    def __contains__(self, question_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM questions WHERE question_id = ?",
+                (question_id,),
+            ).fetchone()
+        return row is not None
+
+    def register(
+        self,
+        question: Question,
+        next_execution: Optional[datetime] = None,
+    ) -> None:
+        """Adds a question to the registry, replacing any with the same id.
+
+        Arguments:
+            question: The question to add. Its `question_id` should already
+                be valid (see [`aw_watcher_ask.utils.is_valid_id()`]
+                [aw_watcher_ask.utils.is_valid_id]).
+            next_execution: The first time the question is due.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO questions "
+                "(question_id, definition, next_execution) VALUES (?, ?, ?)",
+                (
+                    question.question_id,
+                    json.dumps(question.to_dict()),
+                    next_execution.isoformat() if next_execution else None,
+                ),
+            )
+
+    def unregister(self, question_id: str) -> bool:
+        """Removes a question from the registry.
+
+        Returns:
+            Whether the question was registered.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM questions WHERE question_id = ?",
+                (question_id,),
+            )
+        return cursor.rowcount > 0
+
+    def save_state(
+        self, question_id: str, next_execution: Optional[datetime]
+    ) -> None:
+        """Saves the next time a question is due, to resume it later."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE questions SET next_execution = ? "
+                "WHERE question_id = ?",
+                (
+                    next_execution.isoformat() if next_execution else None,
+                    question_id,
+                ),
+            )
+
+    def load(self) -> List[RegisteredQuestion]:
+        """Reads all registered questions and their state, in a single pass.
+
+        Returns:
+            The registered questions, ordered by `question_id`.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT definition, next_execution FROM questions "
+                "ORDER BY question_id"
+            ).fetchall()
+        return [
+            RegisteredQuestion(
+                Question.from_dict(json.loads(definition)),
+                datetime.fromisoformat(next_execution)
+                if next_execution else None,
+            )
+            for definition, next_execution in rows
+        ]
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
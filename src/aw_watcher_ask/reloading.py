@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Reloading of question definitions while the watcher runs."""
+
+
+import os
+from pathlib import Path
+from typing import Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from aw_watcher_ask.models import Question
+
+
+# attributes of questions whose changes call for recomputing the schedule
+SCHEDULE_FIELDS = ("schedule", "until")
+
+
+class FileWatcher:
+    """Tells whether a file changed, by polling its modification time.
+
+    A file is considered changed when its modification time or size differ
+    from the last check (including when it is removed or created again, as
+    some editors do when saving). Polling costs a single `stat()` call, and
+    needs no support from the operating system.
+
+    Arguments:
+        path: The file to watch. Changes made before the watcher is built
+            are not reported.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._signature = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            status = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return status.st_mtime_ns, status.st_size
+
+    def changed(self) -> bool:
+        """Checks whether the file changed since the last check."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
+
+
+class QuestionChanges(NamedTuple):
+    """The differences between two sets of question definitions.
+
+    Attributes:
+        added: Questions that were not defined before.
+        removed: The ids of questions that are no longer defined.
+        rescheduled: Questions whose schedules (or end dates) changed.
+        updated: Questions with other changes (e.g., to their titles or
+            timeouts), whose schedules are kept.
+    """
+
+    added: List[Question]
+    removed: List[str]
+    rescheduled: List[Question]
+    updated: List[Question]
+
+    def __bool__(self) -> bool:
+        return any(self)
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{len(changes)} {name}"
+            for name, changes in zip(self._fields, self)
+        )
+
+
+def diff_questions(
+    current: Mapping[str, Question], new: Iterable[Question]
+) -> QuestionChanges:
+    """Compares the questions being posed with new definitions of them.
+
+    Arguments:
+        current: The questions being posed, by question id.
+        new: The new definitions of the questions.
+
+    Returns:
+        The questions added, removed and changed in the new definitions.
+    """
+    changes = QuestionChanges(list(), list(), list(), list())
+    new_ids = set()
+    for question in new:
+        new_ids.add(question.question_id)
+        previous = current.get(question.question_id)
+        if previous is None:
+            changes.added.append(question)
+        elif any(
+            getattr(previous, field) != getattr(question, field)
+            for field in SCHEDULE_FIELDS
+        ):
+            changes.rescheduled.append(question)
+        elif previous != question:
+            changes.updated.append(question)
+    changes.removed.extend(
+        question_id for question_id in current if question_id not in new_ids
+    )
+    return changes
@@ -0,0 +1,357 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Scheduling of many questions from a single process."""
+
+
+import heapq
+import itertools
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    Any, Callable, Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+)
+
+from loguru import logger
+
+from aw_watcher_ask import metrics
+from aw_watcher_ask.clock import SYSTEM_CLOCK, Clock
+from aw_watcher_ask.cron import Schedule
+from aw_watcher_ask.models import MissedPolicy
+
+
+class JitterStats:
+    """Keeps track of how late prompts fire relative to their schedules.
+
+    Arguments:
+        maxlen: The maximum number of recent samples to keep.
+    """
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.samples: Deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+        self.max = 0.0
+        self._total = 0.0
+
+    def record(self, lateness: float) -> None:
+        """Records the lateness of a fired prompt, in seconds."""
+        self.samples.append(lateness)
+        self.count += 1
+        self._total += lateness
+        self.max = max(self.max, lateness)
+
+    @property
+    def mean(self) -> float:
+        """The mean lateness of all recorded prompts, in seconds."""
+        return self._total / self.count if self.count else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"JitterStats(count={self.count}, mean={self.mean * 1000:.3f}ms, "
+            f"max={self.max * 1000:.3f}ms)"
+        )
+
+
+@dataclass
+class _Job:
+    executions: Schedule
+    until: Optional[datetime]
+    next_execution: datetime
+    # identifies the job's current entry in the heap
+    entry: int
+
+
+class Scheduler:
+    """Keeps the next execution times of many jobs in a single timer heap.
+
+    Each job is identified by a hashable key, and has its own iterator of
+    execution times (see [`aw_watcher_ask.cron.make_schedule()`]
+    [aw_watcher_ask.cron.make_schedule]). Only the next execution of each job
+    is kept in the heap, so that the cost of finding the next due job does not
+    grow with the length of the schedules.
+
+    Waiting for the next job is done against a [`time.monotonic()`]
+    (https://docs.python.org/3/library/time.html#time.monotonic) deadline,
+    which is not affected by changes to the system clock. The wall clock is
+    checked again every `max_sleep` seconds, so that the deadline is
+    corrected if the clock was stepped (e.g., by NTP) or the system was
+    suspended in the meanwhile.
+
+    Arguments:
+        missed_policy: What to do with executions that were missed by more
+            than `grace` seconds (e.g., because the system was suspended).
+            With `MissedPolicy.skip`, they are dropped; with
+            `MissedPolicy.coalesce`, the job is executed once for all the
+            missed executions.
+        grace: The amount of seconds an execution might be late before it is
+            considered missed.
+        max_sleep: The maximum amount of seconds to sleep before checking the
+            wall clock again.
+        clock: The source of time (see [`aw_watcher_ask.clock.Clock`]
+            [aw_watcher_ask.clock.Clock]). Defaults to the system clock.
+            With a [`VirtualClock`][aw_watcher_ask.clock.VirtualClock], jobs
+            are due as soon as the previous ones are handled.
+        now: A function that returns the current, timezone-aware date and
+            time. Overrides the clock's.
+        monotonic: A function that returns the value of a monotonic clock,
+            in seconds. Overrides the clock's.
+        sleep: A function that suspends execution for an amount of seconds.
+            Overrides the clock's.
+        poll: A function called every `poll_interval` seconds while waiting
+            for the next job (e.g., to reload the jobs from a configuration
+            file). Jobs it adds or removes are taken into account right
+            away.
+        poll_interval: The maximum amount of seconds between calls to
+            `poll`.
+    """
+
+    def __init__(
+        self,
+        missed_policy: MissedPolicy = MissedPolicy.coalesce,
+        grace: float = 60.0,
+        max_sleep: float = 60.0,
+        clock: Clock = SYSTEM_CLOCK,
+        now: Optional[Callable[[], datetime]] = None,
+        monotonic: Optional[Callable[[], float]] = None,
+        sleep: Optional[Callable[[float], None]] = None,
+        poll: Optional[Callable[[], None]] = None,
+        poll_interval: float = 5.0,
+    ) -> None:
+        self.missed_policy = missed_policy
+        self.grace = grace
+        self.max_sleep = max_sleep
+        self.jitter = JitterStats()
+        self._now = now or clock.now
+        self._monotonic = monotonic or clock.monotonic
+        self._sleep = sleep or clock.sleep
+        # steady clocks need no re-anchoring, so sleeps are not split
+        self._steady = clock.steady and not (now or monotonic or sleep)
+        self._heap: List[Tuple[datetime, int, Hashable]] = []
+        self._jobs: Dict[Hashable, _Job] = dict()
+        # tie-breaker for jobs due at the very same moment
+        self._counter = itertools.count()
+        self.poll = poll
+        self.poll_interval = poll_interval
+        # counts jobs added and removed, to tell whether waits are outdated
+        self._changes = 0
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __bool__(self) -> bool:
+        return bool(self._jobs)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._jobs
+
+    def add(
+        self,
+        key: Hashable,
+        executions: Schedule,
+        until: Optional[datetime] = None,
+        next_execution: Optional[datetime] = None,
+    ) -> None:
+        """Adds a new job to the scheduler.
+
+        Arguments:
+            key: A unique identifier for the job.
+            executions: An iterator of execution times for the job.
+            until: An optional date and time after which the job should not be
+                executed anymore.
+            next_execution: The job's next execution time, if already known
+                (e.g., restored from a previous run). The following ones are
+                computed by `executions`, which should be positioned at it.
+        """
+        if key in self._jobs:
+            raise ValueError(f"Job `{key}` is already scheduled.")
+        self._push(key, executions, until, next_execution)
+        self._changes += 1
+
+    def now(self) -> datetime:
+        """Returns the current date and time, according to the scheduler."""
+        return self._now()
+
+    def next_execution(self, key: Hashable) -> Optional[datetime]:
+        """Returns the next execution time of a job, if still scheduled."""
+        job = self._jobs.get(key)
+        return job.next_execution if job is not None else None
+
+    def remove(self, key: Hashable) -> None:
+        """Removes a job from the scheduler."""
+        # its entry in the heap is discarded when it reaches the top
+        del self._jobs[key]
+        self._changes += 1
+
+    def _push(
+        self,
+        key: Hashable,
+        executions: Schedule,
+        until: Optional[datetime],
+        next_execution: Optional[datetime] = None,
+    ) -> None:
+        if next_execution is None:
+            next_execution = executions.get_next(datetime)
+        if until is not None and next_execution >= until:
+            # job is over
+            self._jobs.pop(key, None)
+            return
+        entry = next(self._counter)
+        self._jobs[key] = _Job(executions, until, next_execution, entry)
+        heapq.heappush(self._heap, (next_execution, entry, key))
+
+    def _discard_stale(self) -> None:
+        """Drops heap entries of jobs that were removed or rescheduled."""
+        while self._heap:
+            _, entry, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job is not None and job.entry == entry:
+                return
+            heapq.heappop(self._heap)
+
+    def peek(self) -> Tuple[datetime, Any]:
+        """Returns the next due job and its execution time, keeping it."""
+        self._discard_stale()
+        next_execution, _, key = self._heap[0]
+        return next_execution, key
+
+    def pop(self) -> Tuple[datetime, Any]:
+        """Returns the next due job and its execution time, rescheduling it."""
+        self._discard_stale()
+        next_execution, _, key = heapq.heappop(self._heap)
+        job = self._jobs[key]
+        self._push(key, job.executions, job.until)
+        return next_execution, key
+
+    def take(
+        self,
+        until: datetime,
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> List[Tuple[datetime, Any]]:
+        """Fires ahead of time the jobs due up to a given moment.
+
+        Each job is fired once at most, and rescheduled as if it had been
+        fired at its execution time (e.g., to present prompts due shortly
+        along with one due now).
+
+        Arguments:
+            until: The latest execution time of the jobs to fire.
+            accept: An optional function telling whether a job (given its
+                key) might be fired ahead of time.
+
+        Returns:
+            Tuples of execution times and keys of the jobs fired, in order
+            of their execution times.
+        """
+        taken: List[Tuple[datetime, Any]] = list()
+        for key, job in list(self._jobs.items()):
+            if job.next_execution > until:
+                continue
+            if accept is not None and not accept(key):
+                continue
+            taken.append((job.next_execution, key))
+            # its current entry in the heap is discarded as stale
+            self._push(key, job.executions, job.until)
+            metrics.PROMPTS_FIRED.inc(question_id=key)
+        taken.sort(key=lambda execution: execution[0])
+        return taken
+
+    def _skip_missed(self, key: Hashable, now: datetime) -> None:
+        """Reschedules a job to its first execution after a given moment."""
+        job = self._jobs.get(key)
+        if job is None or job.next_execution > now:
+            return
+        job.executions.set_current(now)
+        self._push(key, job.executions, job.until)
+
+    def _sleep_until(self, target: datetime) -> bool:
+        """Sleeps until a given wall clock time, using a monotonic deadline.
+
+        Returns:
+            Whether the time was reached, or `False` if jobs were added or
+            removed (by `poll`) in the meanwhile.
+        """
+        changes = self._changes
+        deadline = self._monotonic() + (target - self._now()).total_seconds()
+        while True:
+            remaining = deadline - self._monotonic()
+            if remaining <= 0:
+                return True
+            step = remaining
+            if not self._steady:
+                step = min(step, self.max_sleep)
+            if self.poll is not None:
+                step = min(step, self.poll_interval)
+            self._sleep(step)
+            if self.poll is not None:
+                self.poll()
+                if self._changes != changes:
+                    return False
+            if self._steady:
+                continue
+
+            # the monotonic clock does not count time spent in suspension, and
+            # the wall clock might have been stepped: re-anchor if they differ
+            wall_remaining = (target - self._now()).total_seconds()
+            drift = (deadline - self._monotonic()) - wall_remaining
+            if abs(drift) > 1.0:
+                logger.debug(
+                    "System clock moved {:.3f}s relative to monotonic clock "
+                    "(suspension or clock step). Adjusting deadline.",
+                    drift,
+                )
+                deadline = self._monotonic() + wall_remaining
+
+    def due(self) -> Iterator[Tuple[datetime, Any]]:
+        """Waits for jobs to be due, and yields them with their schedules.
+
+        Yields:
+            Tuples of execution times and keys of the due jobs, as soon as
+            each of them is due. Executions missed by more than `grace`
+            seconds are handled according to the `missed_policy`.
+        """
+        while self:
+            next_execution, key = self.peek()
+            logger.bind(question_id=key).info(
+                "Next execution scheduled to {:%Y-%m-%dT%H:%M:%S%z}.",
+                next_execution,
+            )
+            if not self._sleep_until(next_execution):
+                # jobs changed while waiting, and another might be due first
+                continue
+            next_execution, key = self.pop()
+
+            now = self._now()
+            lateness = (now - next_execution).total_seconds()
+            if lateness > self.grace:
+                self._skip_missed(key, now)
+                metrics.MISSED_EXECUTIONS.inc(
+                    policy=self.missed_policy.value
+                )
+                if self.missed_policy == MissedPolicy.skip:
+                    logger.bind(question_id=key).warning(
+                        "Execution scheduled to {} was missed by {:.0f}s. "
+                        "Skipping.",
+                        next_execution.isoformat(),
+                        lateness,
+                    )
+                    continue
+                logger.bind(question_id=key).warning(
+                    "Execution scheduled to {} was missed by {:.0f}s. "
+                    "Firing once for all missed executions.",
+                    next_execution.isoformat(),
+                    lateness,
+                )
+            else:
+                self.jitter.record(lateness)
+                metrics.SCHEDULE_LATENESS.observe(lateness)
+                logger.bind(question_id=key).debug(
+                    "Fired {:.3f}ms after scheduled time.", lateness * 1000
+                )
+            metrics.PROMPTS_FIRED.inc(question_id=key)
+            yield next_execution, key
+
+    def __iter__(self) -> Iterator[Tuple[datetime, Any]]:
+        while self._jobs:
+            yield self.pop()
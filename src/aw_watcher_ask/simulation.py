@@ -0,0 +1,84 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Replay of question schedules in simulated time."""
+
+
+import csv
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+from aw_watcher_ask.clock import VirtualClock
+from aw_watcher_ask.cron import make_schedule
+from aw_watcher_ask.models import Question
+from aw_watcher_ask.scheduling import Scheduler
+
+
+class FireTime(NamedTuple):
+    """A moment when a question would be prompted.
+
+    Attributes:
+        question_id: The question that would be prompted.
+        timestamp: The date and time of the prompt.
+    """
+
+    question_id: str
+    timestamp: datetime
+
+
+def simulate(
+    questions: Iterable[Question],
+    start: datetime,
+    end: datetime,
+) -> Iterator[FireTime]:
+    """Replays the schedules of some questions in virtual time.
+
+    Questions are scheduled exactly as by the watcher (with their random
+    elements seeded by their ids), but driven by a [`VirtualClock`]
+    [aw_watcher_ask.clock.VirtualClock], so that the time between prompts
+    passes instantly. This way, a year of prompts is generated in seconds,
+    and the sampling design might be checked (e.g., that random `R` times are
+    evenly distributed) before it is put to use.
+
+    Arguments:
+        questions: The questions to simulate. Their ids and dates should be
+            already fixed (see [`aw_watcher_ask.daemon.fix_question()`]
+            [aw_watcher_ask.daemon.fix_question]).
+        start: The timezone-aware date and time to start the simulation at.
+        end: The timezone-aware date and time to stop the simulation at.
+
+    Yields:
+        The moments each question would be prompted, in chronological order.
+    """
+    scheduler = Scheduler(clock=VirtualClock(start))
+    for question in questions:
+        scheduler.add(
+            question.question_id,
+            make_schedule(
+                question.schedule, start_time=start, seed=question.question_id
+            ),
+            until=min(question.until, end),
+        )
+    for timestamp, question_id in scheduler.due():
+        yield FireTime(question_id, timestamp)
+
+
+def write_fire_times(fire_times: Iterable[FireTime], file: TextIO) -> int:
+    """Writes simulated prompts to a file, as comma-separated values.
+
+    Arguments:
+        fire_times: The prompts to write (see [`simulate()`]
+            [aw_watcher_ask.simulation.simulate]).
+        file: An open text file to write to.
+
+    Returns:
+        The number of prompts written.
+    """
+    writer = csv.writer(file)
+    writer.writerow(FireTime._fields)
+    count = 0
+    for question_id, timestamp in fire_times:
+        writer.writerow((question_id, timestamp.isoformat()))
+        count += 1
+    return count
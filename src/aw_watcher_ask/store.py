@@ -0,0 +1,278 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""Local store of answers, for analysis without querying ActivityWatch."""
+
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+)
+
+from aw_core.dirs import get_data_dir
+from aw_core.models import Event
+
+from aw_watcher_ask.answers import is_answer, split_answer
+
+
+class Answer(NamedTuple):
+    """An answer read back from the store.
+
+    Attributes:
+        question_id: The question the answer refers to.
+        timestamp: The date and time when the answer was given.
+        success: Whether the user answered the prompt.
+        value: The content of the answer.
+    """
+
+    question_id: str
+    timestamp: datetime
+    success: bool
+    value: Any
+
+
+class Summary(NamedTuple):
+    """Aggregate statistics of the answers to a question.
+
+    Attributes:
+        question_id: The question the statistics refer to.
+        prompts: The number of prompts presented to the user.
+        answered: The number of prompts the user answered.
+        mean: The mean of the numeric answers (e.g., of scale dialogs), or
+            `None` if there are none.
+        first: The date and time of the earliest prompt.
+        last: The date and time of the latest prompt.
+    """
+
+    question_id: str
+    prompts: int
+    answered: int
+    mean: Optional[float]
+    first: datetime
+    last: datetime
+
+    @property
+    def response_rate(self) -> float:
+        """The share of prompts that the user answered."""
+        return self.answered / self.prompts if self.prompts else 0.0
+
+
+def _numeric_value(value: Any) -> Optional[float]:
+    """Interprets the content of an answer as a number, if possible."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def default_store_path(testing: bool = False) -> Path:
+    """Returns the path of the store used by the watcher."""
+    store_name = "answers.sqlite"
+    if testing:
+        store_name = "test-" + store_name
+    return Path(get_data_dir("aw-watcher-ask")) / store_name
+
+
+class AnswerStore:
+    """A SQLite-backed store of answers, indexed by question and time.
+
+    Answers are added as they are given, so that the store is kept up to date
+    incrementally, and range scans and aggregates can be computed locally
+    instead of downloading whole buckets from the ActivityWatch server.
+    Numeric answers are also stored as numbers, so that their means are
+    computed by SQLite itself. The latest description of each question
+    stored in ActivityWatch is kept too, so that it is only stored again
+    when the question changes.
+
+    Arguments:
+        path: Path to the store file. Use `":memory:"` for a transient
+            in-memory store.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "question_id TEXT NOT NULL, "
+            "timestamp REAL NOT NULL, "
+            "success INTEGER NOT NULL, "
+            "value TEXT, "
+            "numeric REAL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS answers_question_time "
+            "ON answers (question_id, timestamp)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS descriptions ("
+            "bucket_id TEXT NOT NULL, "
+            "question_id TEXT NOT NULL, "
+            "description TEXT NOT NULL, "
+            "PRIMARY KEY (bucket_id, question_id)"
+            ")"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM answers"
+            ).fetchone()
+        return count
+
+    def add(self, question_id: str, event: Event) -> None:
+        """Stores the answer held by an event.
+
+        Prompts are stored as answered as told by [`aw_watcher_ask.answers.
+        is_answer()`][aw_watcher_ask.answers.is_answer], so that refusing a
+        `question` dialog counts as answering it.
+        """
+        _, value = split_answer(event.data)
+        answered = is_answer(event.data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers "
+                "(question_id, timestamp, success, value, numeric) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    question_id,
+                    event.timestamp.timestamp(),
+                    answered,
+                    json.dumps(value),
+                    _numeric_value(value),
+                ),
+            )
+
+    def describe(
+        self, bucket_id: str, question_id: str, description: Dict[str, Any]
+    ) -> bool:
+        """Keeps the latest description of a question stored in a bucket.
+
+        Returns:
+            Whether the description is new, or differs from the one kept.
+        """
+        content = json.dumps(description, sort_keys=True)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT description FROM descriptions "
+                "WHERE bucket_id = ? AND question_id = ?",
+                (bucket_id, question_id),
+            ).fetchone()
+            if row is not None and row[0] == content:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions "
+                "(bucket_id, question_id, description) VALUES (?, ?, ?)",
+                (bucket_id, question_id, content),
+            )
+        return True
+
+    @staticmethod
+    def _where(
+        question_ids: Optional[List[str]],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Tuple[str, List[Any]]:
+        clauses: List[str] = list()
+        parameters: List[Any] = list()
+        if question_ids:
+            placeholders = ", ".join("?" * len(question_ids))
+            clauses.append(f"question_id IN ({placeholders})")
+            parameters.extend(question_ids)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            parameters.append(start.timestamp())
+        if end is not None:
+            clauses.append("timestamp < ?")
+            parameters.append(end.timestamp())
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, parameters
+
+    def answers(
+        self,
+        question_ids: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Answer]:
+        """Scans the answers given within a time range.
+
+        Arguments:
+            question_ids: The questions to scan. Defaults to all of them.
+            start: The earliest date and time to scan (inclusive).
+            end: The latest date and time to scan (exclusive).
+
+        Yields:
+            The answers, ordered by question and time.
+        """
+        where, parameters = self._where(question_ids, start, end)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, timestamp, success, value FROM answers"
+                + where
+                + " ORDER BY question_id, timestamp",
+                parameters,
+            ).fetchall()
+        for question_id, timestamp, success, value in rows:
+            yield Answer(
+                question_id,
+                datetime.fromtimestamp(timestamp).astimezone(),
+                bool(success),
+                json.loads(value),
+            )
+
+    def summarize(
+        self,
+        question_ids: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Summary]:
+        """Aggregates the answers given within a time range, per question.
+
+        Arguments:
+            question_ids: The questions to summarize. Defaults to all of them.
+            start: The earliest date and time to consider (inclusive).
+            end: The latest date and time to consider (exclusive).
+
+        Returns:
+            The statistics of each question, ordered by question.
+        """
+        where, parameters = self._where(question_ids, start, end)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, COUNT(*), SUM(success), "
+                "AVG(CASE WHEN success THEN numeric END), "
+                "MIN(timestamp), MAX(timestamp) FROM answers"
+                + where
+                + " GROUP BY question_id ORDER BY question_id",
+                parameters,
+            ).fetchall()
+        return [
+            Summary(
+                question_id,
+                prompts,
+                answered,
+                mean,
+                datetime.fromtimestamp(first).astimezone(),
+                datetime.fromtimestamp(last).astimezone(),
+            )
+            for question_id, prompts, answered, mean, first, last in rows
+        ]
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
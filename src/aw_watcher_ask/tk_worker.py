@@ -0,0 +1,217 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+"""A resident helper process that presents dialog boxes with Tk.
+
+The helper keeps a single, hidden Tk root window alive, and presents dialogs
+as requested over its standard input (see [`ResidentBackend`]
+[aw_watcher_ask.dialogs.ResidentBackend] for the protocol). Only the simpler
+dialog types are supported; the others are refused with a `returncode` of
+`-2`, so that they can be handled by Zenity. Cancelled dialogs are closed
+with a `returncode` of `-15`.
+"""
+
+
+import json
+import queue
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+SUPPORTED_TYPES = {
+    "question", "entry", "password", "scale", "info", "warning", "error"
+}
+
+CANCELLED = -15
+
+
+def _send(message: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def _refuse(request: Dict[str, Any], returncode: int) -> None:
+    _send({
+        "id": request["id"],
+        "event": "result",
+        "success": False,
+        "content": "",
+        "returncode": returncode,
+    })
+
+
+def _read_requests(requests: "queue.Queue[Optional[dict]]") -> None:
+    for line in sys.stdin:
+        if line.strip():
+            requests.put(json.loads(line))
+    requests.put(None)
+
+
+class _Dialog:
+    """A single dialog box, built on a Tk top-level window."""
+
+    def __init__(
+        self,
+        tk: Any,
+        root: Any,
+        request: Dict[str, Any],
+        on_close: Callable[[], None],
+    ) -> None:
+        self.request = request
+        self.on_close = on_close
+        self.closed = False
+        options = request.get("options", dict())
+        question_type = request["question_type"]
+
+        self.window = tk.Toplevel(root)
+        self.window.title(request["title"])
+        self.window.protocol("WM_DELETE_WINDOW", lambda: self.close(1))
+        self.window.bind("<Map>", self._on_map)
+
+        tk.Label(
+            self.window, text=options.get("text", ""), wraplength=400
+        ).pack(padx=10, pady=10)
+
+        self.value: Optional[Any] = None
+        if question_type in ("entry", "password"):
+            self.value = tk.StringVar(
+                value=str(options.get("entry-text", ""))
+            )
+            tk.Entry(
+                self.window,
+                textvariable=self.value,
+                show="*" if question_type == "password" else "",
+            ).pack(padx=10, fill="x")
+        elif question_type == "scale":
+            self.value = tk.IntVar(value=int(options.get("value", 0)))
+            tk.Scale(
+                self.window,
+                variable=self.value,
+                from_=int(options.get("min-value", 0)),
+                to=int(options.get("max-value", 100)),
+                resolution=int(options.get("step", 1)),
+                orient="horizontal",
+            ).pack(padx=10, fill="x")
+
+        buttons = tk.Frame(self.window)
+        buttons.pack(pady=10)
+        if question_type in ("info", "warning", "error"):
+            tk.Button(
+                buttons,
+                text=options.get("ok-label", "OK"),
+                command=lambda: self.close(0),
+            ).pack(side="left", padx=5)
+        else:
+            tk.Button(
+                buttons,
+                text=options.get(
+                    "cancel-label", "No" if question_type == "question"
+                    else "Cancel"
+                ),
+                command=lambda: self.close(1),
+            ).pack(side="left", padx=5)
+            tk.Button(
+                buttons,
+                text=options.get(
+                    "ok-label", "Yes" if question_type == "question"
+                    else "OK"
+                ),
+                command=lambda: self.close(0),
+            ).pack(side="left", padx=5)
+
+        timeout = options.get("timeout")
+        if timeout:
+            self.window.after(int(float(timeout) * 1000), self.close, 5)
+
+    def _on_map(self, event: Any) -> None:
+        if event.widget is self.window:
+            _send({"id": self.request["id"], "event": "visible"})
+            self.window.unbind("<Map>")
+
+    def close(self, returncode: int) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        content = ""
+        if returncode == 0 and self.value is not None:
+            content = str(self.value.get())
+        self.window.destroy()
+        _send({
+            "id": self.request["id"],
+            "event": "result",
+            "success": returncode == 0,
+            "content": content,
+            "returncode": returncode,
+        })
+        self.on_close()
+
+
+def main() -> None:
+    requests: "queue.Queue[Optional[dict]]" = queue.Queue()
+    threading.Thread(
+        target=_read_requests, args=(requests,), daemon=True
+    ).start()
+
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        # no toolkit or display available: refuse every request
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            if request.get("event") != "cancel":
+                _refuse(request, -2)
+    root.withdraw()
+
+    # dialogs are presented one at a time, in the order they were requested
+    pending: Deque[Dict[str, Any]] = deque()
+    state: Dict[str, Optional[_Dialog]] = {"dialog": None}
+
+    def next_dialog() -> None:
+        state["dialog"] = None
+        if pending:
+            present(pending.popleft())
+
+    def present(request: Dict[str, Any]) -> None:
+        if request["question_type"] not in SUPPORTED_TYPES:
+            _refuse(request, -2)
+            return next_dialog()
+        state["dialog"] = _Dialog(tk, root, request, on_close=next_dialog)
+
+    def cancel(request_id: Any) -> None:
+        dialog = state["dialog"]
+        if dialog is not None and dialog.request["id"] == request_id:
+            return dialog.close(CANCELLED)
+        for request in pending:
+            if request["id"] == request_id:
+                pending.remove(request)
+                return _refuse(request, CANCELLED)
+
+    def poll() -> None:
+        while True:
+            try:
+                request = requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                root.destroy()
+                return
+            if request.get("event") == "cancel":
+                cancel(request["id"])
+            elif state["dialog"] is not None:
+                pending.append(request)
+            else:
+                present(request)
+        root.after(20, poll)
+
+    root.after(0, poll)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Measures how the time to aggregate answers grows with the number of hosts.
+
+Each host is a stub server that answers every request with a given latency
+(as a remote server would), holding a bucket of answers. Answers are
+aggregated from increasing numbers of hosts, both in parallel and one host
+after the other, and the wall time of each run is reported.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_aggregate [--hosts N] [--events N]
+        [--latency SECONDS]
+"""
+
+
+import argparse
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+from aw_watcher_ask.aggregation import AggregationState, Endpoint, aggregate
+from tests.stubs import StubServer
+
+
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+END_TIME = START_TIME + timedelta(days=30)
+
+
+def _populate(server: StubServer, hostname: str, events: int) -> None:
+    bucket_id = f"test-aw-watcher-ask_{hostname}"
+    server.buckets[bucket_id] = {
+        "hostname": hostname, "created": START_TIME.isoformat()
+    }
+    interval = (END_TIME - START_TIME) / events
+    server.events[bucket_id] = [
+        {
+            "id": ix + 1,
+            "timestamp": (START_TIME + ix * interval).isoformat(),
+            "duration": 0.0,
+            "data": {
+                "success": True,
+                "bench.question": str(ix % 10),
+                "question_id": "bench.question",
+            },
+        }
+        for ix in range(events)
+    ]
+
+
+def _aggregate(endpoints: List[Endpoint], directory: Path, workers: int):
+    state = AggregationState(directory / f"state-{time.monotonic_ns()}")
+    start = time.perf_counter()
+    count = sum(1 for _ in aggregate(
+        endpoints, state, testing=True, end=END_TIME, max_workers=workers
+    ))
+    return count, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    options = parser.parse_args()
+
+    sizes = sorted({1, max(options.hosts // 4, 1), options.hosts})
+    print(f"{'hosts':>6} {'events':>8} {'parallel s':>11} {'serial s':>9}")
+    with tempfile.TemporaryDirectory() as directory, ExitStack() as stack:
+        servers = [
+            stack.enter_context(StubServer(latency=options.latency))
+            for _ in range(options.hosts)
+        ]
+        for ix, server in enumerate(servers):
+            _populate(server, f"host{ix:03}", options.events)
+        endpoints = [
+            Endpoint("127.0.0.1", server.port) for server in servers
+        ]
+        for size in sizes:
+            count, parallel = _aggregate(
+                endpoints[:size], Path(directory), workers=size
+            )
+            assert count == size * options.events, count
+            _, serial = _aggregate(
+                endpoints[:size], Path(directory), workers=1
+            )
+            print(f"{size:>6} {count:>8} {parallel:>11.2f} {serial:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Compares single and batched event insertion against a stub server.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_batching [--events N] [--latency S]
+"""
+
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+from loguru import logger
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.journal import AnswerJournal, JournalFlusher
+from tests.stubs import StubServer
+
+
+BUCKET_ID = "bench-aw-watcher-ask_localhost"
+
+
+def _events(count: int) -> List[Event]:
+    return [
+        Event(
+            timestamp=datetime.now(timezone.utc),
+            data={"success": True, "bench.question": str(ix)},
+        )
+        for ix in range(count)
+    ]
+
+
+def _single(client: ActivityWatchClient, events: List[Event]) -> None:
+    for event in events:
+        client.insert_event(BUCKET_ID, event)
+
+
+def _batched(client: ActivityWatchClient, events: List[Event]) -> None:
+    journal = AnswerJournal(":memory:")
+    flusher = JournalFlusher(journal, client, batch_size=100)
+    for event in events:
+        journal.append(BUCKET_ID, event)
+    flusher.flush()
+    journal.close()
+
+
+def _measure(
+    name: str,
+    client_class: type,
+    insert: Callable[[ActivityWatchClient, List[Event]], None],
+    events: List[Event],
+    latency: float,
+) -> None:
+    with StubServer(latency=latency) as server:
+        client = client_class(
+            "bench-" + name, testing=True, host="127.0.0.1", port=server.port
+        )
+        client.create_bucket(BUCKET_ID, event_type="bench.question")
+        start = time.perf_counter()
+        insert(client, events)
+        elapsed = time.perf_counter() - start
+        stored = len(server.events[BUCKET_ID])
+        print(
+            f"{name:<20} {stored / elapsed:>12.1f} {len(server.requests):>9} "
+            f"{len(server.connections):>12}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    options = parser.parse_args()
+    logger.remove()
+
+    events = _events(options.events)
+    print(f"{'mode':<20} {'events/s':>12} {'requests':>9} {'connections':>12}")
+    _measure(
+        "single", ActivityWatchClient, _single, events, options.latency
+    )
+    _measure(
+        "single-keepalive", SessionClient, _single, events, options.latency
+    )
+    _measure("batched", SessionClient, _batched, events, options.latency)
+
+
+if __name__ == "__main__":
+    main()
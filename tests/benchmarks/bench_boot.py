@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Measures the time from startup to all questions being scheduled.
+
+Compares reading the questions from a JSON configuration file (as done by
+`aw-watcher-ask daemon`) with restoring them from the registry (as done by
+`aw-watcher-ask start`), against a stub server. Run from the repository root
+with:
+
+    python -m tests.benchmarks.bench_boot [--questions N] [--latency S]
+"""
+
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from loguru import logger
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.cron import compile_expression, make_schedule
+from aw_watcher_ask.daemon import (
+    _prepare_question, _schedule_questions, fix_question, load_questions
+)
+from aw_watcher_ask.models import Question
+from aw_watcher_ask.registry import QuestionRegistry, RegisteredQuestion
+from aw_watcher_ask.scheduling import Scheduler
+from tests.stubs import StubServer
+
+
+SCHEDULES = ["R * * * *", "0 R * * *", "*/15 9-18 * * 1-5", "0 9 * * *"]
+
+
+def _questions(count: int) -> List[Question]:
+    return [
+        Question(
+            question_id=f"Question {ix}",
+            schedule=SCHEDULES[ix % len(SCHEDULES)],
+            options={"text": f"Question number {ix}?"},
+        )
+        for ix in range(count)
+    ]
+
+
+def _from_config(path: Path) -> List[RegisteredQuestion]:
+    return [
+        RegisteredQuestion(fix_question(question), None)
+        for question in load_questions(path)
+    ]
+
+
+def _from_registry(path: Path) -> List[RegisteredQuestion]:
+    registry = QuestionRegistry(path)
+    entries = registry.load()
+    registry.close()
+    return entries
+
+
+def _measure(
+    name: str,
+    load: Callable[[Path], List[RegisteredQuestion]],
+    path: Path,
+    latency: float,
+) -> None:
+    compile_expression.cache_clear()
+    with StubServer(latency=latency) as server:
+        start = time.perf_counter()
+        client = SessionClient(
+            "bench-boot", testing=True, host="127.0.0.1", port=server.port
+        )
+        entries = load(path)
+        loaded = time.perf_counter()
+        # dialogs are prepared before scheduling, as done by the daemon
+        for question, _ in entries:
+            _prepare_question(question)
+        scheduler = Scheduler()
+        _schedule_questions(logger, client, scheduler, entries)
+        ready = time.perf_counter()
+        print(
+            f"{name:<10} {len(scheduler):>9} {(loaded - start) * 1000:>10.1f} "
+            f"{(ready - start) * 1000:>10.1f} {len(server.requests):>9}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0)
+    options = parser.parse_args()
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as directory:
+        questions = _questions(options.questions)
+
+        config_path = Path(directory) / "questions.json"
+        config_path.write_text(json.dumps(
+            {"questions": [question.to_dict() for question in questions]}
+        ))
+
+        registry_path = Path(directory) / "registry.sqlite"
+        registry = QuestionRegistry(registry_path)
+        for question in questions:
+            fix_question(question)
+            registry.register(question, make_schedule(
+                question.schedule, seed=question.question_id
+            ).get_next())
+        registry.close()
+
+        print(
+            f"{'source':<10} {'questions':>9} {'loaded ms':>10} "
+            f"{'ready ms':>10} {'requests':>9}"
+        )
+        _measure("config", _from_config, config_path, options.latency)
+        _measure("registry", _from_registry, registry_path, options.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Counts the dialogs and writes spared by coalescing prompts due together.
+
+A typical set of check-in questions is posed over a number of simulated days
+(with a virtual clock, so that days pass in a moment), with increasing
+coalescing windows. Dialogs are answered at once by a fake backend, which
+counts them (each one a Zenity process spawned, in real use). Answers are
+journaled and flushed to a stub server after each prompt, as the daemon does
+when prompts are answered minutes apart.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_coalesce [--days N]
+        [--windows SECONDS ...]
+"""
+
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+from loguru import logger
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.clock import VirtualClock
+from aw_watcher_ask.coalescing import coalesce
+from aw_watcher_ask.core import (
+    _ask, _ask_coalesced, _store_answer, _store_answers
+)
+from aw_watcher_ask.cron import make_schedule
+from aw_watcher_ask.daemon import (
+    PosedQuestion, _prepare_question, _prompt_groups
+)
+from aw_watcher_ask.dialogs import DialogResult, PreparedDialog
+from aw_watcher_ask.journal import AnswerJournal, JournalFlusher
+from aw_watcher_ask.models import DialogType, Question
+from aw_watcher_ask.scheduling import Scheduler
+from aw_watcher_ask.store import AnswerStore
+from tests.stubs import StubServer
+
+
+BUCKET_ID = "bench-aw-watcher-ask_localhost"
+START_TIME = datetime(2021, 1, 4, tzinfo=timezone.utc)
+
+QUESTIONS = [
+    Question("happy", DialogType.question, schedule="0 9-18 * * *"),
+    Question(
+        "focus",
+        DialogType.scale,
+        schedule="0 9-18 * * *",
+        options={"min-value": 1, "max-value": 5},
+    ),
+    Question(
+        "energy",
+        DialogType.scale,
+        schedule="*/30 9-18 * * *",
+        options={"min-value": 1, "max-value": 5},
+    ),
+    Question("doing", DialogType.entry, schedule="R 9-18 * * *"),
+    Question("slept", DialogType.calendar, schedule="0 9 * * *"),
+    Question("places", DialogType.list, schedule="0 12,18 * * *"),
+]
+
+
+class CountingBackend:
+    """Answers every dialog at once, counting them."""
+
+    def __init__(self) -> None:
+        self.dialogs = 0
+
+    def show_prepared(self, dialog: PreparedDialog) -> DialogResult:
+        self.dialogs += 1
+        return DialogResult(True, "3", 0)
+
+    def show_fields_prepared(
+        self, dialog: PreparedDialog
+    ) -> Tuple[bool, List[str], float]:
+        self.dialogs += 1
+        return True, ["3"] * max(len(dialog.labels), 1), 0.0
+
+
+def _pose(server: StubServer, days: float, within: float) -> Tuple[int, ...]:
+    clock = VirtualClock(START_TIME)
+    scheduler = Scheduler(clock=clock)
+    posed = dict()
+    for question in QUESTIONS:
+        posed[question.question_id] = PosedQuestion(
+            question, _prepare_question(question), BUCKET_ID
+        )
+        scheduler.add(
+            question.question_id,
+            make_schedule(
+                question.schedule,
+                start_time=START_TIME,
+                seed=question.question_id,
+            ),
+            until=START_TIME + timedelta(days=days),
+        )
+
+    client = SessionClient(
+        "bench-coalesce", testing=True, host="127.0.0.1", port=server.port
+    )
+    journal = AnswerJournal(":memory:")
+    flusher = JournalFlusher(journal, client)
+    store = AnswerStore(":memory:")
+    backend = CountingBackend()
+    requests = len(server.requests)
+    writes = 0
+    for group in _prompt_groups(scheduler, posed, within):
+        if len(group) == 1:
+            (question_id,) = group
+            answer = _ask(posed[question_id].dialog, backend=backend)
+            _store_answer(
+                logger, journal, flusher, store, BUCKET_ID, question_id,
+                answer, clock=clock,
+            )
+        else:
+            answers = _ask_coalesced(
+                coalesce([
+                    (question_id, posed[question_id].dialog)
+                    for question_id in group
+                ]),
+                backend=backend,
+            )
+            _store_answers(
+                logger, journal, flusher, store,
+                {question_id: BUCKET_ID for question_id in group},
+                answers, clock=clock,
+            )
+        writes += 1
+        flusher.flush()
+
+    events = len(store)
+    journal.close()
+    store.close()
+    client.session.close()
+    return events, backend.dialogs, writes, len(server.requests) - requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument(
+        "--windows", type=float, nargs="+", default=[0.0, 60.0, 300.0, 900.0]
+    )
+    options = parser.parse_args()
+    logger.remove()
+
+    print(
+        f"{'window s':>9} {'prompts':>8} {'dialogs':>8} {'writes':>7} "
+        f"{'requests':>9}"
+    )
+    with StubServer() as server:
+        server.buckets[BUCKET_ID] = {
+            "hostname": "localhost", "created": START_TIME.isoformat()
+        }
+        server.events[BUCKET_ID] = []
+        for within in options.windows:
+            events, dialogs, writes, requests = _pose(
+                server, options.days, within
+            )
+            print(
+                f"{within:>9.0f} {events:>8} {dialogs:>8} {writes:>7} "
+                f"{requests:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
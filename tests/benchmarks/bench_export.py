@@ -0,0 +1,194 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Measures the memory and throughput of exporting large buckets.
+
+A stub server, running in its own process, serves a bucket with millions of
+answers generated on demand (so that its memory does not get in the way).
+The bucket is exported at increasing sizes, each time by a new process,
+whose peak memory (resident set size) is reported.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_export [--events N] [--format F]
+        [--page-size N] [--baseline]
+"""
+
+
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.export import (
+    filter_events, iter_events, write_csv, write_ndjson
+)
+from tests.stubs import StubServer
+
+
+BUCKET_ID = "bench-aw-watcher-ask_localhost"
+START_TIME = datetime(2020, 1, 1, tzinfo=timezone.utc)
+# one answer every five minutes: a million answers span about ten years
+INTERVAL = 300
+
+
+class SyntheticServer(StubServer):
+    """A stub server whose bucket holds answers computed on demand.
+
+    Arguments:
+        events: The number of answers in the bucket.
+    """
+
+    def __init__(self, events: int) -> None:
+        super().__init__()
+        self.count = events
+        self.buckets[BUCKET_ID] = {
+            "type": "bench.question", "created": START_TIME.isoformat()
+        }
+
+    def _index(self, timestamp: Optional[str], default: int) -> int:
+        if not timestamp:
+            return default
+        offset = datetime.fromisoformat(timestamp) - START_TIME
+        return int(offset.total_seconds() // INTERVAL)
+
+    def get_events(
+        self,
+        bucket_id: str,
+        limit: str = "-1",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> List[dict]:
+        first = max(self._index(start, 0), 0)
+        if start and START_TIME + timedelta(seconds=first * INTERVAL) < (
+            datetime.fromisoformat(start)
+        ):
+            first += 1
+        last = min(self._index(end, self.count - 1), self.count - 1)
+        indexes = range(last, first - 1, -1)
+        if int(limit) >= 0:
+            indexes = indexes[:int(limit)]
+        return [
+            {
+                "id": ix + 1,
+                "timestamp": (
+                    START_TIME + timedelta(seconds=ix * INTERVAL)
+                ).isoformat(),
+                "duration": 0.0,
+                "data": {
+                    "success": True,
+                    "bench.question": str(ix % 10),
+                    "question_id": "bench.question",
+                },
+            }
+            for ix in indexes
+        ]
+
+
+def _serve(events: int, ports: multiprocessing.Queue) -> None:
+    with SyntheticServer(events) as server:
+        ports.put(server.port)
+        while True:
+            time.sleep(3600)
+
+
+def _export(
+    client: SessionClient, events: int, output_format: str, page_size: int
+) -> int:
+    end = START_TIME + timedelta(seconds=(events - 1) * INTERVAL)
+    answers = filter_events(
+        iter_events(client, BUCKET_ID, end=end, page_size=page_size),
+        ["bench.question"],
+    )
+    write = write_csv if output_format == "csv" else write_ndjson
+    with open(os.devnull, "w") as file:
+        return write(answers, file)
+
+
+def _fetch_all(client: SessionClient, events: int, output_format: str) -> int:
+    """Exports the bucket with a single request, as a baseline."""
+    answers = client.get_events(BUCKET_ID)[-events:]
+    answers.reverse()
+    write = write_csv if output_format == "csv" else write_ndjson
+    with open(os.devnull, "w") as file:
+        return write(answers, file)
+
+
+def _measure(
+    mode: str,
+    port: int,
+    events: int,
+    output_format: str,
+    page_size: int,
+    results: multiprocessing.Queue,
+) -> None:
+    client = SessionClient(
+        "bench-export", testing=True, host="127.0.0.1", port=port
+    )
+    start = time.perf_counter()
+    if mode == "paged":
+        exported = _export(client, events, output_format, page_size)
+    else:
+        exported = _fetch_all(client, events, output_format)
+    elapsed = time.perf_counter() - start
+    client.session.close()
+    # kibibytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((exported, elapsed, peak / 1024))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument(
+        "--format", choices=["ndjson", "csv"], default="ndjson"
+    )
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument(
+        "--baseline", action="store_true",
+        help="Also export by fetching whole buckets at once.",
+    )
+    options = parser.parse_args()
+
+    sizes = sorted({
+        max(options.events // 100, 1),
+        max(options.events // 10, 1),
+        options.events,
+    })
+    modes = ["paged", "whole"] if options.baseline else ["paged"]
+    print(
+        f"{'mode':<10} {'events':>9} {'seconds':>9} {'events/s':>10} "
+        f"{'peak RSS MiB':>13}"
+    )
+    for size in sizes:
+        ports: multiprocessing.Queue = multiprocessing.Queue()
+        server = multiprocessing.Process(
+            target=_serve, args=(size, ports), daemon=True
+        )
+        server.start()
+        port = ports.get()
+        for mode in modes:
+            results: multiprocessing.Queue = multiprocessing.Queue()
+            exporter = multiprocessing.Process(target=_measure, args=(
+                mode, port, size, options.format, options.page_size, results
+            ))
+            exporter.start()
+            exported, elapsed, peak = results.get()
+            exporter.join()
+            assert exported == size, (exported, size)
+            print(
+                f"{mode:<10} {size:>9} {elapsed:>9.2f} "
+                f"{size / elapsed:>10.0f} {peak:>13.1f}"
+            )
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
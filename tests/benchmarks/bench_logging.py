@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Measures the cost of the log lines written for each prompt.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_logging [--prompts N]
+"""
+
+
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+from loguru import logger
+
+from aw_watcher_ask import logs
+
+
+def _eager(log: Any, bucket_id: str, next_execution: datetime) -> None:
+    """The log lines of a prompt, as formatted before being logged."""
+    log.info(f"Next execution scheduled to {next_execution.isoformat()}.")
+    log.info("New prompt fired. Waiting for user input...")
+    log.debug(f"Fired {0.123:.3f}ms after scheduled time.")
+    log.info(f"Event stored in bucket '{bucket_id}'.")
+
+
+def _lazy(log: Any, bucket_id: str, next_execution: datetime) -> None:
+    """The log lines of a prompt, formatted only if logged."""
+    log.info(
+        "Next execution scheduled to {:%Y-%m-%dT%H:%M:%S%z}.", next_execution
+    )
+    log.info("New prompt fired. Waiting for user input...")
+    log.debug("Fired {:.3f}ms after scheduled time.", 0.123)
+    log.info("Event stored in bucket '{}'.", bucket_id)
+
+
+def _measure(
+    name: str,
+    prompt: Callable[[Any, str, datetime], None],
+    config: Dict[str, Any],
+    prompts: int,
+) -> None:
+    with open(os.devnull, "w") as sink:
+        logs.configure(sink=sink, **config)
+        log = logger.bind(question_id="bench.question")
+        now = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        for _ in range(prompts):
+            prompt(log, "bench-bucket", now)
+        logged = time.perf_counter()
+        logs.flush()
+        done = time.perf_counter()
+        logger.remove(logs._handler[0])  # type: ignore
+        logs._handler = None
+    print(
+        f"{name:<16} {(logged - start) / prompts * 1e6:>16.1f} "
+        f"{(done - start) / prompts * 1e6:>16.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=20000)
+    options = parser.parse_args()
+
+    print(f"{'mode':<16} {'caller µs/prompt':>16} {'total µs/prompt':>16}")
+    _measure("eager", _eager, {}, options.prompts)
+    _measure("lazy", _lazy, {}, options.prompts)
+    _measure("lazy-warning", _lazy, {"level": "WARNING"}, options.prompts)
+    _measure("lazy-sampled", _lazy, {"sample": {"INFO": 10}}, options.prompts)
+    _measure("lazy-json", _lazy, {"serialize": True}, options.prompts)
+    _measure(
+        "lazy-json-async",
+        _lazy,
+        {"serialize": True, "enqueue": True},
+        options.prompts,
+    )
+
+
+if __name__ == "__main__":
+    main()
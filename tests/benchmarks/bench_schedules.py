@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Compares computing a year of executions with croniter and CronSchedule.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_schedules [--questions N] [--days D]
+"""
+
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from croniter import croniter
+
+from aw_watcher_ask.cron import CronSchedule
+
+
+# a mix of typical experience sampling schedules
+EXPRESSIONS = [
+    "R * * * *",
+    "0 */2 * * *",
+    "*/30 9-18 * * mon-fri",
+    "R R * * *",
+    "0 12 * * *",
+]
+
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def _measure(name: str, build, questions: int, days: int) -> None:
+    end_time = START_TIME + timedelta(days=days)
+    occurrences = 0
+    start = time.perf_counter()
+    for ix in range(questions):
+        expression = EXPRESSIONS[ix % len(EXPRESSIONS)]
+        schedule = build(expression, ix)
+        while schedule.get_next(datetime) < end_time:
+            occurrences += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<14} {occurrences:>12} {elapsed:>10.2f} "
+        f"{elapsed / occurrences * 1e6:>14.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    options = parser.parse_args()
+
+    print(
+        f"{'engine':<14} {'occurrences':>12} {'seconds':>10} "
+        f"{'us/next':>14}"
+    )
+    _measure(
+        "croniter",
+        lambda expression, _: croniter(expression, start_time=START_TIME),
+        options.questions,
+        options.days,
+    )
+    _measure(
+        "CronSchedule",
+        lambda expression, seed: CronSchedule(
+            expression, start_time=START_TIME, seed=seed
+        ),
+        options.questions,
+        options.days,
+    )
+
+
+if __name__ == "__main__":
+    main()
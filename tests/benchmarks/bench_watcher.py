@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Runs the watcher end to end under accelerated time, against stubs.
+
+Dialogs are answered by a fake backend (or, with `--spawn`, by a fake
+`zenity` executable) after a configurable latency, and answers are sent to a
+stub ActivityWatch server, so that no display nor network access is needed.
+The watcher's clock runs `--speedup` times faster than real time, so that
+hours of dense schedules are run in seconds. Run from the repository root
+with:
+
+    python -m tests.benchmarks.bench_watcher [--scenario NAME] [--speedup X]
+        [--hours H] [--questions N] [--spawn]
+
+Each scenario reports the answers stored per second, how late prompts fired
+(in real time), the CPU time used and the peak resident memory of the
+process.
+"""
+
+
+import argparse
+import os
+import resource
+import stat
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Iterator, List, NamedTuple, Tuple
+
+from aw_watcher_ask import core, daemon, logs
+from aw_watcher_ask.client import get_client
+from aw_watcher_ask.clock import AcceleratedClock
+from aw_watcher_ask.dialogs import (
+    DialogBackend, DialogResult, ZenityBackend
+)
+from aw_watcher_ask.models import DialogType, Question
+from aw_watcher_ask.scheduling import Scheduler
+from tests.stubs import StubServer
+
+
+FAKE_ZENITY = """#!/bin/sh
+sleep "${FAKE_ZENITY_LATENCY:-0}"
+echo 7
+"""
+
+
+class Scenario(NamedTuple):
+    """A workload for the watcher.
+
+    Attributes:
+        questions: The number of questions posed at the same time.
+        schedule: The schedule of every question.
+        server_latency: Seconds the server takes to answer each request.
+        dialog_latency: Seconds the (fake) user takes to answer each prompt.
+    """
+
+    questions: int
+    schedule: str
+    server_latency: float
+    dialog_latency: float
+
+
+SCENARIOS = {
+    "single": Scenario(1, "* * * * * R", 0.0, 0.001),
+    "many": Scenario(50, "* * * * * R", 0.0, 0.001),
+    "dense": Scenario(10, "* * * * * */10", 0.0, 0.001),
+    "slow-server": Scenario(50, "* * * * * R", 0.05, 0.001),
+    "slow-user": Scenario(50, "* * * * * R", 0.0, 0.5),
+}
+
+
+class FakeBackend(DialogBackend):
+    """Answers every dialog with `7`, after a fixed latency."""
+
+    name = "fake"
+
+    def __init__(self, latency: float) -> None:
+        super().__init__()
+        self.latency = latency
+
+    def show(self, question_type, title, *args, **kwargs) -> DialogResult:
+        self._record_latency(0.0)
+        time.sleep(self.latency)
+        return DialogResult(success=True, content="7", returncode=0)
+
+    def show_fields(self, question_type, title, separator="|", *args,
+                    **kwargs) -> Tuple[bool, List[str], int]:
+        result = self.show(question_type, title)
+        return result.success, [result.content], result.returncode
+
+
+@contextmanager
+def _patched(module: Any, **attributes: Any) -> Iterator[None]:
+    """Temporarily replaces attributes of a module."""
+    originals = {name: getattr(module, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(module, name, value)
+
+
+@contextmanager
+def _watcher(
+    server: StubServer,
+    backend: DialogBackend,
+    schedulers: List[Scheduler],
+) -> Iterator[None]:
+    """Points the watcher at the stubs."""
+
+    def scheduler(*args, **kwargs) -> Scheduler:
+        # prompts late by real-time overheads are not missed ones, even if
+        # the accelerated clock inflates their lateness
+        instance = Scheduler(*args, grace=3600.0, **kwargs)
+        schedulers.append(instance)
+        return instance
+
+    attributes = dict(
+        Scheduler=scheduler,
+        get_backend=lambda _: backend,
+        _client_setup=lambda testing=False: get_client(
+            "test-aw-watcher-ask", True, "127.0.0.1", server.port
+        ),
+    )
+    with _patched(core, **attributes), _patched(daemon, **attributes):
+        yield
+
+
+def _spawn_backend(directory: Path, latency: float) -> ZenityBackend:
+    """Puts a fake `zenity` executable first in the `PATH`."""
+    executable = directory / "zenity"
+    executable.write_text(FAKE_ZENITY)
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ['PATH']}"
+    os.environ["FAKE_ZENITY_LATENCY"] = str(latency)
+    return ZenityBackend()
+
+
+def _measure(
+    name: str,
+    scenario: Scenario,
+    speedup: float,
+    hours: float,
+    spawn: bool,
+) -> None:
+    schedulers: List[Scheduler] = list()
+    clock = AcceleratedClock(speedup)
+    until = clock.now() + timedelta(hours=hours)
+    with tempfile.TemporaryDirectory() as directory, \
+            StubServer(latency=scenario.server_latency) as server:
+        os.environ["XDG_DATA_HOME"] = directory
+        backend = (
+            _spawn_backend(Path(directory), scenario.dialog_latency)
+            if spawn else FakeBackend(scenario.dialog_latency)
+        )
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        with _watcher(server, backend, schedulers):
+            if scenario.questions == 1:
+                core.main(
+                    "bench.question",
+                    DialogType.scale,
+                    schedule=scenario.schedule,
+                    until=until,
+                    testing=True,
+                    clock=clock,
+                )
+            else:
+                # many questions share a single process (and journal)
+                daemon.run(
+                    [
+                        Question(
+                            question_id=f"bench.question.{ix}",
+                            question_type=DialogType.scale,
+                            schedule=scenario.schedule,
+                            until=until,
+                        )
+                        for ix in range(scenario.questions)
+                    ],
+                    testing=True,
+                    max_workers=scenario.questions,
+                    clock=clock,
+                )
+        elapsed = time.perf_counter() - start
+        final = resource.getrusage(resource.RUSAGE_SELF)
+        stored = sum(len(events) for events in server.events.values())
+
+    cpu = (final.ru_utime - usage.ru_utime) + (final.ru_stime - usage.ru_stime)
+    jitter = schedulers[0].jitter
+    # the accelerated clock inflates lateness by the speedup
+    print(
+        f"{name:<12} {stored:>8} {stored / elapsed:>10.1f} "
+        f"{jitter.mean / speedup * 1000:>9.2f} "
+        f"{jitter.max / speedup * 1000:>9.2f} {cpu:>7.2f} "
+        f"{cpu / elapsed * 100:>5.0f}% {final.ru_maxrss / 1024:>8.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario", choices=sorted(SCENARIOS), action="append"
+    )
+    parser.add_argument("--speedup", type=float, default=600.0)
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--questions", type=int)
+    parser.add_argument("--spawn", action="store_true")
+    options = parser.parse_args()
+    # the watcher registers its own log sink, so silence it instead
+    logs.configure(level="ERROR")
+
+    print(
+        f"{'scenario':<12} {'answers':>8} {'answers/s':>10} "
+        f"{'jitter ms':>9} {'max ms':>9} {'cpu s':>7} {'cpu':>6} "
+        f"{'rss MB':>8}"
+    )
+    for name in options.scenario or list(SCENARIOS):
+        scenario = SCENARIOS[name]
+        if options.questions and scenario.questions > 1:
+            scenario = scenario._replace(questions=options.questions)
+        _measure(
+            name, scenario, options.speedup, options.hours, options.spawn
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Shared fixtures for aw-watcher-ask tests."""
+
+
+import pytest
+
+from tests.stubs import StubServer
+
+
+@pytest.fixture(scope="function")
+def stub_server():
+    """Provides a local, in-memory ActivityWatch server."""
+    with StubServer() as server:
+        yield server
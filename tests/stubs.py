@@ -0,0 +1,238 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Stand-ins for the ActivityWatch server, for tests and benchmarks."""
+
+
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from aw_core.models import Event
+from aw_transform.heartbeats import heartbeat_merge
+
+
+# when the answers built by `answer_event()` start
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def answer_event(
+    hours: float,
+    question_id: str,
+    value: Any,
+    success: bool = True,
+    title: Optional[str] = None,
+) -> Event:
+    """Builds an answer to a question, as stored by the watcher.
+
+    Arguments:
+        hours: The amount of hours after `START_TIME` the answer was given.
+        question_id: The question answered.
+        value: The content of the answer.
+        success: Whether the prompt was accepted.
+        title: If given, the answer is stored under this title instead of
+            `value`, as done by earlier versions of aw-watcher-ask.
+    """
+    return Event(
+        timestamp=START_TIME + timedelta(hours=hours),
+        data={
+            "success": success,
+            title or "value": value,
+            "question_id": question_id,
+        },
+    )
+
+
+def _parse_time(timestamp: str) -> datetime:
+    """Reads a timestamp as sent by clients, or stored by the server."""
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Handles requests to a small subset of the ActivityWatch REST API."""
+
+    # keep connections alive, as the real server does
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    server: "StubServer"
+
+    def log_message(self, format, *args) -> None:  # noqa: A002
+        pass
+
+    def _reply(self, status: int = 200, body: Any = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _dispatch(self, method: str) -> None:
+        stub = self.server
+        url = urlparse(self.path)
+        params = {
+            key: values[0] for key, values in parse_qs(url.query).items()
+        }
+        body = self._read_body()
+        stub.requests.append((method, url.path))
+        stub.connections.add(self.client_address)
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if url.path == "/api/0/info":
+            return self._reply(body={"hostname": "stub", "testing": True})
+        if url.path == "/api/0/buckets/":
+            return self._reply(body={
+                bucket_id: dict(bucket, id=bucket_id)
+                for bucket_id, bucket in stub.buckets.items()
+            })
+
+        match = re.fullmatch(
+            r"/api/0/buckets/([^/]+)(/events(?:/(\d+))?|/heartbeat)?",
+            url.path,
+        )
+        if not match:
+            return self._reply(404, {"message": "Not found"})
+        bucket_id, events_path, event_id = match.groups()
+
+        if not events_path:
+            if method == "POST":
+                stub.buckets.setdefault(bucket_id, body or dict())
+                stub.events.setdefault(bucket_id, [])
+                return self._reply(body=None)
+            if method == "DELETE":
+                stub.buckets.pop(bucket_id, None)
+                stub.events.pop(bucket_id, None)
+                return self._reply(body=None)
+            return self._reply(body=stub.buckets.get(bucket_id))
+
+        if bucket_id not in stub.buckets:
+            return self._reply(404, {"message": "There's no such bucket"})
+        if events_path == "/heartbeat":
+            with stub.lock:
+                stub.heartbeat(bucket_id, body, float(params["pulsetime"]))
+            return self._reply(body=None)
+        if method == "POST":
+            with stub.lock:
+                for event in body:
+                    # events with ids replace the stored ones, as upstream
+                    if event.get("id") is not None:
+                        stub.events[bucket_id] = [
+                            stored for stored in stub.events[bucket_id]
+                            if stored["id"] != event["id"]
+                        ]
+                    else:
+                        event["id"] = next(stub.event_ids)
+                    stub.events[bucket_id].append(event)
+            return self._reply(body=None)
+        if method == "DELETE":
+            stub.events[bucket_id] = [
+                event for event in stub.events[bucket_id]
+                if event["id"] != int(event_id)
+            ]
+            return self._reply(body=None)
+        return self._reply(body=stub.get_events(bucket_id, **params))
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+
+class StubServer(ThreadingHTTPServer):
+    """A minimal, in-memory ActivityWatch server running in a thread.
+
+    Arguments:
+        latency: An amount of seconds to wait before answering each request,
+            to simulate a slow server.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.latency = latency
+        self.buckets: Dict[str, dict] = dict()
+        self.events: Dict[str, List[dict]] = dict()
+        self.requests: List[tuple] = list()
+        self.connections: set = set()
+        self.lock = threading.Lock()
+        self.event_ids = iter(range(1, 2 ** 63))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def get_events(
+        self,
+        bucket_id: str,
+        limit: str = "-1",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> List[dict]:
+        """Returns stored events, most recent first, as the real server."""
+        events = sorted(
+            self.events[bucket_id],
+            key=lambda event: event["timestamp"],
+            reverse=True,
+        )
+        # events overlapping the range are returned, even if they start
+        # before it (e.g., heartbeats merged into long events)
+        if start:
+            events = [
+                event for event in events
+                if _parse_time(event["timestamp"])
+                + timedelta(seconds=event.get("duration") or 0)
+                >= _parse_time(start)
+            ]
+        if end:
+            events = [
+                event for event in events
+                if _parse_time(event["timestamp"]) <= _parse_time(end)
+            ]
+        if int(limit) >= 0:
+            events = events[:int(limit)]
+        return events
+
+    def heartbeat(self, bucket_id: str, event: dict, pulsetime: float) -> None:
+        """Merges an event with the bucket's last one, as the real server."""
+        heartbeat = Event(**event)
+        events = self.events[bucket_id]
+        if events:
+            last = max(events, key=lambda stored: stored["timestamp"])
+            merged = heartbeat_merge(Event(**last), heartbeat, pulsetime)
+            if merged is not None:
+                last["duration"] = merged.duration.total_seconds()
+                return
+        event["id"] = next(self.event_ids)
+        events.append(event)
+
+    def __enter__(self) -> "StubServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,186 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for aggregating the answers gathered in many hosts."""
+
+
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from aw_watcher_ask.aggregation import (
+    AggregationState, Endpoint, aggregate, discover
+)
+from tests.stubs import StubServer
+
+
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+END_TIME = START_TIME + timedelta(days=3)
+
+
+def _add_host(server: StubServer, hostname: str, hours: List[float]) -> None:
+    """Adds a watcher's bucket to a server, with some answers."""
+    bucket_id = f"test-aw-watcher-ask_{hostname}"
+    server.buckets[bucket_id] = {
+        "hostname": hostname, "created": START_TIME.isoformat()
+    }
+    events = server.events.setdefault(bucket_id, [])
+    for hour in hours:
+        events.append({
+            "id": next(server.event_ids),
+            "timestamp": (START_TIME + timedelta(hours=hour)).isoformat(),
+            "duration": 0.0,
+            "data": {
+                "success": True,
+                "happiness": str(hour),
+                "question_id": "happiness" if hour % 2 else "focus",
+            },
+        })
+
+
+def _endpoint(server: StubServer) -> Endpoint:
+    return Endpoint("127.0.0.1", server.port)
+
+
+def test_endpoint_parse():
+    """Tests reading servers' addresses."""
+    assert Endpoint.parse("study-01:5600") == Endpoint("study-01", 5600)
+    assert Endpoint.parse("study-01") == Endpoint("study-01")
+    assert str(Endpoint("study-01", 5600)) == "study-01:5600"
+
+
+def test_discover(stub_server):
+    """Tests listing the watchers' buckets in a server."""
+    _add_host(stub_server, "laptop", [])
+    stub_server.buckets["aw-watcher-afk_laptop"] = {"hostname": "laptop"}
+    (stream,) = discover(_endpoint(stub_server), testing=True)
+    assert stream.bucket_id == "test-aw-watcher-ask_laptop"
+    assert stream.hostname == "laptop"
+
+
+def test_aggregate(tmp_path):
+    """Tests merging the answers of many hosts, and resuming later."""
+    state = AggregationState(tmp_path / "state.json")
+    with StubServer() as first, StubServer() as second:
+        _add_host(first, "laptop", [0, 2, 4])
+        _add_host(first, "desktop", [1, 4])
+        _add_host(second, "phone", [3, 5])
+        endpoints = [_endpoint(first), _endpoint(second)]
+
+        answers = list(aggregate(endpoints, state, True, end=END_TIME))
+        assert [
+            (item.hostname, item.event.timestamp) for item in answers
+        ] == [
+            ("laptop", START_TIME),
+            ("desktop", START_TIME + timedelta(hours=1)),
+            ("laptop", START_TIME + timedelta(hours=2)),
+            ("phone", START_TIME + timedelta(hours=3)),
+            ("desktop", START_TIME + timedelta(hours=4)),
+            ("laptop", START_TIME + timedelta(hours=4)),
+            ("phone", START_TIME + timedelta(hours=5)),
+        ]
+        state.save()
+
+        # only new answers are read, including those at the last timestamp
+        _add_host(first, "laptop", [4, 6])
+        state = AggregationState(tmp_path / "state.json")
+        answers = list(aggregate(endpoints, state, True, end=END_TIME))
+        assert [
+            (item.hostname, item.event.timestamp) for item in answers
+        ] == [
+            ("laptop", START_TIME + timedelta(hours=4)),
+            ("laptop", START_TIME + timedelta(hours=6)),
+        ]
+        assert not list(aggregate(endpoints, state, True, end=END_TIME))
+
+
+def test_aggregate_resume_overlapping(stub_server, tmp_path):
+    """Tests resuming past answers that last beyond the last timestamp."""
+    _add_host(stub_server, "laptop", [0, 2, 4])
+    # e.g., identical answers merged as heartbeats
+    events = stub_server.events["test-aw-watcher-ask_laptop"]
+    events[1]["duration"] = 3 * 3600.0
+    endpoints = [_endpoint(stub_server)]
+    state = AggregationState(tmp_path / "state.json")
+    assert len(list(aggregate(endpoints, state, True, end=END_TIME))) == 3
+
+    _add_host(stub_server, "laptop", [6])
+    answers = list(aggregate(endpoints, state, True, end=END_TIME))
+    assert [item.event.timestamp for item in answers] == [
+        START_TIME + timedelta(hours=6)
+    ]
+
+
+def test_aggregate_filtered(stub_server, tmp_path):
+    """Tests aggregating the answers to some questions only."""
+    _add_host(stub_server, "laptop", [0, 1, 2, 3])
+    answers = aggregate(
+        [_endpoint(stub_server)],
+        AggregationState(tmp_path / "state.json"),
+        testing=True,
+        question_ids=["happiness"],
+        end=END_TIME,
+    )
+    assert [item.event.data["happiness"] for item in answers] == ["1", "3"]
+
+
+def test_aggregate_few_workers(stub_server, tmp_path):
+    """Tests reading more buckets than workers, in many pages each."""
+    for hostname in ("laptop", "desktop", "phone"):
+        _add_host(stub_server, hostname, [ix / 4 for ix in range(12)])
+    answers = list(aggregate(
+        [_endpoint(stub_server)],
+        AggregationState(tmp_path / "state.json"),
+        testing=True,
+        end=END_TIME,
+        page_size=2,
+        max_workers=1,
+    ))
+    assert len(answers) == 36
+    timestamps = [item.event.timestamp for item in answers]
+    assert timestamps == sorted(timestamps)
+
+
+def test_aggregate_unreachable(stub_server, tmp_path):
+    """Tests skipping servers that can not be reached."""
+    _add_host(stub_server, "laptop", [0, 1])
+    with StubServer() as down:
+        unreachable = _endpoint(down)
+    failures: List[str] = list()
+    answers = list(aggregate(
+        [unreachable, _endpoint(stub_server)],
+        AggregationState(tmp_path / "state.json"),
+        testing=True,
+        end=END_TIME,
+        failures=failures,
+    ))
+    assert len(answers) == 2
+    assert failures == [str(unreachable)]
+
+
+def test_aggregate_parallel(tmp_path):
+    """Tests that reading many slow servers takes as long as reading one."""
+
+    def elapsed(count: int) -> float:
+        with ExitStack() as stack:
+            servers = [
+                stack.enter_context(StubServer(latency=0.2))
+                for _ in range(count)
+            ]
+            for ix, server in enumerate(servers):
+                _add_host(server, f"host{ix}", [0, 1, 2])
+            state = AggregationState(tmp_path / f"state-{count}.json")
+            start = time.perf_counter()
+            answers = list(aggregate(
+                [_endpoint(server) for server in servers],
+                state,
+                testing=True,
+                end=END_TIME,
+            ))
+            assert len(answers) == 3 * count
+            return time.perf_counter() - start
+
+    assert elapsed(4) < 2 * elapsed(1)
@@ -0,0 +1,102 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for typed answers, and how events store them."""
+
+
+import json
+
+import pytest
+
+from aw_watcher_ask.answers import (
+    describe, is_description, parse_answer, parse_fields, split_answer
+)
+from aw_watcher_ask.dialogs import DialogResult, prepare_dialog
+from aw_watcher_ask.models import DialogType
+
+
+@pytest.mark.parametrize("question_type,options,content,expected", [
+    (DialogType.scale, {}, "7", 7),
+    (DialogType.calendar, {}, "2022-01-31", "2022-01-31"),
+    (
+        DialogType.calendar,
+        {"date_format": "%d/%m/%Y"},
+        "31/01/2022",
+        "2022-01-31",
+    ),
+    (DialogType.color_selection, {}, "rgb(255,128,0)", [255, 128, 0]),
+    (DialogType.color_selection, {}, "rgba(0,0,255,0.5)", [0, 0, 255]),
+    (DialogType.color_selection, {}, "#ffff80800000", [255, 128, 0]),
+    (DialogType.entry, {}, "Fine, thanks", "Fine, thanks"),
+    (DialogType.info, {}, "", None),
+])
+def test_parse_answer(question_type, options, content, expected):
+    """Tests parsing answers into values of the type suited to the dialog."""
+    dialog = prepare_dialog(question_type, "Test question", **options)
+    answer = parse_answer(dialog, DialogResult(True, content + "\n", 0))
+    assert answer == expected
+    assert type(answer) is type(expected)
+
+
+def test_parse_answer_question():
+    """Tests parsing answers to yes-or-no questions."""
+    dialog = prepare_dialog(DialogType.question, "Are you happy?")
+    assert parse_answer(dialog, DialogResult(True, "", 0)) is True
+    assert parse_answer(dialog, DialogResult(False, "", 1)) is False
+    assert parse_answer(dialog, DialogResult(False, "", 5)) is None
+
+
+def test_parse_answer_invalid():
+    """Tests keeping answers that can not be parsed as they are given."""
+    dialog = prepare_dialog(DialogType.scale, "Happiness")
+    assert parse_answer(dialog, DialogResult(True, "lots", 0)) == "lots"
+    assert parse_answer(dialog, DialogResult(False, "", 5)) is None
+
+
+def test_parse_fields():
+    """Tests parsing answers to dialogs with multiple fields."""
+    forms = prepare_dialog(
+        DialogType.forms, "Check-in", add_entry=["Name", "Age"]
+    )
+    assert parse_fields(forms, True, ["Ana", "33"]) == {
+        "Name": "Ana", "Age": "33"
+    }
+    assert parse_fields(forms, False, []) is None
+    items = prepare_dialog(DialogType.list, "Activities", column="Activity")
+    assert parse_fields(items, True, ["Reading"]) == ["Reading"]
+
+
+def test_describe():
+    """Tests describing questions, as stored in events of their own."""
+    dialog = prepare_dialog(
+        DialogType.scale, "Happiness", min_value=0, max_value=10, timeout=30
+    )
+    description = describe(dialog)
+    assert description == {
+        "title": "Happiness",
+        "type": "scale",
+        "options": {"min-value": 0, "max-value": 10},
+    }
+    assert description == json.loads(json.dumps(description))
+    assert is_description(
+        {"question_id": "happiness", "description": description}
+    )
+    # answers to a question titled "description" are still answers
+    assert not is_description(
+        {"success": True, "description": "7", "question_id": "happiness"}
+    )
+
+
+def test_split_answer():
+    """Tests reading answers stored with compact keys, or their titles."""
+    assert split_answer(
+        {"success": True, "value": 7, "question_id": "happiness"}
+    ) == (None, 7)
+    assert split_answer(
+        {"success": True, "Happiness": "7", "question_id": "happiness"}
+    ) == ("Happiness", "7")
+    assert split_answer({"success": False, "question_id": "q"}) == (
+        None, None
+    )
@@ -6,13 +6,20 @@
 """Tests running aw-watcher-input from the command-line interface."""
 
 
+import csv
+import json
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 import pytest
+from aw_core.models import Event
 from typer.testing import CliRunner
 
+from aw_watcher_ask import core
 from aw_watcher_ask.cli import app
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.registry import QuestionRegistry, default_registry_path
+from aw_watcher_ask.store import AnswerStore, default_store_path
 
 
 @pytest.fixture(scope="function")
@@ -56,3 +63,273 @@ def test_app(runner, question_id, question_type, schedule):
     assert "INFO - New prompt fired" in result.output
     assert "INFO - Prompt timed out" in result.output
     assert "INFO - Event stored in bucket" in result.output
+
+
+def test_query(runner, tmp_path, monkeypatch):
+    """Tests summarizing the answers gathered from the command line."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    store = AnswerStore(default_store_path(testing=True))
+    for value in ("3", "5"):
+        store.add("happiness.level", Event(
+            timestamp=datetime.now(timezone.utc),
+            data={"success": True, "happiness.level": value},
+        ))
+    store.close()
+
+    result = runner.invoke(app, ["query", "--testing"])
+    assert result.exit_code == 0
+    assert re.search(r"happiness\.level\s+2\s+2\s+100\.0%\s+4\.00", (
+        result.stdout
+    ))
+
+    result = runner.invoke(app, ["query", "--testing", "--answers"])
+    assert result.exit_code == 0
+    assert len(result.stdout.splitlines()) == 3
+
+
+def test_register(runner, tmp_path, monkeypatch):
+    """Tests registering and unregistering questions."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    result = runner.invoke(app, [
+        "register",
+        "--testing",
+        "--question-type",
+        "entry",
+        "--question-id",
+        "Forbiddên_ID",
+        "--schedule",
+        "0 9 * * *",
+        "--text=What are you doing?",
+    ])
+    assert result.exit_code == 0
+    assert "Registered question `forbidden.id`" in result.stdout
+
+    registry = QuestionRegistry(default_registry_path(testing=True))
+    ((question, next_execution),) = registry.load()
+    registry.close()
+    assert question.options == {"text": "What are you doing?"}
+    assert next_execution.hour == 9
+
+    result = runner.invoke(app, ["unregister", "--testing", "forbidden.id"])
+    assert result.exit_code == 0
+    result = runner.invoke(app, ["unregister", "--testing", "forbidden.id"])
+    assert result.exit_code == 1
+
+
+def test_register_options(runner, tmp_path, monkeypatch):
+    """Tests parsing extra dialog options in all of their forms."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    result = runner.invoke(app, [
+        "register",
+        "--testing",
+        "--question-type",
+        "forms",
+        "--question-id",
+        "daily.checkin",
+        "--text",
+        "How was your day?",
+        "--add-entry",
+        "Mood",
+        "Energy",
+        "--add-entry=Notes",
+        "--show-header",
+        "--width=400",
+    ])
+    assert result.exit_code == 0
+
+    registry = QuestionRegistry(default_registry_path(testing=True))
+    ((question, _),) = registry.load()
+    registry.close()
+    assert question.options == {
+        "text": "How was your day?",
+        "add-entry": ["Mood", "Energy", "Notes"],
+        "show-header": True,
+        "width": 400,
+    }
+
+    # options not accepted by the dialog type are refused right away
+    result = runner.invoke(app, [
+        "register",
+        "--testing",
+        "--question-type",
+        "entry",
+        "--question-id",
+        "daily.checkin",
+        "--add-entry",
+        "Mood",
+    ])
+    assert result.exit_code != 0
+    assert "add-entry" in result.output
+
+
+def test_simulate(runner, tmp_path):
+    """Tests listing the prompts of a configuration file in simulated time."""
+    config_path = tmp_path / "questions.json"
+    config_path.write_text(json.dumps({"questions": [
+        {"question_id": "test.daily", "schedule": "0 9 * * *"},
+        {"question_id": "test.hourly", "schedule": "R * * * *"},
+    ]}))
+    output_path = tmp_path / "fire_times.csv"
+    result = runner.invoke(app, [
+        "simulate",
+        "--config",
+        str(config_path),
+        "--start",
+        "2022-01-01T00:00:00",
+        "--days",
+        "7",
+        "--output",
+        str(output_path),
+    ])
+    assert result.exit_code == 0, result.output
+    lines = output_path.read_text().splitlines()
+    assert lines[0] == "question_id,timestamp"
+    daily = [line for line in lines if line.startswith("test.daily,")]
+    assert len(daily) == 7
+    assert daily[0].startswith("test.daily,2022-01-01T09:00:00")
+    # the first random minute might fall at the very start of the simulation
+    assert 7 * 24 - 1 <= len(lines) - 1 - len(daily) <= 7 * 24
+
+
+def test_compact(runner, stub_server, monkeypatch, tmp_path):
+    """Tests merging repeated answers stored in the server."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    client = SessionClient(
+        "test-aw-watcher-ask", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    monkeypatch.setattr(core, "_client_setup", lambda testing: client)
+    bucket_id = core._bucket_setup(client, "happiness.level")
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    client.insert_events(bucket_id, [
+        Event(
+            timestamp=start + timedelta(hours=hours),
+            data={
+                "success": True,
+                "happiness.level": "yes",
+                "question_id": "happiness.level",
+            },
+        )
+        for hours in [0, 1, 2, 72]
+    ])
+
+    # answers days apart are not merged, unless asked to
+    result = runner.invoke(app, ["compact", "--testing", "--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert "Would merge 2 of 4 events" in result.stdout
+    result = runner.invoke(
+        app, ["compact", "--testing", "--dry-run", "--unbounded"]
+    )
+    assert "Would merge 3 of 4 events" in result.stdout
+    result = runner.invoke(
+        app, ["compact", "--testing", "--unbounded", "--within", "60"]
+    )
+    assert result.exit_code == 2
+
+    # answers to a weekly question are merged a week apart
+    config_path = tmp_path / "questions.json"
+    config_path.write_text(json.dumps({"questions": [
+        {"question_id": "happiness.level", "schedule": "0 9 * * 1"},
+    ]}))
+    result = runner.invoke(app, [
+        "compact", "--testing", "--dry-run", "--config", str(config_path)
+    ])
+    assert "Would merge 3 of 4 events" in result.stdout
+
+    result = runner.invoke(app, ["compact", "--testing"])
+    assert result.exit_code == 0
+    assert len(stub_server.events[bucket_id]) == 2
+    client.session.close()
+
+
+def test_export(runner, stub_server, monkeypatch, tmp_path):
+    """Tests exporting the answers of some questions to a file."""
+    client = SessionClient(
+        "test-aw-watcher-ask", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    monkeypatch.setattr(core, "_client_setup", lambda testing: client)
+    bucket_id = core._bucket_setup(client, "happiness.level")
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    client.insert_events(bucket_id, [
+        Event(
+            timestamp=start + timedelta(hours=hours),
+            data={
+                "success": True,
+                question_id: "yes",
+                "question_id": question_id,
+            },
+        )
+        for hours in range(3)
+        for question_id in ("happiness.level", "focus")
+    ])
+
+    output = tmp_path / "answers.csv"
+    result = runner.invoke(app, [
+        "export",
+        "--testing",
+        "--format=csv",
+        "--question-id=focus",
+        "--start=2021-12-31",
+        f"--output={output}",
+    ])
+    assert result.exit_code == 0, result.output
+    assert "Exported 3 events" in result.output
+    lines = output.read_text().splitlines()
+    assert lines[0].startswith("id,timestamp,duration,question_id")
+    assert len(lines) == 4
+
+    result = runner.invoke(app, ["export", "--testing", "--format=parquet"])
+    assert result.exit_code != 0
+    client.session.close()
+
+
+def test_aggregate(runner, stub_server, tmp_path):
+    """Tests merging the answers of many hosts, run after run."""
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+    def add_answers(hostname, hours):
+        bucket_id = f"test-aw-watcher-ask_{hostname}"
+        stub_server.buckets[bucket_id] = {"hostname": hostname}
+        stub_server.events.setdefault(bucket_id, []).extend(
+            {
+                "id": next(stub_server.event_ids),
+                "timestamp": (start + timedelta(hours=hour)).isoformat(),
+                "duration": 0.0,
+                "data": {
+                    "success": True, "focus": "7", "question_id": "focus"
+                },
+            }
+            for hour in hours
+        )
+
+    add_answers("laptop", [0, 2])
+    add_answers("desktop", [1])
+    output = tmp_path / "answers.csv"
+    arguments = [
+        "aggregate", "--testing", "--format=csv", f"--output={output}",
+        f"127.0.0.1:{stub_server.port}",
+    ]
+    result = runner.invoke(app, arguments)
+    assert result.exit_code == 0, result.output
+    assert "Aggregated 3 new events from 1 servers" in result.output
+    assert (tmp_path / "answers.csv.state.json").exists()
+
+    add_answers("desktop", [3])
+    result = runner.invoke(app, arguments)
+    assert result.exit_code == 0, result.output
+    assert "Aggregated 1 new events" in result.output
+    rows = list(csv.DictReader(output.read_text().splitlines()))
+    assert [row["hostname"] for row in rows] == [
+        "laptop", "desktop", "laptop", "desktop"
+    ]
+
+
+def test_daemon_malformed_config(runner, tmp_path):
+    """Tests reporting malformed configuration files, with no traceback."""
+    config_path = tmp_path / "questions.json"
+    config_path.write_text(json.dumps({"questions": [{"timeout": 60}]}))
+    result = runner.invoke(app, ["daemon", str(config_path)])
+    assert result.exit_code == 2
+    assert "missing `question_id`" in result.output
+    assert not isinstance(result.exception, (KeyError, TypeError))
@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the ActivityWatch client reusing connections to the server."""
+
+
+from datetime import datetime, timezone
+
+from aw_core.models import Event
+
+from aw_watcher_ask.client import SessionClient, get_client
+
+
+def test_session_client_keeps_connection(stub_server):
+    """Tests sending many requests through a single connection."""
+    client = SessionClient(
+        "test-session-client", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    with client:
+        client.create_bucket("test.bucket", event_type="test.question")
+        for ix in range(10):
+            client.insert_event("test.bucket", Event(
+                timestamp=datetime.now(timezone.utc), data={"ix": ix}
+            ))
+        events = client.get_events("test.bucket")
+        assert len(events) == 10
+        assert "test.bucket" in client.get_buckets()
+    assert len(stub_server.requests) == 13
+    assert len(stub_server.connections) == 1
+
+
+def test_bucket_manager(stub_server):
+    """Tests creating buckets only if they do not exist in the server."""
+    stub_server.buckets["existing.bucket"] = {"type": "test.question"}
+    client = SessionClient(
+        "test-bucket-manager", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    with client:
+        assert not client.buckets.ensure("existing.bucket", "test.question")
+        assert client.buckets.ensure("new.bucket", "test.question")
+        for _ in range(10):
+            assert not client.buckets.ensure("new.bucket", "test.question")
+    # a single listing of buckets, and a single creation
+    assert stub_server.requests == [
+        ("GET", "/api/0/buckets/"),
+        ("POST", "/api/0/buckets/new.bucket"),
+    ]
+    assert "new.bucket" in stub_server.buckets
+
+
+def test_get_client(stub_server):
+    """Tests sharing a single client per name and server."""
+    client = get_client(
+        "test-shared-client", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    assert client is get_client(
+        "test-shared-client", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    assert client is not get_client(
+        "test-other-client", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
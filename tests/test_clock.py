@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the sources of time of the watcher."""
+
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from aw_watcher_ask.clock import SYSTEM_CLOCK, AcceleratedClock, VirtualClock
+
+
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def test_system_clock():
+    """Tests that the system clock reads timezone-aware dates."""
+    assert SYSTEM_CLOCK.now().tzinfo is not None
+    assert not SYSTEM_CLOCK.steady
+
+
+def test_virtual_clock():
+    """Tests that sleeping in a virtual clock takes no real time."""
+    clock = VirtualClock(START_TIME)
+    started = time.monotonic()
+    clock.sleep(365 * 24 * 3600)
+    clock.sleep(-10)  # time does not go back
+    assert time.monotonic() - started < 1
+    assert clock.monotonic() == 365 * 24 * 3600
+    assert clock.now() == START_TIME + timedelta(days=365)
+
+
+def test_accelerated_clock():
+    """Tests that time runs faster in an accelerated clock."""
+    clock = AcceleratedClock(speedup=1000, start=START_TIME)
+    started = time.monotonic()
+    clock.sleep(100)
+    assert 0.1 <= time.monotonic() - started < 1
+    assert clock.now() >= START_TIME + timedelta(seconds=100)
+
+
+def test_clock_wait():
+    """Tests waiting for events through each clock."""
+    event = threading.Event()
+    clock = VirtualClock(START_TIME)
+    assert not clock.wait(event, 3600)
+    assert clock.monotonic() == 3600
+    event.set()
+    assert clock.wait(event, 3600)
+    assert clock.monotonic() == 3600
+
+    started = time.monotonic()
+    assert AcceleratedClock(speedup=1000).wait(event, 3600)
+    assert not SYSTEM_CLOCK.wait(threading.Event(), 0.1)
+    assert time.monotonic() - started < 1
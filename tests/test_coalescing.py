@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for presenting questions due together in a single dialog."""
+
+
+import pytest
+
+from aw_watcher_ask.coalescing import coalesce, coalescible, split_answers
+from aw_watcher_ask.dialogs import prepare_dialog
+from aw_watcher_ask.models import DialogType
+
+
+@pytest.fixture(scope="module")
+def questions():
+    """Provides dialogs of every type that can be presented as a field."""
+    return [
+        ("happy", prepare_dialog(
+            DialogType.question, "Happy?", text="Are you happy?", timeout=60
+        )),
+        ("focus", prepare_dialog(
+            DialogType.scale, "Focus", min_value=1, max_value=5, timeout=30
+        )),
+        ("mood", prepare_dialog(DialogType.entry, "Mood", timeout=120)),
+        ("slept", prepare_dialog(DialogType.calendar, "Last slept well")),
+        ("energy", prepare_dialog(DialogType.scale, "Energy")),
+    ]
+
+
+def test_coalescible():
+    """Tests telling which dialogs can be presented as fields."""
+    assert coalescible(prepare_dialog(DialogType.entry, "Mood"))
+    assert not coalescible(prepare_dialog(DialogType.list, "Activities"))
+    assert not coalescible(
+        prepare_dialog(DialogType.password, "Login", "username")
+    )
+
+
+def test_coalesce(questions):
+    """Tests combining many dialogs into a single forms dialog."""
+    coalesced = coalesce(questions)
+    dialog = coalesced.dialog
+    assert dialog.question_type == DialogType.forms
+    # fields are ordered as Zenity outputs them
+    assert coalesced.question_ids == [
+        "mood", "energy", "slept", "happy", "focus"
+    ]
+    assert dialog.labels == [
+        "Mood", "Energy", "Last slept well", "Are you happy?", "Focus"
+    ]
+    assert dialog.options["combo-values"] == ["Yes|No", "1|2|3|4|5"]
+    # the calendar dialog does not time out, and neither does the form
+    assert "timeout" not in dialog.options
+    assert coalesce(questions[:3]).dialog.options["timeout"] == 120
+
+    with pytest.raises(ValueError):
+        coalesce([("files", prepare_dialog(DialogType.list, "Files"))])
+
+
+def test_split_answers(questions):
+    """Tests splitting the answer to a form into one answer per question."""
+    coalesced = coalesce(questions)
+    answers = split_answers(
+        coalesced, True, ["Fine", "", "2022-01-31", "No", "4\n"]
+    )
+    assert answers == {
+        "mood": (True, "Fine"),
+        "energy": (False, None),
+        "slept": (True, "2022-01-31"),
+        "happy": (True, False),
+        "focus": (True, 4),
+    }
+    assert set(split_answers(coalesced, False, []).values()) == {
+        (False, None)
+    }
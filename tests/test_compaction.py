@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for compacting answers already stored in ActivityWatch."""
+
+
+from datetime import timedelta
+
+from aw_core.models import Event
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.compaction import (
+    compact_bucket, compact_events, iter_merges, question_window
+)
+from aw_watcher_ask.models import Question
+from tests.stubs import START_TIME, answer_event
+
+
+def _history():
+    return [
+        answer_event(0, "happiness", "yes"),
+        answer_event(0.5, "focus", "7"),
+        answer_event(1, "happiness", "yes"),
+        answer_event(1.5, "focus", "7"),
+        answer_event(2, "happiness", "no"),
+        answer_event(3, "happiness", "no"),
+        answer_event(10, "happiness", "no"),
+    ]
+
+
+def test_compact_events():
+    """Tests merging consecutive identical answers to each question."""
+    events = _history()
+    updated, removed = compact_events(reversed(events))
+    assert [event.data for event in updated] == [
+        events[0].data, events[1].data, events[4].data
+    ]
+    assert updated[0].duration == timedelta(hours=1)
+    assert updated[1].duration == timedelta(hours=1)
+    # answers hours apart are not merged by default
+    assert updated[2].duration == timedelta(hours=1)
+    assert len(removed) == 3
+
+
+def test_compact_events_within():
+    """Tests merging identical answers within a given time of each other."""
+    updated, removed = compact_events(_history(), within=None)
+    assert updated[-1].duration == timedelta(hours=8)
+    assert len(removed) == 4
+
+    updated, removed = compact_events(
+        _history(), within=0, windows={"happiness": 8 * 3600}
+    )
+    assert [event.data["question_id"] for event in updated] == [
+        "happiness", "happiness"
+    ]
+    assert len(removed) == 3
+
+
+def test_iter_merges_chunks():
+    """Tests yielding long runs of merged answers in chunks."""
+    events = [answer_event(hours, "happiness", "yes") for hours in range(10)]
+    merges = list(iter_merges(events, chunk_size=4))
+    assert [len(run) for _, run in merges] == [4, 4, 1]
+    assert all(kept is events[0] for kept, _ in merges)
+    assert events[0].duration == timedelta(hours=9)
+
+    # questions are described in events of their own, which are kept apart
+    description = Event(
+        timestamp=START_TIME,
+        data={"question_id": "happiness", "description": {"title": "Yes?"}},
+    )
+    assert list(iter_merges([description, description])) == []
+
+    # unanswered prompts hold no answer to be repeated
+    unanswered = answer_event(0, "happiness", None, success=False)
+    assert list(iter_merges([unanswered, unanswered])) == []
+
+    # answers stored by earlier versions, under the dialog's title
+    legacy = [
+        answer_event(hours, "happiness", "yes", title="Happy?")
+        for hours in range(2)
+    ]
+    assert [len(run) for _, run in iter_merges(legacy)] == [1]
+
+
+def test_question_window():
+    """Tests telling how far apart answers to a question are merged."""
+    question = Question("happiness", schedule="0 9 * * 1-5", timeout=60)
+    # over the weekend
+    assert question_window(question) == 3 * 86400 + 60
+    question.compact_within = 600
+    assert question_window(question) == 600
+
+
+def test_compact_bucket(stub_server):
+    """Tests rewriting the history of a bucket in the server."""
+    client = SessionClient(
+        "test-compaction", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    client.create_bucket("test.bucket", event_type="test.question")
+    client.insert_events("test.bucket", _history())
+
+    result = compact_bucket(client, "test.bucket", None, dry_run=True)
+    assert result == (7, 3, 4)
+    assert len(stub_server.events["test.bucket"]) == 7
+
+    # the bucket is read page by page
+    result = compact_bucket(client, "test.bucket", None, page_size=2)
+    assert result == (7, 3, 4)
+    stored = client.get_events("test.bucket")
+    assert len(stored) == 3
+    assert max(event.duration for event in stored) == timedelta(hours=8)
+
+    # compacting again changes nothing
+    result = compact_bucket(client, "test.bucket", None)
+    assert result == (3, 0, 0)
+    client.session.close()
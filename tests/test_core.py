@@ -7,16 +7,35 @@
 
 
 from datetime import datetime, timedelta, timezone
+from functools import partial
 from random import randint
 from typing import Optional
+from unittest.mock import MagicMock
 
 import pytest
 from aw_client import ActivityWatchClient
+from loguru import logger
 
+from aw_watcher_ask.answers import describe, split_answer
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.coalescing import coalesce
 from aw_watcher_ask.core import (
-    _ask_many, _ask_one, _client_setup, _bucket_setup, main
+    _ask_coalesced,
+    _ask_many,
+    _ask_one,
+    _ask_when_present,
+    _client_setup,
+    _bucket_setup,
+    _describe_question,
+    main,
 )
+from aw_watcher_ask.clock import VirtualClock
+from aw_watcher_ask.dialogs import DialogResult, prepare_dialog
+from aw_watcher_ask.journal import AnswerJournal, JournalFlusher
 from aw_watcher_ask.models import DialogType
+from aw_watcher_ask.presence import OwedPrompts
+from aw_watcher_ask.prompts import PromptPool
+from aw_watcher_ask.store import AnswerStore
 
 
 def test_client_setup():
@@ -50,17 +69,91 @@ def test_bucket_setup():
 
 def test_ask_question():
     """Tests asking a question with a single answer field to the user."""
-    answer = _ask_one(DialogType("question"), "Test question", timeout=2)
-    assert "success" in answer
-    assert not answer["success"]
-    assert "Test question" in answer
-    assert len(answer["Test question"]) == 0
+    answer = _ask_one(
+        prepare_dialog(DialogType("question"), "Test question", timeout=2)
+    )
+    assert answer == {"success": False, "value": None}
 
 
 def test_ask_many():
     """Tests asking a question with multiple answer fields to the user."""
-    with pytest.raises(NotImplementedError):
-        _ask_many(DialogType("forms"), timeout=5)
+    backend = MagicMock()
+    dialog = prepare_dialog(
+        DialogType("forms"),
+        "Test question",
+        add_entry=["Name", "Age"],
+        timeout=5,
+    )
+    backend.show_fields_prepared.return_value = (True, ["Bernardo", "33"], 0)
+    answer = _ask_many(dialog, backend=backend)
+    assert answer == {
+        "success": True,
+        "value": {"Name": "Bernardo", "Age": "33"},
+    }
+    backend.show_fields_prepared.assert_called_once_with(dialog)
+
+
+def test_ask_many_list():
+    """Tests asking the user to select items from a list."""
+    backend = MagicMock()
+    backend.show_fields_prepared.return_value = (
+        True, ["Reading", "Coding"], 0
+    )
+    answer = _ask_many(
+        prepare_dialog(DialogType("list"), "Activities"), backend=backend
+    )
+    assert answer == {"success": True, "value": ["Reading", "Coding"]}
+
+
+def test_ask_one_typed():
+    """Tests storing answers as values of the type suited to the dialog."""
+    backend = MagicMock()
+    backend.show_prepared.return_value = DialogResult(True, "7\n", 0)
+    dialog = prepare_dialog(DialogType.scale, "Happiness")
+    assert _ask_one(dialog, backend=backend) == {"success": True, "value": 7}
+
+
+def test_describe_question(stub_server):
+    """Tests describing questions in their bucket, whenever they change."""
+    client = SessionClient(
+        "test-aw-watcher-ask", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    clock = VirtualClock(datetime(2021, 1, 1, tzinfo=timezone.utc))
+    journal = AnswerJournal(":memory:")
+    flusher = JournalFlusher(journal, client)
+    store = AnswerStore(":memory:")
+    describe_question = partial(
+        _describe_question, logger, journal, flusher, store, clock=clock
+    )
+    dialog = prepare_dialog(DialogType.scale, "How happy are you?")
+    bucket_id = _bucket_setup(client, "happiness")
+    assert describe_question(bucket_id, "happiness", dialog)
+    assert not describe_question(bucket_id, "happiness", dialog)
+    flusher.flush()
+
+    # a question added to the existing bucket is described too
+    clock.advance(3600)
+    other = prepare_dialog(DialogType.entry, "How are you?")
+    assert _bucket_setup(client, "mood") == bucket_id
+    assert describe_question(bucket_id, "mood", other)
+    # and so is a question changed since it was described
+    changed = prepare_dialog(DialogType.scale, "How happy are you today?")
+    assert describe_question(bucket_id, "happiness", changed)
+    flusher.flush()
+
+    events = sorted(
+        client.get_events(bucket_id), key=lambda event: event.timestamp
+    )
+    assert [event.data for event in events] == [
+        {"question_id": "happiness", "description": describe(dialog)},
+        {"question_id": "mood", "description": describe(other)},
+        {"question_id": "happiness", "description": describe(changed)},
+    ]
+    assert events[1].timestamp == clock.now()
+    journal.close()
+    store.close()
+    client.session.close()
 
 
 @pytest.mark.parametrize("question_type", ["question"])
@@ -87,11 +180,95 @@ def test_main_one(question_type: str, title: Optional[str]):
             assert last_event.timestamp < end_time + timedelta(seconds=2)
             assert "success" in last_event.data
             assert not last_event.data["success"]
-            if not title:
-                assert question_id in last_event.data
-                assert len(last_event.data[question_id]) == 0
-            else:
-                assert title in last_event.data
-                assert len(last_event.data[title]) == 0
+            assert last_event.data["question_id"] == question_id
+            assert split_answer(last_event.data)[1] is None
         finally:
             client.delete_bucket(bucket_id)
+
+
+def test_ask_refused():
+    """Tests storing a "No" as an answer, whether asked alone or not."""
+    backend = MagicMock()
+    backend.show_prepared.return_value = DialogResult(False, "", 1)
+    backend.show_fields_prepared.return_value = (True, ["No", ""], 0)
+    dialog = prepare_dialog(DialogType.question, "Happy?")
+    refused = {"success": True, "value": False}
+    assert _ask_one(dialog, backend=backend) == refused
+    answers = _ask_coalesced(
+        coalesce([
+            ("happy", dialog),
+            ("focused", prepare_dialog(DialogType.question, "Focused?")),
+        ]),
+        backend=backend,
+    )
+    assert answers == {
+        "happy": refused, "focused": {"success": False, "value": None}
+    }
+    # prompts timed out are not answered
+    backend.show_prepared.return_value = DialogResult(False, "", 5)
+    assert _ask_one(dialog, backend=backend) == {
+        "success": False, "value": None
+    }
+
+
+def test_ask_coalesced():
+    """Tests asking many questions at once, and splitting the answer."""
+    backend = MagicMock()
+    backend.show_fields_prepared.return_value = (True, ["Fine", "7"], 0)
+    coalesced = coalesce([
+        ("mood", prepare_dialog(DialogType.entry, "Mood")),
+        ("focus", prepare_dialog(DialogType.scale, "Focus")),
+    ])
+    answers = _ask_coalesced(coalesced, backend=backend)
+    assert answers == {
+        "mood": {"success": True, "value": "Fine"},
+        "focus": {"success": True, "value": 7},
+    }
+    backend.show_fields_prepared.assert_called_once_with(coalesced.dialog)
+
+
+def test_ask_when_present_owed():
+    """Tests keeping the prompts of periods the user was away for."""
+    start = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    clock = VirtualClock(start)
+    presence = MagicMock(clock=clock)
+    presence.is_active.return_value = False
+
+    def away_until(deadline):
+        clock.advance((deadline - clock.now()).total_seconds())
+        return False
+
+    presence.wait_until_active.side_effect = away_until
+    answers = []
+    pool = PromptPool(max_workers=2)
+    owed = OwedPrompts(limit=2)
+    periods = iter(range(10))
+
+    def ask():
+        return {"success": True, "value": next(periods)}
+
+    def prompt(deadline):
+        return _ask_when_present(
+            MagicMock(),
+            presence,
+            deadline,
+            "test.question",
+            ask,
+            owed,
+            lambda: pool.submit(
+                "test.question", ask, callback=answers.append
+            ),
+        )
+
+    # the user is away across three whole periods
+    for hour in range(1, 4):
+        assert prompt(start + timedelta(hours=hour)) is None
+    # prompts beyond the limit are skipped
+    assert len(owed) == 2
+
+    # the next prompt finds the user back, and presents the owed ones too
+    presence.is_active.return_value = True
+    answers.append(prompt(start + timedelta(hours=4)))
+    pool.shutdown()
+    assert len(answers) == 3
+    assert len(owed) == 0
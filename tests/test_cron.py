@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the precompiled cron-tab schedules."""
+
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from croniter import croniter
+
+from aw_watcher_ask.cron import (
+    CronExpression, CronSchedule, longest_interval, make_schedule
+)
+
+
+START_TIME = datetime(2021, 3, 14, 1, 59, 59, 500000, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "* * * * *",
+        "*/15 * * * *",
+        "0 9 * * mon-fri",
+        "30 2 1,15 * *",
+        "0 0 29 2 *",
+        "0 12 13 * 5",
+        "5-10/2 */3 * jan,jul *",
+        "* * * * * */4",
+        "0 0 * * 5-7",
+        "59 23 31 12 *",
+    ],
+)
+def test_schedule_matches_croniter(expression: str):
+    """Tests computing the same executions as croniter."""
+    schedule = CronSchedule(expression, start_time=START_TIME)
+    reference = croniter(expression, start_time=START_TIME)
+    for _ in range(200):
+        assert schedule.get_next() == reference.get_next(datetime)
+
+
+def test_random_minute():
+    """Tests drawing a random minute for each hour."""
+    schedule = CronSchedule("R * * * *", start_time=START_TIME, seed=42)
+    executions = [schedule.get_next() for _ in range(48)]
+    hours = [
+        (execution.date(), execution.hour) for execution in executions
+    ]
+    assert len(set(hours)) == 48
+    assert all(execution.second == 0 for execution in executions)
+    assert len({execution.minute for execution in executions}) > 1
+
+
+def test_random_seed_reproducible():
+    """Tests that the same seed yields the same random executions."""
+    first = CronSchedule("R R * * * R", start_time=START_TIME, seed="a.id")
+    second = CronSchedule("R R * * * R", start_time=START_TIME, seed="a.id")
+    other = CronSchedule("R R * * * R", start_time=START_TIME, seed="b.id")
+    first_executions = [first.get_next() for _ in range(10)]
+    assert first_executions == [second.get_next() for _ in range(10)]
+    assert first_executions != [other.get_next() for _ in range(10)]
+    # one execution per day, at a random hour, minute and second
+    assert len({execution.date() for execution in first_executions}) == 10
+
+
+def test_set_current():
+    """Tests resetting the reference time of a schedule."""
+    schedule = CronSchedule("0 * * * *", start_time=START_TIME)
+    schedule.set_current(START_TIME + timedelta(days=1))
+    assert schedule.get_next() == datetime(
+        2021, 3, 15, 2, tzinfo=timezone.utc
+    )
+
+
+@pytest.mark.parametrize(
+    "expression", ["* *", "61 * * * *", "* * * * 8", "* * * R *"]
+)
+def test_invalid_expression(expression: str):
+    """Tests refusing expressions with unsupported syntax."""
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_never_matching_expression():
+    """Tests refusing to look forever for impossible dates."""
+    schedule = CronSchedule("0 0 30 2 *", start_time=START_TIME)
+    with pytest.raises(ValueError):
+        schedule.get_next()
+
+
+def test_make_schedule_fallback():
+    """Tests handing extended syntaxes to croniter."""
+    assert isinstance(make_schedule("R * * * *", START_TIME), CronSchedule)
+    schedule = make_schedule("0 0 L * *", START_TIME)
+    assert isinstance(schedule, croniter)
+    assert schedule.get_next(datetime).day == 31
+
+
+@pytest.mark.parametrize("expression,hours", [
+    ("0 * * * *", 1),
+    ("0 9 * * *", 24),
+    ("*/15 9-18 * * 1-5", 62.25),
+    ("0 0 1 1 *", 365 * 24),
+])
+def test_longest_interval(expression: str, hours: float):
+    """Tests finding the longest time between executions of a schedule."""
+    start_time = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    assert longest_interval(expression, start_time) == hours * 3600
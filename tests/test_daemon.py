@@ -0,0 +1,226 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for posing many questions from a single process."""
+
+
+import json
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from unittest.mock import MagicMock
+
+import pytest
+from croniter import croniter
+from loguru import logger
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.clock import VirtualClock
+from aw_watcher_ask.core import _describe_question
+from aw_watcher_ask.daemon import (
+    PosedQuestion,
+    _prepare_question,
+    _prompt_groups,
+    _reload,
+    load_questions,
+)
+from aw_watcher_ask.journal import AnswerJournal
+from aw_watcher_ask.models import DialogType, OverlapPolicy, Question
+from aw_watcher_ask.scheduling import Scheduler
+from aw_watcher_ask.store import AnswerStore
+
+
+def test_load_questions(tmp_path):
+    """Tests reading question definitions from a configuration file."""
+    config_path = tmp_path / "questions.json"
+    config_path.write_text(json.dumps({"questions": [
+        {
+            "question_id": "happiness.level",
+            "question_type": "scale",
+            "title": "My happiness level",
+            "schedule": "0 */1 * * *",
+            "until": "2030-12-31T00:00:00",
+            "options": {"min-value": 0, "max-value": 10},
+        },
+        {
+            "question_id": "working",
+            "text": "Are you working?",
+            "overlap": "drop",
+        },
+    ]}))
+    questions = load_questions(config_path)
+    assert len(questions) == 2
+    assert questions[0].question_type == DialogType.scale
+    assert questions[0].until == datetime(2030, 12, 31)
+    assert questions[0].options == {"min-value": 0, "max-value": 10}
+    assert questions[1].question_type == DialogType.question
+    assert questions[1].schedule == "R * * * *"
+    assert questions[1].options == {"text": "Are you working?"}
+    assert questions[1].overlap == OverlapPolicy.drop
+    assert questions[1].max_concurrent == 1
+
+
+def test_load_duplicated_questions(tmp_path):
+    """Tests refusing configuration files with repeated question ids."""
+    config_path = tmp_path / "questions.json"
+    config_path.write_text(json.dumps({"questions": [
+        {"question_id": "working"},
+        {"question_id": "working", "question_type": "entry"},
+    ]}))
+    with pytest.raises(ValueError):
+        load_questions(config_path)
+
+    # ids are compared as they are posed, once fixed
+    config_path.write_text(json.dumps({"questions": [
+        {"question_id": "Working"},
+        {"question_id": "working"},
+    ]}))
+    with pytest.raises(ValueError, match="`working` .given as `Working`"):
+        load_questions(config_path)
+
+
+@pytest.mark.parametrize("questions,message", [
+    ([{"title": "Are you working?"}], "#1: missing `question_id`"),
+    ([{"question_id": "working", "timeout": "60"}], "`working`.*integer"),
+    ([{"question_id": "working", "until": 2030}], "`until` must be"),
+    ([{"question_id": "working", "question_type": "yes-no"}], "yes-no"),
+    (["working"], "#1: not an object"),
+    ({"question": []}, "`questions` list"),
+])
+def test_load_questions_malformed(tmp_path, questions, message):
+    """Tests reporting malformed question definitions, naming them."""
+    config_path = tmp_path / "questions.json"
+    config = {"questions": questions} if isinstance(questions, list) else (
+        questions
+    )
+    config_path.write_text(json.dumps(config))
+    with pytest.raises(ValueError, match=message):
+        load_questions(config_path)
+
+
+def test_load_questions_invalid_options(tmp_path):
+    """Tests refusing questions with options their dialogs do not accept."""
+    config_path = tmp_path / "questions.json"
+    config_path.write_text(json.dumps({"questions": [
+        {"question_id": "working", "min-value": 0},
+    ]}))
+    with pytest.raises(ValueError, match="min-value"):
+        load_questions(config_path)
+
+
+def test_reload(stub_server, tmp_path):
+    """Tests applying the changes to a configuration file, as they come."""
+    config_path = tmp_path / "questions.json"
+
+    def write(questions):
+        config_path.write_text(json.dumps({"questions": questions}))
+
+    hourly = {"schedule": "0 * * * *"}
+    write([
+        dict(hourly, question_id=question_id)
+        for question_id in ("kept", "retitled", "rescheduled", "removed")
+    ])
+    client = SessionClient(
+        "test-aw-watcher-ask", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    start = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    clock = VirtualClock(start)
+    scheduler = Scheduler(clock=clock)
+    posed = dict()
+    journal = AnswerJournal(":memory:")
+    store = AnswerStore(":memory:")
+    describe_question = partial(
+        _describe_question, logger, journal, MagicMock(), store, clock=clock
+    )
+
+    def described():
+        entries = journal.entries()
+        journal.ack(entry.entry_id for entry in entries)
+        return [entry.event.data for entry in entries]
+
+    _reload(logger, client, scheduler, posed, config_path, describe_question)
+    assert len(scheduler) == 4
+    assert len(described()) == 4
+
+    clock.advance(30 * 60)
+    kept = posed["kept"]
+    next_executions = {
+        question_id: scheduler.next_execution(question_id)
+        for question_id in posed
+    }
+    requests = len(stub_server.requests)
+    write([
+        dict(hourly, question_id="kept"),
+        dict(hourly, question_id="retitled", title="How are you?"),
+        {"question_id": "rescheduled", "schedule": "*/20 * * * *"},
+        dict(hourly, question_id="added"),
+    ])
+    _reload(logger, client, scheduler, posed, config_path, describe_question)
+
+    # unchanged questions are left as they are
+    assert posed["kept"] is kept
+    for question_id in ("kept", "retitled"):
+        assert scheduler.next_execution(question_id) == (
+            next_executions[question_id]
+        )
+    assert posed["retitled"].dialog.title == "How are you?"
+    assert scheduler.next_execution("rescheduled") == (
+        start + timedelta(minutes=40)
+    )
+    assert "removed" not in scheduler and "removed" not in posed
+    assert "added" in scheduler
+    # the bucket is known to exist already
+    assert len(stub_server.requests) == requests
+    # questions added or described differently are described in the bucket
+    assert {
+        data["question_id"]: data["description"]["title"]
+        for data in described()
+    } == {"retitled": "How are you?", "added": "added"}
+
+    # invalid configuration files are ignored
+    config_path.write_text("{")
+    _reload(logger, client, scheduler, posed, config_path)
+    assert set(posed) == {"kept", "retitled", "rescheduled", "added"}
+    write([dict(hourly, question_id="kept"), dict(hourly, timeout="60")])
+    _reload(logger, client, scheduler, posed, config_path)
+    assert set(posed) == {"kept", "retitled", "rescheduled", "added"}
+    assert not described()
+    journal.close()
+    store.close()
+    client.session.close()
+
+
+def test_prompt_groups():
+    """Tests firing questions due within a window together."""
+    start = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    clock = VirtualClock(start)
+    scheduler = Scheduler(clock=clock)
+    schedules = {
+        "happy": ("0 * * * *", DialogType.question),
+        "focus": ("1 * * * *", DialogType.scale),
+        "files": ("1 * * * *", DialogType.list),
+        "mood": ("30 * * * *", DialogType.entry),
+    }
+    posed = dict()
+    for question_id, (schedule, question_type) in schedules.items():
+        question = Question(question_id, question_type, schedule=schedule)
+        posed[question_id] = PosedQuestion(
+            question, _prepare_question(question), "bucket"
+        )
+        scheduler.add(
+            question_id,
+            croniter(schedule, start - timedelta(minutes=1)),
+            until=start + timedelta(hours=1, minutes=59),
+        )
+
+    groups = list(_prompt_groups(scheduler, posed, within=5 * 60))
+    # lists can not be presented as fields, and are fired on their own
+    assert groups == [
+        ["happy", "focus"], ["files"], ["mood"],
+        ["happy", "focus"], ["files"], ["mood"],
+    ]
+    scheduler = Scheduler(clock=VirtualClock(start))
+    scheduler.add("happy", croniter("0 * * * *", start), until=start)
+    assert list(_prompt_groups(scheduler, posed)) == []
@@ -0,0 +1,255 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the backends that present dialog boxes to the user."""
+
+
+import sys
+import threading
+from io import BufferedReader, BytesIO
+from unittest.mock import MagicMock
+
+import pytest
+
+from aw_watcher_ask.dialogs import (
+    CANCELLED,
+    Cancellation,
+    DialogResult,
+    ResidentBackend,
+    cancellable,
+    form_labels,
+    iter_fields,
+    prepare_dialog,
+    zenity_argv,
+)
+from aw_watcher_ask.models import DialogType
+
+
+# a helper process that answers "42" to entries, and refuses other types
+FAKE_HELPER = """
+import json, sys
+for line in sys.stdin:
+    request = json.loads(line)
+    if request["question_type"] != "entry":
+        print(json.dumps({"id": request["id"], "event": "result",
+                          "success": False, "content": "",
+                          "returncode": -2}), flush=True)
+        continue
+    print(json.dumps({"id": request["id"], "event": "visible"}), flush=True)
+    print(json.dumps({"id": request["id"], "event": "result",
+                      "success": True, "content": "42", "returncode": 0}),
+          flush=True)
+"""
+
+# a helper process that keeps all dialogs open until they are cancelled
+HANGING_HELPER = """
+import json, sys
+for line in sys.stdin:
+    request = json.loads(line)
+    if request.get("event") == "cancel":
+        print(json.dumps({"id": request["id"], "event": "result",
+                          "success": False, "content": "",
+                          "returncode": -15}), flush=True)
+    else:
+        print(json.dumps({"id": request["id"], "event": "visible"}),
+              flush=True)
+"""
+
+
+def test_zenity_argv():
+    """Tests building Zenity's command line from options."""
+    argv = zenity_argv(
+        DialogType.list,
+        "Test question",
+        "multiple",
+        timeout=60,
+        column=["Option", "Description"],
+        no_wrap=True,
+        editable=False,
+    )
+    assert argv == [
+        "zenity",
+        "--list",
+        "--title=Test question",
+        "--multiple",
+        "--timeout=60",
+        "--column=Option",
+        "--column=Description",
+        "--no-wrap",
+    ]
+
+
+def test_prepare_dialog():
+    """Tests validating a dialog's options, and building it once."""
+    dialog = prepare_dialog(
+        DialogType.forms,
+        "Daily check-in",
+        "show-header",
+        add_entry=["Mood", "Energy"],
+        timeout=60,
+    )
+    assert dialog.separator == "|"
+    assert dialog.labels == ["Mood", "Energy"]
+    assert dialog.argv == [
+        "zenity",
+        "--forms",
+        "--title=Daily check-in",
+        "--add-entry=Mood",
+        "--add-entry=Energy",
+        "--timeout=60",
+        "--show-header",
+        "--separator=|",
+    ]
+
+    assert prepare_dialog(DialogType.entry, "Name").separator is None
+    calendar = prepare_dialog(DialogType.calendar, "Day")
+    assert "--date-format=%Y-%m-%d" in calendar.argv
+    with pytest.raises(ValueError):
+        prepare_dialog(DialogType.entry, "Name", add_entry="Mood")
+
+
+def test_resident_backend_prepared():
+    """Tests handing prepared dialogs to the fallback backend as they are."""
+    fallback = MagicMock()
+    fallback.show_prepared.return_value = DialogResult(False, "", 5)
+    backend = ResidentBackend(
+        command=[sys.executable, "-c", FAKE_HELPER], fallback=fallback
+    )
+    dialog = prepare_dialog(DialogType.calendar, "Test question", timeout=2)
+    try:
+        assert backend.show_prepared(
+            prepare_dialog(DialogType.entry, "Test question", timeout=2)
+        ) == DialogResult(True, "42", 0)
+        assert backend.show_prepared(dialog) == DialogResult(False, "", 5)
+    finally:
+        backend.close()
+    fallback.show_prepared.assert_called_once_with(dialog)
+
+
+def test_resident_backend():
+    """Tests presenting many dialogs through a single helper process."""
+    backend = ResidentBackend(command=[sys.executable, "-c", FAKE_HELPER])
+    try:
+        for _ in range(3):
+            result = backend.show(DialogType.entry, "Test question", timeout=2)
+            assert result == DialogResult(True, "42", 0)
+        process = backend._process
+        assert process is not None and process.poll() is None
+        assert len(backend.latencies) == 3
+    finally:
+        backend.close()
+    assert process.poll() is not None
+
+
+def test_resident_backend_fallback():
+    """Tests handing unsupported dialog types to the fallback backend."""
+    fallback = MagicMock()
+    fallback.show.return_value = DialogResult(False, "", 5)
+    backend = ResidentBackend(
+        command=[sys.executable, "-c", FAKE_HELPER], fallback=fallback
+    )
+    try:
+        result = backend.show(DialogType.calendar, "Test question", timeout=2)
+    finally:
+        backend.close()
+    assert result == DialogResult(False, "", 5)
+    fallback.show.assert_called_once_with(
+        DialogType.calendar, "Test question", timeout=2
+    )
+
+
+def test_resident_backend_unavailable():
+    """Tests falling back when the helper process can not run."""
+    fallback = MagicMock()
+    fallback.show.return_value = DialogResult(True, "", 0)
+    backend = ResidentBackend(
+        command=[sys.executable, "-c", "pass"], fallback=fallback
+    )
+    assert backend.show(DialogType.question, "Test question").success
+    backend.close()
+
+
+def test_resident_backend_retry(tmp_path):
+    """Tests not starting a failed helper again until the retry delay."""
+    launches = tmp_path / "launches"
+    fallback = MagicMock()
+    fallback.show.return_value = DialogResult(True, "", 0)
+    command = [
+        sys.executable,
+        "-c",
+        f"open({str(launches)!r}, 'a').write('.')",
+    ]
+    backend = ResidentBackend(command=command, fallback=fallback)
+    for _ in range(3):
+        assert backend.show(DialogType.question, "Test question").success
+    assert launches.read_text() == "."
+    assert fallback.show.call_count == 3
+    backend.retry_after = 0.0
+    assert backend.show(DialogType.question, "Test question").success
+    assert launches.read_text() == ".."
+    backend.close()
+
+
+def test_cancellation():
+    """Tests closing dialogs registered before and after cancelling."""
+    closed = []
+    cancellation = Cancellation()
+    cancellation.register(lambda: closed.append("before"))
+    cancellation.cancel()
+    cancellation.register(lambda: closed.append("after"))
+    assert closed == ["before", "after"]
+
+
+def test_resident_backend_concurrent_cancel():
+    """Tests cancelling one of many dialogs open in the helper at once."""
+    backend = ResidentBackend(command=[sys.executable, "-c", HANGING_HELPER])
+    cancellations = [Cancellation() for _ in range(3)]
+    results = [None] * 3
+
+    def show(ix: int) -> None:
+        with cancellable(cancellations[ix]):
+            results[ix] = backend.show(DialogType.entry, f"Question {ix}")
+
+    threads = [
+        threading.Thread(target=show, args=(ix,)) for ix in range(3)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for ix in (1, 0, 2):
+            cancellations[ix].cancel()
+            threads[ix].join(5)
+            assert results[ix] == DialogResult(False, "", CANCELLED)
+        assert len(backend._pending) == 0
+    finally:
+        backend.close()
+
+
+@pytest.mark.parametrize(
+    "output,fields",
+    [
+        (b"", []),
+        (b"\n", [""]),
+        (b"Bernardo|33\n", ["Bernardo", "33"]),
+        (b"Bernardo||\n", ["Bernardo", "", ""]),
+        (
+            "São Paulo|Brasília\n".encode("utf-8"),
+            ["São Paulo", "Brasília"],
+        ),
+    ],
+)
+def test_iter_fields(output: bytes, fields: list):
+    """Tests splitting a dialog's output into fields, as it is read."""
+    stream = BufferedReader(BytesIO(output))  # type: ignore
+    assert list(iter_fields(stream, "|", chunk_size=3)) == fields
+
+
+def test_form_labels():
+    """Tests listing the labels of a forms dialog, in order."""
+    assert form_labels(
+        text="Daily check-in",
+        add_entry=["Mood", "Energy"],
+        **{"add-calendar": "Date"},
+    ) == ["Mood", "Energy", "Date"]
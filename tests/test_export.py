@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for exporting the answers stored in ActivityWatch."""
+
+
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from aw_core.models import Event
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.export import (
+    HostEvent,
+    filter_events,
+    iter_events,
+    to_row,
+    write_csv,
+    write_ndjson,
+    write_parquet,
+)
+from tests.stubs import START_TIME, answer_event
+
+
+BUCKET_ID = "test-aw-watcher-ask_test"
+
+
+@pytest.fixture(scope="function")
+def client(stub_server):
+    """Provides a client to a stub server with a bucket of answers."""
+    client = SessionClient(
+        "test-export", testing=True, host="127.0.0.1", port=stub_server.port
+    )
+    client.create_bucket(BUCKET_ID, event_type="happiness")
+    yield client
+    client.session.close()
+
+
+def test_iter_events(client, monkeypatch):
+    """Tests reading a bucket page by page, in chronological order."""
+    # a sparse day, a dense hour, and answers at the windows' boundaries
+    hours = [0, 1, 5, 12] + [24 + ix / 100 for ix in range(100)] + [48, 72]
+    client.insert_events(BUCKET_ID, [
+        answer_event(hour, "happiness", str(ix))
+        for ix, hour in enumerate(hours)
+    ])
+
+    pages = []
+    get_events = client.get_events
+
+    def spy(*args, **kwargs):
+        page = get_events(*args, **kwargs)
+        pages.append(len(page))
+        return page
+
+    monkeypatch.setattr(client, "get_events", spy)
+    events = list(iter_events(
+        client,
+        BUCKET_ID,
+        start=START_TIME,
+        end=START_TIME + timedelta(days=3),
+        page_size=10,
+        window=3600,
+    ))
+    assert [event.data["value"] for event in events] == [
+        str(ix) for ix in range(len(hours))
+    ]
+    # pages never hold more than `page_size` events, however dense
+    assert max(pages) <= 10
+    assert len(pages) < len(hours)
+
+
+def test_iter_events_overlapping(client):
+    """Tests reading events that last over many windows only once."""
+    earlier, long_answer = (
+        answer_event(0, "happiness", "no"), answer_event(1, "happiness", "yes")
+    )
+    earlier.duration = timedelta(hours=1)
+    long_answer.duration = timedelta(days=2)
+    client.insert_events(BUCKET_ID, [
+        earlier, long_answer, answer_event(30, "focus", 7)
+    ])
+    events = list(iter_events(
+        client,
+        BUCKET_ID,
+        start=START_TIME + timedelta(hours=0.5),
+        end=START_TIME + timedelta(days=3),
+        window=3600,
+    ))
+    assert [event.timestamp for event in events] == [
+        START_TIME + timedelta(hours=1), START_TIME + timedelta(hours=30)
+    ]
+
+
+def test_iter_events_long(client, monkeypatch):
+    """Tests reading small pages of events lasting over many windows."""
+    answers = [answer_event(hours, "happiness", "yes") for hours in range(6)]
+    for answer in answers:
+        answer.duration = timedelta(days=2)
+    client.insert_events(BUCKET_ID, answers)
+
+    pages = []
+    get_events = client.get_events
+
+    def spy(*args, **kwargs):
+        page = get_events(*args, **kwargs)
+        pages.append(len(page))
+        return page
+
+    monkeypatch.setattr(client, "get_events", spy)
+    events = list(iter_events(
+        client,
+        BUCKET_ID,
+        start=START_TIME,
+        end=START_TIME + timedelta(days=30),
+        page_size=2,
+        window=3600,
+    ))
+    assert [event.timestamp for event in events] == [
+        answer.timestamp for answer in answers
+    ]
+    # events started in earlier windows neither shrink nor hold back windows
+    assert len(pages) < 30
+
+
+def test_iter_events_from_creation(client):
+    """Tests reading a whole bucket, from its creation up to now."""
+    client.insert_events(BUCKET_ID, [
+        answer_event(hours, "happiness", "yes") for hours in range(5)
+    ])
+    assert len(list(iter_events(client, BUCKET_ID))) == 5
+
+    with pytest.raises(ValueError):
+        list(iter_events(client, "unknown"))
+
+
+def test_filter_events():
+    """Tests keeping only the answers to some questions."""
+    events = [answer_event(0, "happiness", "yes"), answer_event(1, "focus", 7)]
+    assert list(filter_events(events)) == events
+    assert list(filter_events(events, ["focus"])) == events[1:]
+    # questions are described in events of their own
+    description = Event(
+        timestamp=START_TIME,
+        data={"question_id": "focus", "description": {"title": "Focus"}},
+    )
+    assert list(filter_events([description] + events)) == events
+    assert list(filter_events([description] + events, ["focus"])) == (
+        events[1:]
+    )
+
+
+def test_to_row():
+    """Tests flattening answers into table rows."""
+    row = to_row(answer_event(0, "daily.checkin", {"Mood": "Good"}))
+    assert row.question_id == "daily.checkin"
+    assert row.success is True
+    assert row.title is None
+    assert json.loads(row.answer) == {"Mood": "Good"}
+    assert to_row(answer_event(0, "happiness", "yes")).answer == "yes"
+    assert to_row(answer_event(0, "happiness", 7)).answer == "7"
+
+    # answers stored by earlier versions, under the dialog's title
+    legacy = to_row(answer_event(0, "happiness", "yes", title="Happy?"))
+    assert (legacy.title, legacy.answer) == ("Happy?", "yes")
+
+
+def test_write():
+    """Tests writing answers as JSON lines and comma-separated values."""
+    events = [answer_event(0, "happiness", "yes"), answer_event(1, "focus", 7)]
+
+    file = io.StringIO()
+    assert write_ndjson(iter(events), file) == 2
+    lines = file.getvalue().splitlines()
+    assert [json.loads(line)["data"] for line in lines] == [
+        event.data for event in events
+    ]
+
+    file = io.StringIO()
+    assert write_csv(iter(events), file) == 2
+    rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+    assert [row["answer"] for row in rows] == ["yes", "7"]
+    assert rows[0]["timestamp"] == START_TIME.isoformat()
+
+
+def test_write_hosts():
+    """Tests writing answers tagged with the hosts they were given in."""
+    events = [
+        HostEvent("laptop", answer_event(0, "happiness", "yes")),
+        HostEvent("desktop", answer_event(1, "focus", 7)),
+    ]
+
+    file = io.StringIO()
+    assert write_ndjson(iter(events), file) == 2
+    assert [
+        json.loads(line)["hostname"] for line in file.getvalue().splitlines()
+    ] == ["laptop", "desktop"]
+
+    file = io.StringIO()
+    assert write_csv(iter(events), file, header=False) == 2
+    rows = list(csv.reader(io.StringIO(file.getvalue())))
+    assert [row[-1] for row in rows] == ["laptop", "desktop"]
+
+
+def test_write_parquet(tmp_path):
+    """Tests writing answers to a Parquet file, in row groups."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    events = [answer_event(hours, "happiness", "yes") for hours in range(5)]
+    path = tmp_path / "answers.parquet"
+    assert write_parquet(iter(events), path, batch_size=2) == 5
+    table = pq.read_table(path)
+    assert table.num_rows == 5
+    assert table.column("answer").to_pylist() == ["yes"] * 5
@@ -0,0 +1,216 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the local journal of answers pending to be stored."""
+
+
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from aw_core.models import Event
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.journal import AnswerJournal, JournalFlusher
+
+
+def _event(answer: str) -> Event:
+    return Event(
+        timestamp=datetime.now(timezone.utc),
+        data={"success": True, "test.question": answer},
+    )
+
+
+@pytest.fixture(scope="function")
+def journal(tmp_path):
+    """Provides an empty journal."""
+    journal = AnswerJournal(tmp_path / "journal.sqlite")
+    yield journal
+    journal.close()
+
+
+def test_journal_append_ack(journal):
+    """Tests appending events to the journal and acknowledging them."""
+    first_id = journal.append("bucket.one", _event("yes"))
+    journal.append("bucket.two", _event("no"))
+    assert len(journal) == 2
+
+    entries = journal.entries()
+    assert [entry.bucket_id for entry in entries] == [
+        "bucket.one", "bucket.two"
+    ]
+    assert entries[0].entry_id == first_id
+    assert entries[0].event.data["test.question"] == "yes"
+
+    journal.ack([first_id])
+    assert len(journal) == 1
+    assert journal.entries()[0].bucket_id == "bucket.two"
+
+
+def test_journal_survives_reopening(tmp_path):
+    """Tests that journaled events are kept after closing the journal."""
+    journal = AnswerJournal(tmp_path / "journal.sqlite")
+    journal.append("bucket.one", _event("yes"))
+    journal.close()
+
+    journal = AnswerJournal(tmp_path / "journal.sqlite")
+    assert len(journal) == 1
+    journal.close()
+
+
+def test_flusher_batches_per_bucket(journal):
+    """Tests sending pending events with one request per bucket."""
+    for answer in ["yes", "no", "yes"]:
+        journal.append("bucket.one", _event(answer))
+    journal.append("bucket.two", _event("no"))
+    client = MagicMock()
+
+    flusher = JournalFlusher(journal, client, batch_size=10)
+    assert flusher.flush() == 4
+    assert len(journal) == 0
+    assert client.insert_events.call_count == 2
+    bucket_id, events = client.insert_events.call_args_list[0][0]
+    assert bucket_id == "bucket.one"
+    assert len(events) == 3
+
+
+def test_flusher_retries(journal):
+    """Tests keeping events in the journal until the server is back."""
+    journal.append("bucket.one", _event("yes"))
+    client = MagicMock()
+    client.insert_events.side_effect = [ConnectionError("server down"), None]
+
+    flusher = JournalFlusher(
+        journal, client, interval=0.01, min_backoff=0.01
+    )
+    flusher.start()
+    deadline = time.monotonic() + 5
+    while len(journal) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    flusher.stop()
+    assert len(journal) == 0
+    assert client.insert_events.call_count == 2
+
+
+def test_flusher_batch_window(journal):
+    """Tests gathering events appended in a short interval."""
+    client = MagicMock()
+    flusher = JournalFlusher(
+        journal, client, batch_size=100, batch_window=0.5, interval=10
+    )
+    flusher.start()
+    for answer in ["yes", "no", "yes"]:
+        journal.append("bucket.one", _event(answer))
+        flusher.notify()
+    deadline = time.monotonic() + 5
+    while len(journal) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    flusher.stop()
+    assert len(journal) == 0
+    assert client.insert_events.call_count == 1
+
+
+def test_flusher_merges(journal):
+    """Tests merging identical answers locally before sending them."""
+    for answer in ["yes", "yes", "no", "no", "no"]:
+        journal.append("bucket.one", _event(answer), pulsetime=3600)
+    journal.append("bucket.one", _event("yes"))
+    client = MagicMock()
+
+    flusher = JournalFlusher(journal, client, batch_size=10)
+    assert flusher.flush() == 6
+    assert len(journal) == 0
+    assert client.insert_events.call_count == 2
+    bucket_id, events = client.insert_events.call_args_list[0][0]
+    assert bucket_id == "bucket.one"
+    assert [event.data["test.question"] for event in events] == ["yes", "no"]
+    assert client.insert_event.call_count == 0
+
+
+def test_flusher_merges_per_question(journal, stub_server):
+    """Tests merging answers to questions sharing a bucket, by question."""
+    client = SessionClient(
+        "test-journal", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    client.create_bucket("bucket.one", event_type="test.question")
+    flusher = JournalFlusher(journal, client, batch_size=10)
+    start = datetime.now(timezone.utc)
+    for minutes in range(4):
+        for question_id in ["mood", "energy"]:
+            journal.append(
+                "bucket.one",
+                Event(
+                    timestamp=start + timedelta(minutes=minutes),
+                    data={
+                        "success": True,
+                        "value": True,
+                        "question_id": question_id,
+                    },
+                ),
+                pulsetime=3600,
+            )
+        # each answer is sent on its own, as they are given
+        flusher.flush()
+    # unanswered prompts are not merged
+    for _ in range(2):
+        journal.append(
+            "bucket.one",
+            Event(
+                timestamp=start + timedelta(minutes=5),
+                data={"success": False, "value": None, "question_id": "mood"},
+            ),
+            pulsetime=3600,
+        )
+    flusher.flush()
+
+    stored = client.get_events("bucket.one")
+    assert len(stored) == 4
+    answered = [event for event in stored if event.data["success"]]
+    assert sorted(event.data["question_id"] for event in answered) == [
+        "energy", "mood"
+    ]
+    assert all(
+        event.duration == timedelta(minutes=3) for event in answered
+    )
+
+
+def test_journal_upgrade(tmp_path):
+    """Tests reopening a journal written before heartbeats were supported."""
+    path = tmp_path / "journal.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE journal (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "bucket_id TEXT NOT NULL, event TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO journal (bucket_id, event) VALUES (?, ?)",
+        ("bucket.one", _event("yes").to_json_str()),
+    )
+    conn.commit()
+    conn.close()
+
+    journal = AnswerJournal(path)
+    (entry,) = journal.entries()
+    assert entry.bucket_id == "bucket.one"
+    assert entry.pulsetime is None
+    journal.close()
+
+
+def test_journal_append_many(journal):
+    """Tests appending many events to the journal at once."""
+    journal.append("bucket.one", _event("first"))
+    journal.append_many([
+        ("bucket.one", _event("yes"), None),
+        ("bucket.two", _event("7"), 60.0),
+    ])
+    entries = journal.entries()
+    assert [entry.bucket_id for entry in entries] == [
+        "bucket.one", "bucket.one", "bucket.two"
+    ]
+    assert entries[2].event.data["test.question"] == "7"
+    assert entries[2].pulsetime == 60.0
@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the configuration of the watcher's log output."""
+
+
+import json
+from io import StringIO
+
+import pytest
+from loguru import logger
+
+from aw_watcher_ask import logs
+
+
+@pytest.fixture(scope="function")
+def sink():
+    """Provides a stream to log to, unregistering the sink afterwards."""
+    stream = StringIO()
+    yield stream
+    if logs._handler is not None:
+        logger.remove(logs._handler[0])
+        logs._handler = None
+
+
+def test_configure_once(sink):
+    """Tests that configuring the logs twice does not duplicate lines."""
+    logs.configure(sink=sink)
+    logs.configure(sink=sink)
+    logs.ensure_configured()
+    logger.bind(question_id="test.question").info("Hello {}!", "world")
+    logger.debug("Not logged.")
+    lines = sink.getvalue().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith("<test.question>: INFO - Hello world!")
+
+
+def test_configure_json_async(sink):
+    """Tests logging records as JSON objects, from a background thread."""
+    logs.configure(sink=sink, serialize=True, enqueue=True)
+    logger.warning("Something happened.")
+    logs.flush()
+    record = json.loads(sink.getvalue())
+    assert record["record"]["message"] == "Something happened."
+    assert record["record"]["extra"]["question_id"] == "*"
+
+
+def test_configure_sample(sink):
+    """Tests keeping only some of the records of a level."""
+    logs.configure(sink=sink, sample={"info": 3})
+    for ix in range(7):
+        logger.info("Message {}.", ix)
+        logger.warning("Warning {}.", ix)
+    messages = [
+        line.split(" - ", 1)[1] for line in sink.getvalue().splitlines()
+    ]
+    assert [
+        message for message in messages if message.startswith("Message")
+    ] == ["Message 0.", "Message 3.", "Message 6."]
+    assert len([
+        message for message in messages if message.startswith("Warning")
+    ]) == 7
+
+
+def test_configure_stderr(sink, monkeypatch):
+    """Tests logging to the standard error stream as swapped by callers."""
+    monkeypatch.setattr("sys.stderr", sink)
+    logs.configure()
+    logger.info("Captured.")
+    assert sink.getvalue().endswith("<*>: INFO - Captured.\n")
@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the instrumentation of the watcher."""
+
+
+import time
+from urllib.request import urlopen
+
+import pytest
+
+from aw_watcher_ask import metrics
+from aw_watcher_ask.models import OverlapPolicy
+from aw_watcher_ask.prompts import PromptPool
+
+
+def test_render():
+    """Tests rendering metrics in the Prometheus text format."""
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("test_total", "A counter.")
+    counter.inc(question_id="a")
+    counter.inc(2, question_id="a")
+    gauge = registry.gauge("test_depth", "A gauge.")
+    gauge.set_function(lambda: 3)
+    histogram = registry.histogram("test_seconds", "A histogram.", (1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+
+    assert registry.counter("test_total", "Again.") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("test_total", "A gauge with a counter's name.")
+
+    assert counter.get(question_id="a") == 3
+    assert histogram.count() == 4
+    lines = registry.render().splitlines()
+    assert "# TYPE test_total counter" in lines
+    assert 'test_total{question_id="a"} 3' in lines
+    assert "test_depth 3" in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_bucket{le="10"} 3' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 4' in lines
+    assert "test_seconds_sum 56.5" in lines
+    assert "test_seconds_count 4" in lines
+
+
+def test_prompt_metrics():
+    """Tests that the prompt pool reports drops, queue depth and durations."""
+    pool = PromptPool(max_workers=2)
+    dropped = metrics.PROMPTS_DROPPED.get(question_id="test.metrics")
+    durations = metrics.PROMPT_DURATION.count()
+
+    pool.submit("test.metrics", lambda: time.sleep(0.2))
+    pool.submit("test.metrics", lambda: None)
+    assert metrics.PROMPTS_OPEN.get() == 1
+    assert metrics.PROMPTS_QUEUED.get() == 1
+    pool.submit("test.metrics", lambda: None, overlap=OverlapPolicy.drop)
+    pool.shutdown()
+
+    assert metrics.PROMPTS_DROPPED.get(question_id="test.metrics") == (
+        dropped + 1
+    )
+    assert metrics.PROMPT_DURATION.count() == durations + 2
+    assert metrics.PROMPTS_OPEN.get() == 0
+
+
+def test_server():
+    """Tests serving metrics through a local HTTP endpoint."""
+    registry = metrics.MetricsRegistry()
+    registry.counter("test_total", "A counter.").inc()
+    server = metrics.MetricsServer(0, registry=registry).start()
+    try:
+        with urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.status == 200
+            assert "test_total 1" in response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+
+def test_dumper(tmp_path):
+    """Tests periodically writing metrics to a file."""
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("test_total", "A counter.")
+    path = tmp_path / "metrics.prom"
+    dumper = metrics.MetricsDumper(path, interval=0.05, registry=registry)
+    dumper.start()
+    time.sleep(0.2)
+    assert "# TYPE test_total counter" in path.read_text()
+    assert "test_total 1" not in path.read_text()
+    counter.inc()
+    dumper.stop()
+    assert "test_total 1" in path.read_text()
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the schema of the options accepted by dialog boxes."""
+
+
+import pytest
+
+from aw_watcher_ask.models import DialogType
+from aw_watcher_ask.options import SCHEMAS, parse_args, validate_options
+
+
+def test_schemas():
+    """Tests that every dialog type has a schema, with the general options."""
+    assert set(SCHEMAS) == set(DialogType)
+    for schema in SCHEMAS.values():
+        assert schema["timeout"].type is int
+
+
+@pytest.mark.parametrize(
+    "args,options",
+    [
+        ([], {}),
+        (["--text=What are you doing?"], {"text": "What are you doing?"}),
+        (["--text", "What are you doing?"], {"text": "What are you doing?"}),
+        (["--min-value=-5"], {"min-value": -5}),
+        (["--min-value", "-5"], {"min-value": -5}),
+        (["--hide-value", "--step", "2"], {"hide-value": True, "step": 2}),
+        (["--extra-button", "Later", "Never"], {
+            "extra-button": ["Later", "Never"],
+        }),
+        (["--extra-button=Later", "--width=300", "--extra-button=Never"], {
+            "extra-button": ["Later", "Never"], "width": 300,
+        }),
+    ],
+)
+def test_parse_args(args, options):
+    """Tests parsing command-line options in a single pass."""
+    assert parse_args(DialogType.scale, args) == options
+
+
+@pytest.mark.parametrize(
+    "args,message",
+    [
+        (["--add-entry=Mood"], "not accepted by `scale` dialogs"),
+        (["--hide-value=yes"], "does not take a value"),
+        (["--step"], "requires a value"),
+        (["--step=two"], "expects int values"),
+        (["--step=1", "--step=2"], "accepts a single value"),
+        (["--step", "1", "2"], "Unexpected argument `2`"),
+    ],
+)
+def test_parse_invalid_args(args, message):
+    """Tests refusing invalid command-line options."""
+    with pytest.raises(ValueError, match=message):
+        parse_args(DialogType.scale, args)
+
+
+def test_validate_options():
+    """Tests checking options given as keyword arguments or in a config."""
+    assert validate_options(DialogType.list, {
+        "column": "Activity",
+        "hide_header": True,
+        "multiple": False,
+        "text": None,
+        "width": "400",
+    }) == {"column": ["Activity"], "hide-header": True, "width": 400}
+
+    with pytest.raises(ValueError, match="requires a value"):
+        validate_options(DialogType.list, {"text": True})
+    with pytest.raises(ValueError, match="accepts a single value"):
+        validate_options(DialogType.list, {"text": ["a", "b"]})
+    with pytest.raises(ValueError, match="not accepted"):
+        validate_options(DialogType.password, {"text": "Password?"})
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for detecting the user's presence from AFK events."""
+
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aw_core.models import Event
+
+from aw_watcher_ask.client import SessionClient
+from aw_watcher_ask.clock import VirtualClock
+from aw_watcher_ask.dialogs import Cancellation, cancellable
+from aw_watcher_ask.presence import AfkMonitor
+
+
+AFK_BUCKET = "aw-watcher-afk_test"
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="function")
+def client(stub_server):
+    """Provides a client to a stub server with an AFK watcher's bucket."""
+    client = SessionClient(
+        "test-presence", testing=True, host="127.0.0.1",
+        port=stub_server.port,
+    )
+    client.create_bucket(AFK_BUCKET, event_type="afkstatus")
+    yield client
+    client.session.close()
+
+
+def _report(client, start: datetime, seconds: float, status: str) -> None:
+    client.insert_event(AFK_BUCKET, Event(
+        timestamp=start,
+        duration=timedelta(seconds=seconds),
+        data={"status": status},
+    ))
+
+
+def test_is_active(client, stub_server):
+    """Tests reading the user's presence, fetching only new events."""
+    clock = VirtualClock(START_TIME + timedelta(minutes=10))
+    monitor = AfkMonitor(client, AFK_BUCKET, refresh_interval=10, clock=clock)
+    assert monitor.is_active() is None  # no reports yet
+
+    _report(client, START_TIME + timedelta(minutes=5), 300, "not-afk")
+    clock.advance(10)
+    assert monitor.is_active() is True
+
+    # cached in between refreshes
+    _report(client, START_TIME + timedelta(minutes=10), 10, "afk")
+    assert monitor.is_active() is True
+    clock.advance(10)
+    assert monitor.is_active() is False
+
+    # only events since the last cached one are fetched
+    fetches = [
+        path for method, path in stub_server.requests
+        if method == "GET" and path.endswith("/events")
+    ]
+    assert len(fetches) == 3
+    assert len(monitor._events) == 2
+
+    # the AFK watcher stopped reporting
+    clock.advance(3600)
+    assert monitor.is_active() is None
+
+
+def test_is_active_without_bucket(client):
+    """Tests treating users as present if there is no AFK watcher."""
+    monitor = AfkMonitor(client, "aw-watcher-afk_unknown")
+    assert monitor.is_active() is None
+    assert monitor.wait_until_active(START_TIME)
+
+
+def test_wait_until_active(client):
+    """Tests waiting for the user to come back, up to a deadline."""
+    now = datetime.now(timezone.utc)
+    _report(client, now - timedelta(minutes=1), 60, "afk")
+    monitor = AfkMonitor(client, AFK_BUCKET, refresh_interval=0)
+
+    started = time.monotonic()
+    assert not monitor.wait_until_active(
+        now + timedelta(seconds=0.3), interval=0.05
+    )
+    assert 0.2 < time.monotonic() - started < 2
+
+    timer = threading.Timer(
+        0.2, _report, (client, datetime.now(timezone.utc), 1, "not-afk")
+    )
+    timer.start()
+    assert monitor.wait_until_active(
+        now + timedelta(seconds=10), interval=0.05
+    )
+    timer.join()
+
+
+def test_wait_until_active_virtual(client):
+    """Tests waiting for the user through a simulated clock."""
+    clock = VirtualClock(START_TIME)
+    _report(client, START_TIME - timedelta(minutes=1), 60, "afk")
+    monitor = AfkMonitor(
+        client, AFK_BUCKET, refresh_interval=0, stale_after=86400, clock=clock
+    )
+
+    started = time.monotonic()
+    assert not monitor.wait_until_active(
+        START_TIME + timedelta(hours=8), interval=600
+    )
+    assert clock.now() == START_TIME + timedelta(hours=8)
+    assert time.monotonic() - started < 5
+
+
+def test_wait_until_active_cancelled(client):
+    """Tests stopping the wait when the prompt is cancelled."""
+    now = datetime.now(timezone.utc)
+    _report(client, now - timedelta(minutes=1), 60, "afk")
+    monitor = AfkMonitor(client, AFK_BUCKET, refresh_interval=0)
+    cancellation = Cancellation()
+    threading.Timer(0.2, cancellation.cancel).start()
+
+    started = time.monotonic()
+    with cancellable(cancellation):
+        assert not monitor.wait_until_active(now + timedelta(minutes=10))
+    assert time.monotonic() - started < 2
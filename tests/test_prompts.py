@@ -0,0 +1,154 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for presenting prompts concurrently."""
+
+
+import threading
+from typing import Callable, List
+
+import pytest
+
+from aw_watcher_ask.dialogs import on_cancel
+from aw_watcher_ask.models import OverlapPolicy
+from aw_watcher_ask.prompts import PromptPool
+
+
+def _blocking_prompt(
+    answer: str, release: threading.Event, started: threading.Event
+) -> Callable[[], str]:
+    """Builds a prompt that stays open until released or cancelled."""
+    def prompt() -> str:
+        cancelled = threading.Event()
+        on_cancel(cancelled.set)
+        started.set()
+        while not release.is_set():
+            if cancelled.wait(0.01):
+                return "cancelled"
+        return answer
+    return prompt
+
+
+def test_pool_queue():
+    """Tests queueing prompts of a question that is already open."""
+    answers: List[str] = []
+    pool = PromptPool(max_workers=2)
+    release, started = threading.Event(), threading.Event()
+    assert pool.submit(
+        "test.question",
+        _blocking_prompt("first", release, started),
+        callback=answers.append,
+    )
+    assert pool.submit(
+        "test.question", lambda: "second", callback=answers.append
+    )
+    assert started.wait(1)
+    assert pool.running("test.question") == 1
+    assert pool.waiting("test.question") == 1
+    release.set()
+    pool.shutdown()
+    assert answers == ["first", "second"]
+
+
+def test_pool_drop():
+    """Tests dropping prompts of a question that is already open."""
+    answers: List[str] = []
+    pool = PromptPool(max_workers=2)
+    release, started = threading.Event(), threading.Event()
+    pool.submit(
+        "test.question",
+        _blocking_prompt("first", release, started),
+        callback=answers.append,
+        overlap=OverlapPolicy.drop,
+    )
+    assert not pool.submit(
+        "test.question",
+        lambda: "second",
+        callback=answers.append,
+        overlap=OverlapPolicy.drop,
+    )
+    release.set()
+    pool.shutdown()
+    assert answers == ["first"]
+
+
+def test_pool_replace():
+    """Tests closing the open prompt of a question to show a new one."""
+    answers: List[str] = []
+    pool = PromptPool(max_workers=2)
+    release, started = threading.Event(), threading.Event()
+    pool.submit(
+        "test.question",
+        _blocking_prompt("first", release, started),
+        callback=answers.append,
+        overlap=OverlapPolicy.replace,
+    )
+    assert started.wait(1)
+    for answer in ("second", "third"):
+        pool.submit(
+            "test.question",
+            lambda answer=answer: answer,
+            callback=answers.append,
+            overlap=OverlapPolicy.replace,
+        )
+    pool.shutdown()
+    assert answers == ["cancelled", "third"]
+
+
+def test_pool_limits():
+    """Tests the per-question and global limits of open prompts."""
+    lock = threading.Lock()
+    open_prompts: List[int] = [0, 0]
+    release = threading.Event()
+
+    def prompt() -> None:
+        with lock:
+            open_prompts[0] += 1
+            open_prompts[1] = max(open_prompts)
+        release.wait(1)
+        with lock:
+            open_prompts[0] -= 1
+
+    pool = PromptPool(max_workers=3)
+    for ix in range(4):
+        pool.submit(f"question.{ix}", prompt, limit=2)
+        pool.submit(f"question.{ix}", prompt, limit=2)
+        assert pool.running(f"question.{ix}") == 2
+    release.set()
+    pool.shutdown()
+    assert open_prompts == [0, 3]
+
+
+def test_pool_independent_questions():
+    """Tests that an open prompt does not hold up other questions."""
+    pool = PromptPool(max_workers=2)
+    release, started = threading.Event(), threading.Event()
+    answered = threading.Event()
+    pool.submit("first.question", _blocking_prompt("", release, started))
+    assert started.wait(1)
+    pool.submit("second.question", lambda: None, callback=lambda _: (
+        answered.set()
+    ))
+    assert answered.wait(1)
+    release.set()
+    pool.shutdown()
+
+
+def test_pool_shutdown_cancel():
+    """Tests closing all open prompts when shutting down."""
+    answers: List[str] = []
+    pool = PromptPool(max_workers=2)
+    started = threading.Event()
+    pool.submit(
+        "test.question",
+        _blocking_prompt("first", threading.Event(), started),
+        callback=answers.append,
+    )
+    pool.submit("test.question", lambda: "second", callback=answers.append)
+    assert started.wait(1)
+    pool.shutdown(cancel=True)
+    assert answers == ["cancelled"]
+    with pytest.raises(RuntimeError):
+        pool.submit("test.question", lambda: "third")
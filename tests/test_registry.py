@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the on-disk registry of questions."""
+
+
+from datetime import datetime, timezone
+
+import pytest
+
+from aw_watcher_ask.models import DialogType, OverlapPolicy, Question
+from aw_watcher_ask.registry import QuestionRegistry
+
+
+NEXT_EXECUTION = datetime(2022, 1, 1, 12, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="function")
+def registry(tmp_path):
+    """Provides an empty registry."""
+    registry = QuestionRegistry(tmp_path / "registry.sqlite")
+    yield registry
+    registry.close()
+
+
+def test_registry_roundtrip(registry):
+    """Tests reading back registered questions and their state."""
+    question = Question(
+        question_id="happiness.level",
+        question_type=DialogType.scale,
+        schedule="0 * * * *",
+        until=datetime(2030, 12, 31, tzinfo=timezone.utc),
+        overlap=OverlapPolicy.replace,
+        options={"min-value": 0},
+    )
+    registry.register(question, NEXT_EXECUTION)
+    registry.register(Question(question_id="working"))
+    assert len(registry) == 2
+    assert "working" in registry
+
+    happiness, working = registry.load()
+    assert happiness.question == question
+    assert happiness.next_execution == NEXT_EXECUTION
+    assert working.question.question_id == "working"
+    assert working.next_execution is None
+
+
+def test_registry_state(registry):
+    """Tests saving the schedules' state, and replacing questions."""
+    question = Question(question_id="working")
+    registry.register(question)
+    registry.save_state("working", NEXT_EXECUTION)
+    assert registry.load()[0].next_execution == NEXT_EXECUTION
+
+    # registering the question again resets its state
+    registry.register(question)
+    assert registry.load()[0].next_execution is None
+
+
+def test_registry_unregister(registry):
+    """Tests removing questions from the registry."""
+    registry.register(Question(question_id="working"))
+    assert registry.unregister("working")
+    assert not registry.unregister("working")
+    assert len(registry) == 0
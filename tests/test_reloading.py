@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for reloading question definitions while the watcher runs."""
+
+
+import os
+
+from aw_watcher_ask.models import Question
+from aw_watcher_ask.reloading import FileWatcher, diff_questions
+
+
+def test_file_watcher(tmp_path):
+    """Tests telling whether a file changed since the last check."""
+    path = tmp_path / "questions.json"
+    path.write_text("{}")
+    watcher = FileWatcher(path)
+    assert not watcher.changed()
+
+    path.write_text('{"questions": []}')
+    assert watcher.changed()
+    assert not watcher.changed()
+
+    # same size, but modified later
+    status = os.stat(path)
+    path.write_text('{"questions": [0]}'[:status.st_size])
+    os.utime(path, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+    assert watcher.changed()
+
+    path.unlink()
+    assert watcher.changed()
+    assert not watcher.changed()
+
+
+def test_diff_questions():
+    """Tests telling which questions were added, removed or changed."""
+    current = {
+        question_id: Question(question_id)
+        for question_id in ("kept", "retitled", "rescheduled", "removed")
+    }
+    changes = diff_questions(current, [
+        Question("kept"),
+        Question("retitled", title="How are you?"),
+        Question("rescheduled", schedule="0 9 * * *"),
+        Question("added"),
+    ])
+    assert [question.question_id for question in changes.added] == ["added"]
+    assert changes.removed == ["removed"]
+    assert [
+        question.question_id for question in changes.rescheduled
+    ] == ["rescheduled"]
+    assert [
+        question.question_id for question in changes.updated
+    ] == ["retitled"]
+    assert str(changes) == "1 added, 1 removed, 1 rescheduled, 1 updated"
+    assert not diff_questions(current, current.values())
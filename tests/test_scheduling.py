@@ -0,0 +1,233 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for scheduling many questions from a single process."""
+
+
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import pytest
+from croniter import croniter
+
+from aw_watcher_ask.clock import VirtualClock
+from aw_watcher_ask.models import MissedPolicy
+from aw_watcher_ask.scheduling import Scheduler
+
+
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeClock:
+    """A clock whose wall time can jump, as when the system is suspended."""
+
+    def __init__(self, suspend_at: int = -1, suspend_for: float = 0.0):
+        self.wall = START_TIME
+        self.monotonic_time = 0.0
+        self.sleeps = 0
+        self.suspend_at = suspend_at
+        self.suspend_for = suspend_for
+
+    def now(self) -> datetime:
+        return self.wall
+
+    def monotonic(self) -> float:
+        return self.monotonic_time
+
+    def sleep(self, seconds: float) -> None:
+        self.monotonic_time += seconds
+        self.wall += timedelta(seconds=seconds)
+        if self.sleeps == self.suspend_at:
+            self.wall += timedelta(seconds=self.suspend_for)
+        self.sleeps += 1
+
+    def scheduler(self, **kwargs) -> Scheduler:
+        return Scheduler(
+            now=self.now,
+            monotonic=self.monotonic,
+            sleep=self.sleep,
+            **kwargs,
+        )
+
+
+def test_scheduler_order():
+    """Tests that jobs are popped in order of their next execution times."""
+    scheduler = Scheduler()
+    scheduler.add("every.ten", croniter("*/10 * * * *", START_TIME))
+    scheduler.add("every.fifteen", croniter("*/15 * * * *", START_TIME))
+    executions = [scheduler.pop() for _ in range(5)]
+    assert executions == [
+        (START_TIME + timedelta(minutes=10), "every.ten"),
+        (START_TIME + timedelta(minutes=15), "every.fifteen"),
+        (START_TIME + timedelta(minutes=20), "every.ten"),
+        (START_TIME + timedelta(minutes=30), "every.fifteen"),
+        (START_TIME + timedelta(minutes=30), "every.ten"),
+    ]
+    assert len(scheduler) == 2
+
+
+def test_scheduler_until():
+    """Tests that jobs are dropped after their end dates."""
+    scheduler = Scheduler()
+    scheduler.add(
+        "hourly",
+        croniter("0 * * * *", START_TIME),
+        until=START_TIME + timedelta(hours=3),
+    )
+    executions = list(scheduler)
+    assert [execution for execution, _ in executions] == [
+        START_TIME + timedelta(hours=1),
+        START_TIME + timedelta(hours=2),
+    ]
+    assert not scheduler
+    assert "hourly" not in scheduler
+
+
+def test_scheduler_duplicated_key():
+    """Tests that the same job can not be scheduled twice."""
+    scheduler = Scheduler()
+    scheduler.add("hourly", croniter("0 * * * *", START_TIME))
+    with pytest.raises(ValueError):
+        scheduler.add("hourly", croniter("0 * * * *", START_TIME))
+
+
+def test_scheduler_due_precise():
+    """Tests firing jobs exactly on time, without truncating seconds."""
+    clock = FakeClock()
+    scheduler = clock.scheduler(max_sleep=60)
+    scheduler.add("daily", croniter("30 12 * * *", START_TIME))
+    executions = list(islice(scheduler.due(), 3))
+    assert [execution for execution, _ in executions] == [
+        START_TIME + timedelta(days=days, hours=12, minutes=30)
+        for days in range(3)
+    ]
+    assert clock.wall == executions[-1][0]
+    assert scheduler.jitter.count == 3
+    assert scheduler.jitter.max == 0
+
+
+@pytest.mark.parametrize("policy", [MissedPolicy.skip, MissedPolicy.coalesce])
+def test_scheduler_missed_executions(policy: MissedPolicy):
+    """Tests handling executions missed while the system was suspended."""
+    # suspend the system for a little more than three hours at the first sleep
+    clock = FakeClock(suspend_at=0, suspend_for=3 * 3600 + 60)
+    scheduler = clock.scheduler(missed_policy=policy, max_sleep=60)
+    scheduler.add("hourly", croniter("0 * * * *", START_TIME))
+    execution, _ = next(scheduler.due())
+    if policy == MissedPolicy.coalesce:
+        # fired once, as soon as the system was resumed
+        assert execution == START_TIME + timedelta(hours=1)
+        assert clock.wall <= START_TIME + timedelta(hours=3, minutes=2)
+    else:
+        # missed executions were dropped, and the next one fired on time
+        assert execution == START_TIME + timedelta(hours=4)
+        assert clock.wall == execution
+    assert scheduler.peek()[0] == START_TIME + timedelta(hours=4 + (
+        policy == MissedPolicy.skip
+    ))
+
+
+def test_scheduler_clock_step():
+    """Tests correcting the deadline when the wall clock is stepped back."""
+    clock = FakeClock(suspend_at=0, suspend_for=-600)
+    scheduler = clock.scheduler(max_sleep=60)
+    scheduler.add("hourly", croniter("0 * * * *", START_TIME))
+    execution, _ = next(scheduler.due())
+    assert execution == START_TIME + timedelta(hours=1)
+    assert clock.wall == execution
+
+
+def test_scheduler_remove():
+    """Tests removing a job from the scheduler."""
+    scheduler = Scheduler()
+    scheduler.add("every.ten", croniter("*/10 * * * *", START_TIME))
+    scheduler.add("every.fifteen", croniter("*/15 * * * *", START_TIME))
+    scheduler.remove("every.ten")
+    assert len(scheduler) == 1
+    assert scheduler.pop() == (
+        START_TIME + timedelta(minutes=15), "every.fifteen"
+    )
+
+
+def test_scheduler_resume():
+    """Tests adding a job from a known next execution time."""
+    scheduler = Scheduler()
+    resumed_at = START_TIME + timedelta(minutes=20)
+    scheduler.add(
+        "every.ten",
+        croniter("*/10 * * * *", resumed_at),
+        next_execution=resumed_at,
+    )
+    assert scheduler.next_execution("every.ten") == resumed_at
+    assert scheduler.pop() == (resumed_at, "every.ten")
+    assert scheduler.next_execution("every.ten") == (
+        START_TIME + timedelta(minutes=30)
+    )
+    assert scheduler.next_execution("unknown") is None
+
+
+def test_scheduler_virtual_clock():
+    """Tests jumping straight to each deadline with a virtual clock."""
+    clock = VirtualClock(START_TIME)
+    scheduler = Scheduler(clock=clock)
+    scheduler.add(
+        "hourly",
+        croniter("0 * * * *", START_TIME),
+        until=START_TIME + timedelta(days=365),
+    )
+    executions = [execution for execution, _ in scheduler.due()]
+    assert len(executions) == 365 * 24 - 1
+    assert clock.now() == executions[-1]
+    assert scheduler.jitter.max == 0.0
+
+
+def test_scheduler_poll():
+    """Tests changing the jobs while waiting for the next one."""
+    clock = VirtualClock(START_TIME)
+    polls = []
+
+    def poll():
+        polls.append(clock.now())
+        if len(polls) == 2:
+            scheduler.add("soon", croniter("*/5 * * * *", clock.now()))
+            scheduler.remove("hourly")
+
+    scheduler = Scheduler(clock=clock, poll=poll, poll_interval=60)
+    scheduler.add("hourly", croniter("0 * * * *", START_TIME))
+    execution, key = next(scheduler.due())
+    # the job added is due before the one that was waited for
+    assert (execution, key) == (START_TIME + timedelta(minutes=5), "soon")
+    assert polls[:2] == [
+        START_TIME + timedelta(minutes=1), START_TIME + timedelta(minutes=2)
+    ]
+    assert "hourly" not in scheduler
+
+
+def test_scheduler_take():
+    """Tests firing ahead of time the jobs due shortly."""
+    clock = VirtualClock(START_TIME)
+    scheduler = Scheduler(clock=clock)
+    half_past = START_TIME + timedelta(minutes=31)
+    scheduler.add("hourly", croniter("0 * * * *", START_TIME))
+    scheduler.add("shortly.after", croniter("2 * * * *", half_past))
+    scheduler.add("later", croniter("30 * * * *", half_past))
+    scheduler.add("refused", croniter("1 * * * *", half_past))
+    execution, key = next(scheduler.due())
+    assert key == "hourly"
+
+    taken = scheduler.take(
+        execution + timedelta(minutes=5), accept=lambda key: key != "refused"
+    )
+    assert taken == [
+        (START_TIME + timedelta(hours=1, minutes=2), "shortly.after")
+    ]
+    # jobs taken are rescheduled from their execution times
+    assert scheduler.next_execution("shortly.after") == (
+        START_TIME + timedelta(hours=2, minutes=2)
+    )
+    assert [key for _, key in islice(scheduler.due(), 2)] == [
+        "refused", "later"
+    ]
+    assert scheduler.take(execution) == []
@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for replaying question schedules in simulated time."""
+
+
+import csv
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from aw_watcher_ask.models import Question
+from aw_watcher_ask.simulation import simulate, write_fire_times
+
+
+START_TIME = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def test_simulate():
+    """Tests simulating a year of prompts of many questions."""
+    questions = [
+        Question(
+            question_id=f"test.question.{ix}",
+            schedule="R * * * *",
+            until=datetime(2100, 12, 31, tzinfo=timezone.utc),
+        )
+        for ix in range(3)
+    ]
+    fire_times = list(
+        simulate(questions, START_TIME, START_TIME + timedelta(days=365))
+    )
+    assert len(fire_times) == 3 * 365 * 24
+    assert fire_times == sorted(fire_times, key=lambda fire: fire.timestamp)
+    assert fire_times == list(
+        simulate(questions, START_TIME, START_TIME + timedelta(days=365))
+    )
+
+    # random minutes are evenly spread over the hour
+    minutes = Counter(
+        fire.timestamp.minute for fire in fire_times
+        if fire.question_id == "test.question.0"
+    )
+    assert len(minutes) == 60
+    assert max(minutes.values()) < 2 * min(minutes.values())
+
+
+def test_simulate_until():
+    """Tests that questions are not simulated past their end dates."""
+    question = Question(
+        question_id="test.question",
+        schedule="0 * * * *",
+        until=START_TIME + timedelta(hours=5),
+    )
+    fire_times = list(
+        simulate([question], START_TIME, START_TIME + timedelta(days=1))
+    )
+    assert [fire.timestamp.hour for fire in fire_times] == [1, 2, 3, 4]
+
+
+def test_write_fire_times():
+    """Tests writing simulated prompts as comma-separated values."""
+    question = Question(
+        question_id="test.question",
+        schedule="0 9 * * *",
+        until=datetime(2100, 12, 31, tzinfo=timezone.utc),
+    )
+    file = StringIO()
+    count = write_fire_times(
+        simulate([question], START_TIME, START_TIME + timedelta(days=7)),
+        file,
+    )
+    assert count == 7
+    rows = list(csv.DictReader(StringIO(file.getvalue())))
+    assert rows[0] == {
+        "question_id": "test.question",
+        "timestamp": "2021-01-01T09:00:00+00:00",
+    }
@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the time it takes to start the command-line interface."""
+
+
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+
+# dependencies that should only be imported when a watcher actually runs
+HEAVY_MODULES = ["aw_client", "aw_core", "croniter", "loguru", "requests"]
+
+# maximum import time of the package's own modules, in milliseconds, on top
+# of the command-line framework (generous, to tolerate slow CI machines)
+IMPORT_BUDGET_MS = 50
+
+
+def _import_times(module: str, runs: int = 3) -> Dict[str, float]:
+    """Measures the cumulative import time of every module, in milliseconds.
+
+    Uses the best of a few runs of `python -X importtime`, to reduce noise.
+    """
+    best: Dict[str, float] = dict()
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            name = name.strip()
+            elapsed = int(cumulative) / 1000
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return best
+
+
+@pytest.mark.parametrize(
+    "module", ["aw_watcher_ask.__main__", "aw_watcher_ask.cli"]
+)
+def test_no_heavy_imports(module: str):
+    """Tests that starting the application does not import heavy modules."""
+    imported = _import_times(module, runs=1)
+    assert module in imported
+    assert not [name for name in HEAVY_MODULES if name in imported]
+
+
+def test_main_import_time():
+    """Tests that the entrypoint starts fast enough to answer `--version`."""
+    imported = _import_times("aw_watcher_ask.__main__")
+    assert imported["aw_watcher_ask.__main__"] < IMPORT_BUDGET_MS
+
+
+def test_cli_import_time():
+    """Tests that the CLI adds little import time to its framework."""
+    imported = _import_times("aw_watcher_ask.cli")
+    overhead = imported["aw_watcher_ask.cli"] - imported.get("typer", 0.0)
+    assert overhead < IMPORT_BUDGET_MS
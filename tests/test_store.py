@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: Bernardo Chrispim Baron <bc.bernardo@hotmail.com>
+#
+# SPDX-License-Identifier: MIT
+
+
+"""Tests for the local store of answers."""
+
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aw_core.models import Event
+
+from aw_watcher_ask.store import AnswerStore
+
+
+START = datetime(2022, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def _event(minutes: int, success: bool, value: object) -> Event:
+    return Event(
+        timestamp=START + timedelta(minutes=minutes),
+        data={"success": success, "Happiness": value, "question_id": "x"},
+    )
+
+
+@pytest.fixture(scope="function")
+def store(tmp_path):
+    """Provides a store with answers to two questions."""
+    store = AnswerStore(tmp_path / "answers.sqlite")
+    store.add("happiness.level", _event(0, True, "7"))
+    store.add("happiness.level", _event(10, False, ""))
+    store.add("happiness.level", _event(20, True, "9"))
+    store.add("working", _event(5, True, ""))
+    store.add("feelings", _event(15, True, {"Mood": "fine"}))
+    yield store
+    store.close()
+
+
+def test_store_answers(store):
+    """Tests scanning the answers to a question within a time range."""
+    answers = list(store.answers(
+        ["happiness.level"],
+        start=START + timedelta(minutes=5),
+        end=START + timedelta(minutes=30),
+    ))
+    assert [answer.value for answer in answers] == ["", "9"]
+    assert [answer.success for answer in answers] == [False, True]
+    assert answers[1].timestamp == START + timedelta(minutes=20)
+    assert next(store.answers(["feelings"])).value == {"Mood": "fine"}
+
+
+def test_store_summarize(store):
+    """Tests aggregating the answers to each question."""
+    summaries = store.summarize()
+    assert [summary.question_id for summary in summaries] == [
+        "feelings", "happiness.level", "working"
+    ]
+    happiness = summaries[1]
+    assert (happiness.prompts, happiness.answered) == (3, 2)
+    assert happiness.response_rate == pytest.approx(2 / 3)
+    assert happiness.mean == pytest.approx(8.0)
+    assert happiness.first == START
+    assert summaries[2].mean is None
+
+
+def test_store_summarize_range(store):
+    """Tests aggregating the answers given within a time range."""
+    (summary,) = store.summarize(
+        ["happiness.level", "working"], end=START + timedelta(minutes=5)
+    )
+    assert summary.question_id == "happiness.level"
+    assert summary.prompts == 1
+    assert store.summarize(start=START + timedelta(days=1)) == []
+
+
+def test_store_describe(store):
+    """Tests keeping the latest description of each question."""
+    description = {"title": "Happiness", "type": "scale", "options": {}}
+    assert store.describe("bucket", "happiness", description)
+    assert not store.describe("bucket", "happiness", dict(description))
+    # questions are described per bucket
+    assert store.describe("other.bucket", "happiness", description)
+    assert store.describe("bucket", "focus", description)
+    changed = dict(description, title="Happiness today")
+    assert store.describe("bucket", "happiness", changed)
+    assert not store.describe("bucket", "happiness", changed)
+
+
+def test_store_refused(store):
+    """Tests counting a "No" to a yes-or-no question as an answer."""
+    for minutes, success, value in [(0, True, True), (10, False, None)]:
+        store.add("happy", Event(
+            timestamp=START + timedelta(minutes=minutes),
+            data={"success": success, "value": value, "question_id": "happy"},
+        ))
+    # as stored by earlier versions
+    store.add("happy", Event(
+        timestamp=START + timedelta(minutes=20),
+        data={"success": False, "value": False, "question_id": "happy"},
+    ))
+    (summary,) = store.summarize(["happy"])
+    assert (summary.prompts, summary.answered) == (3, 2)
+    assert [answer.success for answer in store.answers(["happy"])] == [
+        True, False, True
+    ]